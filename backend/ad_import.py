@@ -0,0 +1,397 @@
+"""
+Importação em massa de exports de bibliotecas de anúncios.
+
+Plataformas protegidas (Facebook, Instagram, TikTok...) não deixam raspar a
+página do anúncio, então o analista salva o export da biblioteca e sobe o
+arquivo. Formatos aceitos:
+
+- JSON: lista de anúncios, ou objeto com a lista em data/ads/results/items
+  (Meta Ad Library API, TikTok Creative Center)
+- JSON Lines: um anúncio por linha
+- CSV: uma linha por anúncio; colunas reconhecidas por apelido
+- HAR: respostas GraphQL/XHR salvas pelo DevTools na página da biblioteca
+
+O arquivo é lido em pedaços: arrays JSON são percorridos item a item com
+raw_decode, o CSV linha a linha e o HAR entrada a entrada, sem carregar o
+export inteiro na memória. Cada anúncio vira um registro normalizado (texto
+sem HTML, URLs de mídia absolutas) com hook e risco de bloqueio já
+classificados.
+
+Como o page_extract, não depende do resto do backend.
+"""
+from __future__ import annotations
+
+import io
+import re
+import csv
+import json
+import base64
+import hashlib
+import logging
+from html import unescape
+from itertools import islice
+from typing import Iterator, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+from term_rules import classify_text
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_CHARS = 256 * 1024
+MAX_RECORD_CHARS = 8 * 1024 * 1024   # um anúncio (ou entrada de HAR) maior que isso é descartado como inválido
+MAX_TEXT_CHARS = 5000
+MAX_MEDIA_URLS = 10
+ARRAY_KEYS_RE = re.compile(r'"(data|ads|results|items)"\s*:\s*\[')
+HAR_ENTRIES_RE = re.compile(r'"entries"\s*:\s*\[')
+TAG_RE = re.compile(r"<[^>]+>")
+PLACEHOLDER_RE = re.compile(r"\{\{[^}]*\}\}")
+MEDIA_KEY_RE = re.compile(r"image|video|thumbnail|picture|cover|poster|media|creative_url", re.I)
+JSON_PREFIXES = ("for (;;);", ")]}'")
+
+# exports trazem textos longos e até thumbnails em base64 numa célula; o padrão do csv é 128KB
+csv.field_size_limit(max(csv.field_size_limit(), MAX_RECORD_CHARS))
+
+# apelidos de campo -> campo normalizado (chaves já em minúsculas_com_underscore)
+TEXT_KEYS = (
+    "ad_creative_bodies", "ad_creative_body", "body", "ad_text", "primary_text", "text",
+    "texto", "message", "caption", "ad_title", "description",
+)
+TITLE_KEYS = ("ad_creative_link_titles", "ad_creative_link_title", "title", "headline", "link_title", "titulo")
+LINK_KEYS = ("link_url", "landing_page", "landing_page_url", "destination_url", "website_url", "website", "url_destino")
+ID_KEYS = ("ad_archive_id", "ad_id", "library_id", "id")
+PAGE_KEYS = ("page_name", "advertiser_name", "brand_name", "advertiser", "anunciante")
+PLATFORM_KEYS = ("publisher_platforms", "publisher_platform", "platform", "plataforma")
+CTA_KEYS = ("cta_text", "call_to_action", "cta")
+DATE_KEYS = ("ad_delivery_start_time", "start_date", "first_shown", "created_time", "data_inicio")
+# posicionamentos da Meta compartilham o mesmo id de anúncio
+PLATFORM_NETWORKS = {"facebook": "meta", "instagram": "meta", "messenger": "meta", "audience_network": "meta", "threads": "meta"}
+AD_MARKERS = {"ad_archive_id", "ad_creative_bodies", "ad_snapshot_url", "snapshot", "ad_id", "ad_text", "ad_title", "library_id"}
+
+
+def snake(key: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", str(key).strip().lower()).strip("_")
+
+
+def clean_text(value) -> str:
+    """Texto do anúncio sem HTML, entidades, placeholders de template nem espaços repetidos."""
+    if isinstance(value, dict):
+        value = value.get("text") or (value.get("markup") or {}).get("__html") or ""
+    if isinstance(value, list):
+        value = " ".join(clean_text(v) for v in value if v)
+    text = unescape(TAG_RE.sub(" ", str(value or "")))
+    return " ".join(PLACEHOLDER_RE.sub(" ", text).split())[:MAX_TEXT_CHARS]
+
+
+def normalize_media_url(url) -> Optional[str]:
+    if not isinstance(url, str):
+        return None
+    url = unescape(url.strip().replace("\\/", "/"))
+    if url.startswith("//"):
+        url = "https:" + url
+    if not url.startswith(("http://", "https://")):
+        return None
+    parts = urlsplit(url)
+    # a query fica: CDNs (fbcdn, tiktokcdn) assinam a URL nela
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, parts.query, ""))
+
+
+def _first(node: dict, keys: tuple):
+    for key in keys:
+        value = node.get(key)
+        if value not in (None, "", [], {}):
+            return value
+    return None
+
+
+def _media_urls(value, found: list, key: str = "", depth: int = 0):
+    if depth > 6 or len(found) >= MAX_MEDIA_URLS:
+        return
+    if isinstance(value, dict):
+        for k, v in value.items():
+            _media_urls(v, found, str(k), depth + 1)
+    elif isinstance(value, list):
+        for v in value:
+            _media_urls(v, found, key, depth + 1)
+    elif MEDIA_KEY_RE.search(key):
+        url = normalize_media_url(value)
+        if url and url not in found:
+            found.append(url)
+
+
+def _flatten(node: dict) -> dict:
+    """Chaves em snake_case; o snapshot da Meta (GraphQL) sobe um nível."""
+    flat = {snake(k): v for k, v in node.items()}
+    snapshot = flat.get("snapshot")
+    if isinstance(snapshot, dict):
+        for k, v in snapshot.items():
+            flat.setdefault(snake(k), v)
+        cards = snapshot.get("cards") or []
+        if isinstance(cards, list) and cards and not clean_text(flat.get("body")):
+            flat["body"] = [c.get("body") for c in cards if isinstance(c, dict)]
+    return flat
+
+
+def normalize_ad(node: dict, source_format: str, platform_hint: str = "") -> Optional[dict]:
+    flat = _flatten(node)
+    text = clean_text(_first(flat, TEXT_KEYS))
+    title = clean_text(_first(flat, TITLE_KEYS))[:300]
+    media: list = []
+    _media_urls(node, media)
+    if not text and not title and not media:
+        return None
+
+    platform = _first(flat, PLATFORM_KEYS) or platform_hint or "desconhecida"
+    if isinstance(platform, list):
+        platform = ",".join(str(p) for p in platform)
+    platform = str(platform).lower()[:60]
+    ad_id = _first(flat, ID_KEYS)
+    link = _first(flat, LINK_KEYS)
+    if isinstance(link, list):
+        link = link[0] if link else None
+    if ad_id is not None:
+        first = platform.split(",")[0]
+        ad_key = f"{PLATFORM_NETWORKS.get(first, first)}:{ad_id}"
+    else:
+        ad_key = "hash:" + hashlib.sha1(f"{text}\n{title}\n{link or ''}".encode()).hexdigest()
+    started = _first(flat, DATE_KEYS)
+
+    return {
+        "ad_key": ad_key,
+        "ad_id": str(ad_id) if ad_id is not None else None,
+        "platform": platform,
+        "page_name": clean_text(_first(flat, PAGE_KEYS))[:200],
+        "text": text,
+        "title": title,
+        "cta": clean_text(_first(flat, CTA_KEYS))[:80],
+        "landing_url": normalize_media_url(link) if link else None,
+        "snapshot_url": normalize_media_url(flat.get("ad_snapshot_url")),
+        "media_urls": media,
+        "started_at": str(started) if started is not None else None,
+        "source_format": source_format,
+    }
+
+
+def find_ad_nodes(value, depth: int = 0) -> Iterator[dict]:
+    """Objetos que parecem anúncio dentro de uma resposta aninhada (edges/node/collated_results)."""
+    if depth > 12:
+        return
+    if isinstance(value, dict):
+        if AD_MARKERS & {snake(k) for k in value}:
+            yield value
+            return
+        for v in value.values():
+            yield from find_ad_nodes(v, depth + 1)
+    elif isinstance(value, list):
+        for v in value:
+            yield from find_ad_nodes(v, depth + 1)
+
+
+def ad_nodes(item) -> Iterator[dict]:
+    # anúncio já no nível de cima (export da API, linha de JSONL): não precisa procurar dentro
+    if isinstance(item, dict) and "snapshot" not in item and any(snake(k) in TEXT_KEYS or snake(k) in TITLE_KEYS for k in item):
+        return iter([item])
+    return find_ad_nodes(item)
+
+
+def iter_json_documents(text: str) -> Iterator:
+    """Um ou mais documentos JSON concatenados (respostas GraphQL em streaming), com prefixo anti-XSSI."""
+    text = text.strip()
+    for prefix in JSON_PREFIXES:
+        if text.startswith(prefix):
+            text = text[len(prefix):]
+    decoder = json.JSONDecoder(strict=False)
+    pos = 0
+    while pos < len(text):
+        while pos < len(text) and text[pos] in " \t\r\n":
+            pos += 1
+        if pos >= len(text):
+            return
+        try:
+            value, pos = decoder.raw_decode(text, pos)
+        except ValueError:
+            return
+        yield value
+
+
+class JsonArrayReader:
+    """Percorre os itens de um array JSON lendo o arquivo em pedaços."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder(strict=False)
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.stream.read(READ_CHUNK_CHARS)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def skip(self, chars: str):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in chars:
+                self.pos += 1
+            if self.pos < len(self.buf) or not self.fill():
+                return
+
+    def peek(self) -> str:
+        self.skip(" \t\r\n﻿")
+        return self.buf[self.pos] if self.pos < len(self.buf) else ""
+
+    def seek_array(self, pattern: re.Pattern) -> bool:
+        """Avança até logo depois do '[' do primeiro campo que casar com o padrão."""
+        while True:
+            match = pattern.search(self.buf, self.pos)
+            if match:
+                self.pos = match.end()
+                return True
+            if len(self.buf) - self.pos > MAX_RECORD_CHARS:
+                # mantém só a cauda, onde o nome do campo pode ter sido cortado
+                self.pos = len(self.buf) - 64
+            if not self.fill():
+                return False
+
+    def items(self) -> Iterator:
+        while True:
+            self.skip(" \t\r\n,")
+            if self.pos >= len(self.buf) or self.buf[self.pos] == "]":
+                return
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except ValueError:
+                if len(self.buf) - self.pos > MAX_RECORD_CHARS:
+                    raise ValueError("Registro grande demais no arquivo")
+                if not self.fill():
+                    raise ValueError("JSON truncado ou inválido")
+                continue
+            self.pos = end
+            yield value
+
+    def rest(self) -> str:
+        while self.fill():
+            pass
+        return self.buf[self.pos:]
+
+
+def detect_format(filename: str, head: bytes) -> str:
+    name = (filename or "").lower()
+    for ext, fmt in ((".har", "har"), (".csv", "csv"), (".jsonl", "jsonl"), (".ndjson", "jsonl"), (".json", "json")):
+        if name.endswith(ext):
+            return fmt
+    start = head.lstrip(b"\xef\xbb\xbf \t\r\n")[:1]
+    if start in (b"[", b"{"):
+        return "har" if b'"log"' in head[:200] else "json"
+    return "csv"
+
+
+def _platform_from_url(url: str) -> str:
+    host = (urlsplit(url).hostname or "").lower()
+    for platform in ("facebook", "instagram", "tiktok", "linkedin", "google", "youtube"):
+        if platform in host:
+            return platform
+    return ""
+
+
+def _har_text(entry: dict) -> str:
+    content = ((entry.get("response") or {}).get("content") or {})
+    text = content.get("text") or ""
+    if content.get("encoding") == "base64":
+        try:
+            text = base64.b64decode(text).decode("utf-8", errors="replace")
+        except ValueError:
+            return ""
+    return text
+
+
+def iter_har(stream) -> Iterator[tuple]:
+    reader = JsonArrayReader(stream)
+    if not reader.seek_array(HAR_ENTRIES_RE):
+        raise ValueError("HAR sem log.entries")
+    for entry in reader.items():
+        if not isinstance(entry, dict):
+            continue
+        text = _har_text(entry)
+        if not text or text.lstrip()[:1] not in ("{", "[", "f", ")"):
+            continue
+        platform = _platform_from_url((entry.get("request") or {}).get("url") or "")
+        for document in iter_json_documents(text):
+            for node in find_ad_nodes(document):
+                yield node, platform
+
+
+def iter_json(stream) -> Iterator[tuple]:
+    reader = JsonArrayReader(stream)
+    start = reader.peek()
+    if start == "[":
+        reader.pos += 1
+        items = reader.items()
+    elif start == "{" and reader.seek_array(ARRAY_KEYS_RE):
+        items = reader.items()
+    else:
+        # objeto sem lista conhecida (resposta GraphQL salva à mão): lê inteiro
+        reader.pos = 0
+        items = iter_json_documents(reader.rest())
+    for item in items:
+        for node in ad_nodes(item):
+            yield node, ""
+
+
+def iter_jsonl(stream) -> Iterator[tuple]:
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line, strict=False)
+        except ValueError:
+            continue
+        for node in ad_nodes(item):
+            yield node, ""
+
+
+def iter_csv(stream) -> Iterator[tuple]:
+    first = stream.readline()
+    # do cabeçalho só dá para confiar no separador; aspas seguem o padrão do Excel ("" escapa aspas)
+    try:
+        delimiter = csv.Sniffer().sniff(first, delimiters=",;\t").delimiter
+    except csv.Error:
+        delimiter = ","
+    # strict: aspas sem fechamento viram erro em vez de engolir o resto do arquivo numa célula
+    try:
+        header = [snake(h) for h in next(csv.reader([first], delimiter=delimiter, strict=True), [])]
+    except csv.Error as e:
+        raise ValueError(f"Cabeçalho CSV inválido: {e}") from e
+    reader = csv.reader(stream, delimiter=delimiter, strict=True)
+    try:
+        for row in reader:
+            if row:
+                yield {k: v for k, v in zip(header, row) if k}, ""
+    except csv.Error as e:
+        # a linha conta o cabeçalho, lido à parte
+        raise ValueError(f"CSV inválido na linha {reader.line_num + 1}: {e}") from e
+
+
+READERS = {"har": iter_har, "json": iter_json, "jsonl": iter_jsonl, "csv": iter_csv}
+
+
+def iter_ads(binary_stream, source_format: str) -> Iterator[dict]:
+    """Anúncios normalizados e classificados, na ordem do arquivo."""
+    stream = io.TextIOWrapper(binary_stream, encoding="utf-8-sig", errors="replace", newline="")
+    for node, platform in READERS[source_format](stream):
+        ad = normalize_ad(node, source_format, platform)
+        if ad is None:
+            continue
+        ad.update(classify_text(f"{ad['title']} {ad['text']}"))
+        yield ad
+
+
+def next_batch(ads: Iterator[dict], size: int) -> list:
+    """Próximo lote do iterador (roda em thread: parse e classificação são CPU)."""
+    return list(islice(ads, size))
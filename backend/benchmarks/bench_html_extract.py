@@ -0,0 +1,110 @@
+"""
+Benchmark: extração de landing pages.
+
+Compara a extração antiga (BeautifulSoup + html.parser, vários find_all e
+get_text repetido) com o coletor de passada única do page_extract, usando
+lxml e o html.parser da stdlib como drivers.
+
+O corpus é um diretório de páginas salvas (*.html, *.htm). Para montar um:
+    curl -sL https://exemplo.com.br/oferta -o benchmarks/pages/oferta.html
+Sem páginas salvas, gera landing pages sintéticas de 50 KB, 500 KB e 3 MB.
+
+Uso: python benchmarks/bench_html_extract.py [diretório] [iterações]
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import page_extract  # noqa: E402
+from page_extract import extract_fields, extract_fields_soup  # noqa: E402
+
+DEFAULT_CORPUS = Path(__file__).resolve().parent / "pages"
+
+SECAO = """
+<section class="depoimentos">
+  <h2>Resultado real de quem já usou o <strong>método</strong></h2>
+  <div class="card"><img src="/img/cliente-{i}.jpg" alt="Cliente {i}">
+    <p>Eu já tinha tentado de tudo e nada funcionava. Em 30 dias com o método
+    descobri que o problema era a rotina, e hoje <em>milhares de pessoas</em>
+    contam a mesma história no grupo.</p>
+    <a href="/checkout?o={i}" class="btn"><span>Quero garantir</span> <b>minha vaga</b></a>
+  </div>
+  <script>window.dataLayer = window.dataLayer || []; dataLayer.push({{"secao": {i}}});</script>
+  <style>.card-{i} {{ margin: 0 auto; padding: 12px; }}</style>
+</section>
+"""
+
+
+def synthetic_page(target_bytes: int) -> str:
+    head = (
+        "<!DOCTYPE html><html lang='pt-BR'><head><meta charset='utf-8'>"
+        "<title>Vitalis 40+ | Recupere sua disposição</title>"
+        "<meta name='description' content='O método que já ajudou milhares de mulheres acima de 40 anos.'>"
+        "<link rel='stylesheet' href='/app.css'></head><body>"
+        "<nav><a href='/'>Início</a><a href='/sobre'>Sobre</a><a href='/contato'>Contato</a></nav>"
+        "<header><h1>Pare de sentir cansaço no fim da tarde</h1>"
+        "<button class='cta'>Comprar agora</button></header>"
+    )
+    parts = [head]
+    size = len(head)
+    i = 0
+    while size < target_bytes:
+        secao = SECAO.format(i=i)
+        parts.append(secao)
+        size += len(secao)
+        i += 1
+    parts.append("<footer><p>© Vitalis. Todos os direitos reservados. CNPJ 00.000.000/0001-00</p></footer></body></html>")
+    return "".join(parts)
+
+
+def load_corpus(directory: Path) -> dict:
+    pages = {}
+    if directory.is_dir():
+        for path in sorted(directory.iterdir()):
+            if path.suffix.lower() in (".html", ".htm"):
+                pages[path.name] = path.read_text(encoding="utf-8", errors="replace")
+    if not pages:
+        pages = {f"sintética {kb} KB": synthetic_page(kb * 1024) for kb in (50, 500, 3072)}
+    return pages
+
+
+def stdlib_fields(html: str) -> dict:
+    lxml_etree = page_extract.etree
+    page_extract.etree = None
+    try:
+        return extract_fields(html)
+    finally:
+        page_extract.etree = lxml_etree
+
+
+def bench(fn, html: str, iterations: int) -> float:
+    fn(html)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(html)
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    directory = Path(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_CORPUS
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    pages = load_corpus(directory)
+
+    print(f"lxml: {'sim' if page_extract.etree is not None else 'NÃO instalado'} | páginas: {len(pages)} | iterações: {iterations}")
+    print(f"{'página':28} {'KB':>8} {'bs4 ms':>9} {'stdlib ms':>10} {'lxml ms':>9} {'ganho':>7}")
+    for name, html in pages.items():
+        baseline = bench(extract_fields_soup, html, iterations)
+        stdlib = bench(stdlib_fields, html, iterations)
+        fast = bench(extract_fields, html, iterations) if page_extract.etree is not None else stdlib
+        print(f"{name[:28]:28} {len(html) / 1024:8.1f} {baseline:9.2f} {stdlib:10.2f} {fast:9.2f} {baseline / fast:6.1f}x")
+
+        old, new = extract_fields_soup(html), extract_fields(html)
+        for field in ("headings", "paragraphs", "buttons_ctas", "images"):
+            if len(old[field]) != len(new[field]):
+                print(f"  ! {field}: bs4 {len(old[field])} vs rápido {len(new[field])}")
+
+
+if __name__ == "__main__":
+    main()
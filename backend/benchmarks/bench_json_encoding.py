@@ -0,0 +1,161 @@
+"""
+Micro-benchmark: encoding das respostas grandes.
+
+Compara o caminho padrão do FastAPI (jsonable_encoder + json.dumps) com
+dump_json (orjson) em documentos no formato real de get_analysis,
+list_analyses, list_competitor_analyses e /competitor/image-analysis.
+
+Uso: python benchmarks/bench_json_encoding.py [iterações]
+"""
+import os
+import sys
+import json
+import time
+import uuid
+from pathlib import Path
+from datetime import datetime, timezone
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "adoperator_bench")
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from server import STAGE_FIELDS, dump_json, orjson  # noqa: E402
+
+TEXTO = (
+    "Mulheres acima de 40 anos que já tentaram de tudo para recuperar a disposição "
+    "e sentem que o corpo não responde mais como antes, com cansaço no fim da tarde. "
+)
+
+
+def now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def build_analysis() -> dict:
+    anuncios = [
+        {
+            "numero": i,
+            "hipotese": f"Hipótese {i}: {TEXTO[:120]}",
+            "hook": f"Você sabia que {TEXTO[:90]}?",
+            "copy": TEXTO * 5,
+            "roteiro_ugc": TEXTO * 8,
+            "cta": "Quero recuperar minha energia agora",
+            "estrutura": "problema-agitação-solução",
+        }
+        for i in range(1, 4)
+    ]
+    perfis = [
+        {
+            "perfil": nome,
+            "reacoes": [
+                {"anuncio": i, "reacao": TEXTO * 2, "score_atencao": 7.5, "score_confianca": 6, "objecao": TEXTO[:140]}
+                for i in range(1, 4)
+            ],
+        }
+        for nome in ("cetico", "impulsivo", "analitico", "emocional")
+    ]
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": str(uuid.uuid4()),
+        "product": {
+            "nome": "Vitalis 40+",
+            "nicho": "Saúde feminina",
+            "promessa_principal": TEXTO[:150],
+            "publico_alvo": TEXTO[:100],
+            "beneficios": TEXTO,
+            "ingredientes_mecanismo": TEXTO,
+            "tom": "empático",
+        },
+        "language": "pt",
+        "status": "completed",
+        "created_at": now(),
+        "stages": {s: {"revision": 1, "updated_at": now()} for s in ("strategic_analysis", "ad_variations", "audience_simulation", "decision")},
+        "strategic_analysis": {
+            "nivel_consciencia": "consciente do problema",
+            "dor_central": TEXTO * 2,
+            "objecoes": [TEXTO[:160] for _ in range(5)],
+            "angulo_venda": TEXTO,
+            "big_idea": TEXTO,
+            "mecanismo_percebido": TEXTO * 2,
+            "compliance": {"riscos": [{"termo": "cura", "sugestao": "Use 'auxilia'", "severidade": "alta"}], "score": 85, "total_riscos": 1},
+        },
+        "ad_variations": {"anuncios": anuncios},
+        "audience_simulation": {"perfis": perfis, "resumo": TEXTO * 3},
+        "decision": {
+            "veredito": {**anuncios[0], "anuncio_numero": 1, "justificativa": TEXTO * 4},
+            "fraquezas": [TEXTO[:180] for _ in range(3)],
+            "proximo_passo": {"acao": TEXTO, "prazo": "7 dias"},
+        },
+        "market_comparison": {"padroes_mercado": [TEXTO for _ in range(6)], "diferenciais": [TEXTO[:200] for _ in range(4)]},
+    }
+
+
+def build_competitor() -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": str(uuid.uuid4()),
+        "url": "https://exemplo.com.br/oferta",
+        "created_at": now(),
+        "result": {
+            "estrategia": TEXTO * 3,
+            "hooks": [TEXTO[:120] for _ in range(5)],
+            "pontos_fortes": [TEXTO[:150] for _ in range(4)],
+            "pontos_fracos": [TEXTO[:150] for _ in range(4)],
+            "recomendacoes": [TEXTO for _ in range(3)],
+            "scraping_data": {
+                "url": "https://exemplo.com.br/oferta",
+                "hook_type_auto": "prova_social",
+                "block_risk_auto": {"level": "medio", "terms": ["garantido"]},
+                "images_found": 10,
+                "source_type": "webpage",
+            },
+        },
+    }
+
+
+def build_image_analysis() -> dict:
+    images = [{"url": f"https://cdn.exemplo.com/ad{i}.jpg", "phash": "c3a1e5f0b2d4a697", "status": "ok"} for i in range(10)]
+    cross = [
+        {"image_a": a["url"], "image_b": b["url"], "distance": 12, "similarity_percent": 81.2, "is_similar": True}
+        for i, a in enumerate(images) for b in images[i + 1:]
+    ]
+    return {"images": images, "creative_comparisons": [], "cross_comparisons": cross, "summary": {"total_images": 10}}
+
+
+def stdlib_default(content) -> bytes:
+    # o que JSONResponse faz depois do jsonable_encoder
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def bench(fn, content, iterations: int) -> float:
+    fn(content)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(content)
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    shapes = {
+        "get_analysis": build_analysis(),
+        "list_analyses (100)": [
+            {k: v for k, v in build_analysis().items() if k not in STAGE_FIELDS} for _ in range(100)
+        ],
+        "list_competitor_analyses (50)": [build_competitor() for _ in range(50)],
+        "competitor/image-analysis": build_image_analysis(),
+    }
+
+    print(f"orjson: {'sim' if orjson is not None else 'NÃO instalado (fallback stdlib)'} | iterações: {iterations}")
+    print(f"{'shape':32} {'KB':>8} {'padrão ms':>10} {'dump_json ms':>13} {'ganho':>7}")
+    for name, content in shapes.items():
+        size_kb = len(dump_json(content)) / 1024
+        baseline = bench(stdlib_default, content, iterations)
+        fast = bench(dump_json, content, iterations)
+        print(f"{name:32} {size_kb:8.1f} {baseline:10.3f} {fast:13.3f} {baseline / fast:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark: compliance, risco de bloqueio e hook sobre texto de páginas.
+
+Compara as varreduras antigas (lower() + um `in` por termo em cada uma das
+três funções) com o autômato do term_rules, em C (pyahocorasick) e em
+Python puro. Roda com as listas atuais e com listas infladas por termos
+sintéticos, para mostrar como cada abordagem escala com o tamanho das
+listas.
+
+O texto vem das páginas salvas em benchmarks/pages (texto completo
+extraído, sem o corte de 3000 caracteres do prompt) ou das landing pages
+sintéticas do bench_html_extract.
+
+Uso: python benchmarks/bench_term_rules.py [diretório] [iterações]
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import term_rules  # noqa: E402
+from bench_html_extract import DEFAULT_CORPUS, load_corpus  # noqa: E402
+from page_extract import extract_fields  # noqa: E402
+from term_rules import BLOCK_RISK_TERMS, HIGH_SEVERITY, HOOK_PATTERNS, RISKY_TERMS, TermAutomaton  # noqa: E402
+
+
+def legacy(text: str, risky: dict, block: list, hooks: dict) -> tuple:
+    """As três funções como eram antes do autômato."""
+    text_lower = text.lower()
+    risks = [t for t in risky if t.lower() in text_lower]
+    compliance = {"total_riscos": len(risks), "alta": sum(1 for t in risks if t in HIGH_SEVERITY)}
+
+    text_lower = text.lower()
+    found = [t for t in block if t in text_lower]
+
+    text_lower = text.lower()
+    scores = {k: sum(1 for w in words if w in text_lower) for k, words in hooks.items()}
+    return compliance, found, max(scores, key=scores.get)
+
+
+def with_matcher(matcher, text: str, risky: dict, block: list, hooks: dict) -> tuple:
+    found = {term for _, term in matcher.iter(text.lower())}
+    risks = [t for t in risky if t.lower() in found]
+    compliance = {"total_riscos": len(risks), "alta": sum(1 for t in risks if t in HIGH_SEVERITY)}
+    scores = {k: sum(1 for w in words if w in found) for k, words in hooks.items()}
+    return compliance, [t for t in block if t in found], max(scores, key=scores.get)
+
+
+def inflate(extra: int) -> tuple:
+    """Listas com `extra` termos sintéticos a mais (nenhum aparece no texto)."""
+    risky = {**RISKY_TERMS, **{f"promessa proibida {i}x": "" for i in range(extra // 2)}}
+    block = BLOCK_RISK_TERMS + [f"termo bloqueado {i}x" for i in range(extra // 2)]
+    return risky, block, HOOK_PATTERNS
+
+
+def page_text(html: str) -> str:
+    fields = extract_fields(html)
+    return " ".join([fields["title"], fields["meta_description"]] + fields["headings"] + fields["paragraphs"])
+
+
+def bench(fn, iterations: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    directory = Path(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_CORPUS
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    texts = {name: page_text(html) for name, html in load_corpus(directory).items()}
+    texts["texto longo (concatenado)"] = " ".join(texts.values()) * 5
+
+    print(f"pyahocorasick: {'sim' if term_rules.ahocorasick is not None else 'NÃO instalado'} | iterações: {iterations}")
+    print(f"{'texto':28} {'KB':>7} {'termos':>7} {'antigo ms':>10} {'C ms':>8} {'python ms':>10}")
+    for extra in (0, 500, 5000):
+        risky, block, hooks = inflate(extra)
+        terms = sorted({t.lower() for t in risky} | set(block) | {w for ws in hooks.values() for w in ws})
+        pure = TermAutomaton(terms)
+        native = term_rules.build_matcher(terms) if term_rules.ahocorasick is not None else None
+        for name, text in texts.items():
+            expected = legacy(text, risky, block, hooks)
+            assert with_matcher(pure, text, risky, block, hooks) == expected, name
+            old = bench(lambda: legacy(text, risky, block, hooks), iterations)
+            py = bench(lambda: with_matcher(pure, text, risky, block, hooks), iterations)
+            c = bench(lambda: with_matcher(native, text, risky, block, hooks), iterations) if native else float("nan")
+            print(f"{name[:28]:28} {len(text) / 1024:7.1f} {len(terms):7d} {old:10.3f} {c:8.3f} {py:10.3f}")
+
+
+if __name__ == "__main__":
+    main()
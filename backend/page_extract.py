@@ -0,0 +1,631 @@
+"""
+Extração de conteúdo de landing pages em uma única passada.
+
+O coletor recebe eventos de start/end/data de um parser em streaming (lxml
+quando instalado, senão o html.parser da stdlib) e monta título, meta
+description, headings, parágrafos, CTAs e imagens de uma vez, sem montar
+árvore e sem chamar get_text várias vezes por elemento. Quando todas as
+listas atingem o limite o parse para cedo. Se o caminho rápido falhar,
+cai na extração antiga com BeautifulSoup. JSON-LD, microdata, OpenGraph e
+Twitter cards saem da mesma passada e viram um resumo estruturado
+(structured_summary).
+
+Antes de montar o texto do prompt, boilerplate e parágrafos quase
+duplicados são removidos (clean_text_blocks). Hook e risco de bloqueio
+saem do autômato de termos do term_rules.
+
+Este módulo não depende do resto do backend (nem de Mongo/env), para poder
+ser importado por benchmarks e pelos workers do pool de parse.
+"""
+from __future__ import annotations
+
+import re
+import json
+import hashlib
+import logging
+from html.parser import HTMLParser
+from typing import Optional
+from urllib.parse import urljoin
+
+from term_rules import classify_text
+
+try:
+    from lxml import etree
+except ImportError:  # pragma: no cover - lxml é opcional
+    etree = None
+
+logger = logging.getLogger(__name__)
+
+SKIP_TAGS = {"script", "style", "nav", "footer", "iframe"}
+CAPTURE_TAGS = {
+    "title": "title",
+    "h1": "headings",
+    "h2": "headings",
+    "h3": "headings",
+    "p": "paragraphs",
+    "button": "buttons_ctas",
+    "a": "buttons_ctas",
+}
+# tags que fecham um <p> implícito (o lxml já faz isso sozinho; o html.parser não)
+CLOSES_PARAGRAPH = {
+    "p", "div", "h1", "h2", "h3", "h4", "h5", "h6", "ul", "ol", "dl", "table",
+    "section", "article", "aside", "header", "main", "form", "blockquote",
+    "pre", "hr", "figure", "address", "fieldset",
+}
+
+# parágrafos são candidatos: a limpeza de boilerplate/duplicados reduz para OUTPUT_PARAGRAPHS
+LIMITS = {"headings": 10, "paragraphs": 60, "buttons_ctas": 10, "images": 10}
+OUTPUT_PARAGRAPHS = 20
+MIN_PARAGRAPH_CHARS = 20
+MAX_CTA_CHARS = 80
+FEED_CHUNK_CHARS = 64 * 1024
+SHINGLE_WORDS = 4
+FINGERPRINT_SKETCH_SIZE = 64
+WORD_RE = re.compile(r"\w+")
+
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr"}
+MAX_JSON_LD_BLOCKS = 10
+MAX_JSON_LD_CHARS = 200_000
+MAX_META_KEYS = 40
+MAX_MICRODATA_ITEMS = 20
+MAX_MICRODATA_VALUES = 10
+MAX_MICRODATA_TEXT = 500
+MAX_LINKS = 100
+# classe/id/role de botão: o link é um CTA mesmo que o texto não diga
+CTA_ATTR_RE = re.compile(r"btn|button|cta|checkout|comprar|buy", re.I)
+JSON_LD_RE = re.compile(r"<script[^>]+application/ld\+json[^>]*>(.*?)</script>", re.I | re.S)
+
+PARSER = "lxml" if etree is not None else "html.parser"
+# sobe sempre que o resultado de extract_page ganhar/mudar campos: entradas do
+# scrape_cache de outra versão não são reaproveitadas
+EXTRACTOR_VERSION = 4  # 4: links (funil), 3: text_cleanup, 2: structured_data
+
+TEXT_BUDGET_CHARS = 3000
+NEAR_DUP_THRESHOLD = 0.6      # Jaccard de shingles acima disso = mesmo bloco (depoimento repetido, carrossel)
+NEAR_DUP_CONTAINMENT = 0.85   # bloco quase todo contido em outro já aceito
+MIN_LETTER_RATIO = 0.5        # menos letras que isso = código, tabela de números, lixo de template
+BOILERPLATE_RE = re.compile(
+    r"cookie|pol[ií]tica de privacidade|privacy policy|termos (de uso|e condi)|terms of (use|service)"
+    r"|todos os direitos reservados|all rights reserved|direitos autorais|copyright|©"
+    r"|\bcnpj\b|\blgpd\b|javascript (est[aá] )?desativado|enable javascript"
+    r"|este site n[aã]o [eé] afiliado|not (a part of|affiliated with) (the )?facebook",
+    re.I,
+)
+
+
+class PageCollector:
+    """Alvo de parser (interface target do lxml) que coleta os campos da página."""
+
+    def __init__(self):
+        self.title = ""
+        self.meta_description = ""
+        self.headings: list = []
+        self.paragraphs: list = []
+        self.buttons_ctas: list = []
+        self.images: list = []
+        self.json_ld: list = []
+        self.microdata: list = []
+        self.opengraph: dict = {}
+        self.twitter: dict = {}
+        self.links: list = []
+        self.in_body = False
+        self._skip_depth = 0
+        self._depth = 0
+        self._open: list = []  # [tag, campo, partes de texto, link]
+        self._pending: list = []
+        self._ld_parts: Optional[list] = None
+        self._items: list = []  # [profundidade, item] dos itemscope abertos
+        self._props: list = []  # [profundidade, item, nome, partes] de itemprop lidos do texto
+
+    @property
+    def done(self) -> bool:
+        return self.in_body and all(len(getattr(self, f)) >= n for f, n in LIMITS.items())
+
+    def _flush_text(self):
+        if not self._pending:
+            return
+        text = "".join(self._pending)
+        self._pending = []
+        for capture in self._open:
+            capture[2].append(text)
+
+    def _finish(self, capture):
+        tag, field, parts, link = capture
+        text = " ".join("".join(parts).split())
+        if link is not None and len(self.links) < MAX_LINKS:
+            self.links.append({**link, "text": text[:MAX_CTA_CHARS]})
+        if not text:
+            return
+        if field == "title":
+            self.title = self.title or text
+        elif field == "paragraphs":
+            if len(text) > MIN_PARAGRAPH_CHARS and len(self.paragraphs) < LIMITS["paragraphs"]:
+                self.paragraphs.append(text)
+        elif field == "buttons_ctas":
+            if len(text) < MAX_CTA_CHARS and len(self.buttons_ctas) < LIMITS["buttons_ctas"]:
+                self.buttons_ctas.append(text)
+        elif len(self.headings) < LIMITS["headings"]:
+            self.headings.append(text)
+
+    def _close(self, tag: str):
+        for i in range(len(self._open) - 1, -1, -1):
+            if self._open[i][0] == tag:
+                # fecha também o que ficou aberto dentro (HTML malformado)
+                for capture in reversed(self._open[i:]):
+                    self._finish(capture)
+                del self._open[i:]
+                return
+
+    def add_json_ld(self, text: str):
+        if len(self.json_ld) >= MAX_JSON_LD_BLOCKS or len(text) > MAX_JSON_LD_CHARS:
+            return
+        text = text.strip()
+        for wrapper in ("<!--", "-->", "<![CDATA[", "]]>"):
+            text = text.replace(wrapper, "")
+        try:
+            # strict=False: quebras de linha dentro de strings são comuns em JSON-LD escrito à mão
+            data = json.loads(text, strict=False)
+        except ValueError:
+            return
+        if isinstance(data, (dict, list)):
+            self.json_ld.append(data)
+
+    def _meta(self, attrib):
+        name = (attrib.get("name") or "").lower()
+        content = attrib.get("content") or ""
+        if name == "description" and not self.meta_description:
+            self.meta_description = content
+        key = (attrib.get("property") or "").lower() or name
+        if not content or not key:
+            return
+        if key.startswith(("og:", "product:")) and len(self.opengraph) < MAX_META_KEYS:
+            self.opengraph.setdefault(key, content)
+        elif key.startswith("twitter:") and len(self.twitter) < MAX_META_KEYS:
+            self.twitter.setdefault(key, content)
+
+    def _set_prop(self, item: dict, name: str, value):
+        props = item["props"]
+        if name not in props:
+            props[name] = value
+        elif isinstance(props[name], list):
+            if len(props[name]) < MAX_MICRODATA_VALUES:
+                props[name].append(value)
+        else:
+            props[name] = [props[name], value]
+
+    def _microdata(self, tag: str, attrib):
+        itemprop = (attrib.get("itemprop") or "").split()
+        if "itemscope" in attrib:
+            item = {"type": (attrib.get("itemtype") or "").rstrip("/").rsplit("/", 1)[-1], "props": {}}
+            if itemprop and self._items:
+                self._set_prop(self._items[-1][1], itemprop[0], item)
+            elif not self._items and len(self.microdata) < MAX_MICRODATA_ITEMS:
+                self.microdata.append(item)
+            else:
+                item = None
+            if item is not None and tag not in VOID_TAGS:
+                self._items.append([self._depth, item])
+            return
+        if not itemprop or not self._items:
+            return
+        item = self._items[-1][1]
+        value = attrib.get("content") or (attrib.get("href") if tag in ("a", "link") else None) or (attrib.get("src") if tag == "img" else None)
+        if value:
+            self._set_prop(item, itemprop[0], value)
+        elif tag not in VOID_TAGS:
+            self._props.append([self._depth, item, itemprop[0], []])
+
+    def start(self, tag: str, attrib):
+        self._flush_text()
+        if tag in SKIP_TAGS:
+            if tag == "script" and (attrib.get("type") or "").strip().lower() == "application/ld+json":
+                self._ld_parts = []
+            self._skip_depth += 1
+            return
+        if self._skip_depth:
+            return
+        if tag not in VOID_TAGS:
+            self._depth += 1
+        if tag == "body":
+            self.in_body = True
+        elif tag == "meta":
+            self._meta(attrib)
+        elif tag == "img":
+            src = attrib.get("src")
+            if src and len(self.images) < LIMITS["images"]:
+                self.images.append({"src": src, "alt": attrib.get("alt") or ""})
+        elif tag == "br":
+            self._pending.append(" ")
+        if self._items or "itemscope" in attrib:
+            self._microdata(tag, attrib)
+        if tag in CLOSES_PARAGRAPH and any(c[0] == "p" for c in self._open):
+            self._close("p")
+        if tag in CAPTURE_TAGS:
+            link = None
+            if tag == "a" and attrib.get("href"):
+                marker = " ".join(attrib.get(k) or "" for k in ("class", "id", "role"))
+                link = {"href": attrib["href"].strip(), "cta": bool(CTA_ATTR_RE.search(marker))}
+            self._open.append([tag, CAPTURE_TAGS[tag], [], link])
+
+    def end(self, tag: str):
+        self._flush_text()
+        if tag in SKIP_TAGS:
+            if tag == "script" and self._ld_parts is not None:
+                self.add_json_ld("".join(self._ld_parts))
+                self._ld_parts = None
+            if self._skip_depth:
+                self._skip_depth -= 1
+            return
+        if self._skip_depth:
+            return
+        if tag in CAPTURE_TAGS:
+            self._close(tag)
+        if tag in VOID_TAGS:
+            return
+        while self._props and self._props[-1][0] >= self._depth:
+            _, item, name, parts = self._props.pop()
+            text = " ".join("".join(parts).split())
+            if text:
+                self._set_prop(item, name, text[:MAX_MICRODATA_TEXT])
+        while self._items and self._items[-1][0] >= self._depth:
+            self._items.pop()
+        self._depth = max(0, self._depth - 1)
+
+    def data(self, data: str):
+        if self._ld_parts is not None:
+            self._ld_parts.append(data)
+            return
+        if self._skip_depth:
+            return
+        if self._open:
+            self._pending.append(data)
+        for prop in self._props:
+            prop[3].append(data)
+
+    def close(self):
+        self._flush_text()
+        for capture in reversed(self._open):
+            self._finish(capture)
+        self._open = []
+        return self.result()
+
+    def scan_tail(self, html: str):
+        # parse parou cedo: JSON-LD no fim do body ainda vale a pena (regex, sem parser)
+        for match in JSON_LD_RE.finditer(html):
+            self.add_json_ld(match.group(1))
+
+    def result(self) -> dict:
+        return {
+            "title": self.title,
+            "meta_description": self.meta_description,
+            "headings": self.headings,
+            "paragraphs": self.paragraphs,
+            "buttons_ctas": self.buttons_ctas,
+            "images": self.images,
+            "json_ld": self.json_ld,
+            "microdata": self.microdata,
+            "opengraph": self.opengraph,
+            "twitter": self.twitter,
+            "links": self.links,
+        }
+
+
+class StdlibDriver(HTMLParser):
+    """Adapta os callbacks do html.parser para a interface target do PageCollector."""
+
+    def __init__(self, collector: PageCollector):
+        super().__init__(convert_charrefs=True)
+        self.collector = collector
+
+    def handle_starttag(self, tag, attrs):
+        self.collector.start(tag, {k: v if v is not None else "" for k, v in attrs})
+
+    def handle_endtag(self, tag):
+        self.collector.end(tag)
+
+    def handle_data(self, data):
+        self.collector.data(data)
+
+
+def _feed(html: str, collector: PageCollector):
+    if etree is not None:
+        parser = etree.HTMLParser(target=collector, recover=True, no_network=True)
+    else:
+        parser = StdlibDriver(collector)
+    for start in range(0, len(html), FEED_CHUNK_CHARS):
+        parser.feed(html[start:start + FEED_CHUNK_CHARS])
+        if collector.done:
+            collector.scan_tail(html[start + FEED_CHUNK_CHARS:])
+            break
+    parser.close()
+    if etree is None:
+        collector.close()
+
+
+def extract_fields_soup(html: str) -> dict:
+    """Extração original com BeautifulSoup + html.parser (fallback e baseline do benchmark)."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    structured = PageCollector()
+    for script in soup.find_all("script", type="application/ld+json"):
+        structured.add_json_ld(script.string or "")
+    for meta in soup.find_all("meta"):
+        structured._meta(meta.attrs)
+    for tag in soup(["script", "style", "nav", "footer", "iframe"]):
+        tag.decompose()
+
+    title = soup.title.string.strip() if soup.title and soup.title.string else ""
+    meta_desc = ""
+    meta_tag = soup.find("meta", attrs={"name": "description"})
+    if meta_tag and meta_tag.get("content"):
+        meta_desc = meta_tag["content"]
+
+    headings = [h.get_text(strip=True) for h in soup.find_all(["h1", "h2", "h3"]) if h.get_text(strip=True)]
+    paragraphs = [p.get_text(strip=True) for p in soup.find_all("p") if len(p.get_text(strip=True)) > MIN_PARAGRAPH_CHARS]
+    buttons = [
+        b.get_text(strip=True)
+        for b in soup.find_all(["button", "a"])
+        if b.get_text(strip=True) and len(b.get_text(strip=True)) < MAX_CTA_CHARS
+    ]
+    images = [{"src": img["src"], "alt": img.get("alt", "")} for img in soup.find_all("img", src=True)[:LIMITS["images"]]]
+    links = [
+        {
+            "href": a["href"].strip(),
+            "cta": bool(CTA_ATTR_RE.search(" ".join(a.get("class") or []) + " " + (a.get("id") or "") + " " + (a.get("role") or ""))),
+            "text": a.get_text(" ", strip=True)[:MAX_CTA_CHARS],
+        }
+        for a in soup.find_all("a", href=True)[:MAX_LINKS]
+    ]
+    return {
+        "title": title,
+        "meta_description": meta_desc,
+        "headings": headings[:LIMITS["headings"]],
+        "paragraphs": paragraphs[:LIMITS["paragraphs"]],
+        "buttons_ctas": buttons[:LIMITS["buttons_ctas"]],
+        "images": images,
+        "json_ld": structured.json_ld,
+        "microdata": [],
+        "opengraph": structured.opengraph,
+        "twitter": structured.twitter,
+        "links": links,
+    }
+
+
+def extract_fields(html: str) -> dict:
+    """Campos brutos da página (imagens ainda com src relativo)."""
+    collector = PageCollector()
+    try:
+        _feed(html, collector)
+    except Exception as e:
+        logger.warning("Extração rápida (%s) falhou, usando BeautifulSoup: %s", PARSER, e)
+        return extract_fields_soup(html)
+    return collector.result()
+
+
+STRUCTURED_MAIN_TYPES = (
+    "Product", "Course", "Book", "SoftwareApplication", "Service", "Event", "VideoObject", "WebPage",
+)
+TAG_RE = re.compile(r"<[^>]+>")
+
+
+def _text(value, limit: int = 300) -> str:
+    if isinstance(value, list):
+        value = value[0] if value else ""
+    if isinstance(value, dict):
+        value = value.get("name") or value.get("@value") or value.get("text") or ""
+    if value is None:
+        return ""
+    return " ".join(TAG_RE.sub(" ", str(value)).split())[:limit]
+
+
+def _types(node: dict) -> set:
+    kind = node.get("@type") or ()
+    return {str(t).rsplit("/", 1)[-1] for t in (kind if isinstance(kind, list) else [kind])}
+
+
+def _as_node(value):
+    """Item de microdata ({type, props}) -> mesmo formato de um nó JSON-LD."""
+    if isinstance(value, list):
+        return [_as_node(v) for v in value]
+    if isinstance(value, dict) and "props" in value and "type" in value:
+        return {"@type": value["type"], **{k: _as_node(v) for k, v in value["props"].items()}}
+    return value
+
+
+def _walk(value, nodes: list, depth: int = 0):
+    if depth > 6 or len(nodes) > 200:
+        return
+    if isinstance(value, list):
+        for v in value:
+            _walk(v, nodes, depth + 1)
+    elif isinstance(value, dict):
+        if _types(value):
+            nodes.append(value)
+        for v in value.values():
+            if isinstance(v, (list, dict)):
+                _walk(v, nodes, depth + 1)
+
+
+def structured_summary(fields: dict) -> dict:
+    """Resumo denso de JSON-LD, microdata, OpenGraph e Twitter cards (só o que veio preenchido)."""
+    nodes: list = []
+    _walk(fields.get("json_ld") or [], nodes)
+    _walk(_as_node(fields.get("microdata") or []), nodes)
+    og = fields.get("opengraph") or {}
+    twitter = fields.get("twitter") or {}
+
+    def first(*types):
+        return next((n for n in nodes if _types(n) & set(types)), None)
+
+    main_type, main = next(((t, n) for t in STRUCTURED_MAIN_TYPES for n in nodes if t in _types(n)), ("", {}))
+    offer = first("Offer", "AggregateOffer") or {}
+    rating = first("AggregateRating") or {}
+    video = first("VideoObject") or {}
+
+    summary = {
+        "type": main_type,
+        "name": _text(main.get("name")) or og.get("og:title") or twitter.get("twitter:title", ""),
+        "description": _text(main.get("description")) or og.get("og:description", "")[:300],
+        "brand": _text(main.get("brand")),
+        "site_name": og.get("og:site_name", ""),
+        "price": _text(offer.get("price") or offer.get("lowPrice")) or og.get("product:price:amount") or og.get("og:price:amount", ""),
+        "high_price": _text(offer.get("highPrice")),
+        "currency": _text(offer.get("priceCurrency")) or og.get("product:price:currency") or og.get("og:price:currency", ""),
+        "availability": _text(offer.get("availability")).rsplit("/", 1)[-1],
+        "rating": _text(rating.get("ratingValue")),
+        "rating_count": _text(rating.get("reviewCount") or rating.get("ratingCount")),
+        "reviews": [
+            {
+                "rating": _text((n.get("reviewRating") or {}).get("ratingValue") if isinstance(n.get("reviewRating"), dict) else ""),
+                "text": _text(n.get("reviewBody") or n.get("description"), 200),
+            }
+            for n in nodes if "Review" in _types(n)
+        ][:3],
+        "faq": [
+            {"question": _text(n.get("name"), 150), "answer": _text(n.get("acceptedAnswer"), 200)}
+            for n in nodes if "Question" in _types(n)
+        ][:5],
+        "video": {k: v for k, v in {
+            "name": _text(video.get("name")),
+            "duration": _text(video.get("duration")),
+        }.items() if v},
+        "sources": [
+            name for name, present in (
+                ("json-ld", fields.get("json_ld")),
+                ("microdata", fields.get("microdata")),
+                ("opengraph", og),
+                ("twitter", twitter),
+            ) if present
+        ],
+    }
+    summary["reviews"] = [r for r in summary["reviews"] if r["text"]]
+    summary["faq"] = [q for q in summary["faq"] if q["question"]]
+    return {k: v for k, v in summary.items() if v}
+
+
+def clean_text_blocks(blocks: list, budget: int = TEXT_BUDGET_CHARS) -> tuple:
+    """
+    Remove boilerplate (cookies, rodapé legal, CNPJ) e blocos quase duplicados
+    (shingles de palavras) e preenche o orçamento de caracteres com o que sobra,
+    na ordem da página. Retorna (blocos mantidos, relatório do que saiu).
+    """
+    kept, kept_shingles = [], []
+    report = {"blocks_in": 0, "boilerplate": 0, "low_density": 0, "near_duplicates": 0, "over_budget": 0}
+    used = chars_in = 0
+    for block in blocks:
+        block = " ".join((block or "").split())
+        if not block:
+            continue
+        report["blocks_in"] += 1
+        chars_in += len(block)
+        if len(block) < 200 and BOILERPLATE_RE.search(block):
+            report["boilerplate"] += 1
+            continue
+        if sum(c.isalpha() for c in block) < len(block) * MIN_LETTER_RATIO:
+            report["low_density"] += 1
+            continue
+        shingles = word_shingles(block)
+        if any(
+            len(shingles & other) >= NEAR_DUP_THRESHOLD * len(shingles | other)
+            or len(shingles & other) >= NEAR_DUP_CONTAINMENT * len(shingles)
+            for other in kept_shingles
+        ):
+            report["near_duplicates"] += 1
+            continue
+        if used + len(block) > budget and kept:
+            report["over_budget"] += 1
+            continue
+        kept.append(block)
+        kept_shingles.append(shingles)
+        used += len(block) + 1
+    chars_kept = min(used, budget)
+    report.update({
+        "blocks_kept": len(kept),
+        "chars_in": chars_in,
+        "chars_kept": chars_kept,
+        "removed_pct": round(100 * (1 - chars_kept / chars_in), 1) if chars_in else 0.0,
+    })
+    return kept, report
+
+
+def extract_page(html: str, url: str) -> dict:
+    """Resultado completo do scrape: campos, imagens absolutas, hook e risco de bloqueio."""
+    fields = extract_fields(html)
+    title = fields["title"]
+    meta_desc = fields["meta_description"]
+    headings = fields["headings"]
+    paragraphs = fields["paragraphs"]
+    buttons = fields["buttons_ctas"]
+
+    images = []
+    for img in fields["images"]:
+        src = img["src"]
+        if src.startswith("//"):
+            src = "https:" + src
+        elif src.startswith("/"):
+            src = urljoin(url, src)
+        images.append({"src": src, "alt": img["alt"]})
+
+    links, seen = [], set()
+    for link in fields["links"]:
+        href = link["href"]
+        if not href or href.startswith(("#", "mailto:", "tel:", "javascript:", "data:")):
+            continue
+        href = urljoin(url, href).split("#", 1)[0]
+        if href.startswith(("http://", "https://")) and href not in seen:
+            seen.add(href)
+            links.append({**link, "href": href})
+
+    kept, cleanup = clean_text_blocks([title, meta_desc] + headings[:5] + paragraphs)
+    kept_set = set(kept)
+    paragraphs = [p for p in (" ".join(p.split()) for p in paragraphs) if p in kept_set]
+    full_text = " ".join(kept)
+    rules = classify_text(full_text)
+    return {
+        "url": url,
+        "title": title,
+        "meta_description": meta_desc,
+        "headings": headings[:10],
+        "paragraphs": paragraphs[:OUTPUT_PARAGRAPHS],
+        "buttons_ctas": buttons[:10],
+        "images": images,
+        "links": links,
+        "hook_type_detected": rules["hook_type"],
+        "block_risk": rules["block_risk"],
+        "text_length": len(full_text),
+        "full_text_preview": full_text[:TEXT_BUDGET_CHARS],
+        "text_cleanup": cleanup,
+        "structured_data": structured_summary(fields),
+    }
+
+
+def word_shingles(text: str, size: int = SHINGLE_WORDS) -> set:
+    words = WORD_RE.findall((text or "").lower())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def shingle_hash(shingle: str) -> int:
+    # 7 bytes: cabe em int64 do Mongo sem virar negativo
+    return int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=7).digest(), "big")
+
+
+def content_fingerprint(page: dict) -> dict:
+    """Hash exato + sketch bottom-k de shingles do texto, headings e CTAs da página."""
+    text = "\n".join([page.get("full_text_preview") or ""] + (page.get("headings") or []) + (page.get("buttons_ctas") or []))
+    normalized = " ".join(WORD_RE.findall(text.lower()))
+    sketch = sorted({shingle_hash(s) for s in word_shingles(normalized)})[:FINGERPRINT_SKETCH_SIZE]
+    return {"hash": hashlib.sha256(normalized.encode()).hexdigest(), "sketch": sketch}
+
+
+def fingerprint_similarity(a: dict, b: dict) -> float:
+    """Estimativa de Jaccard entre duas páginas a partir dos sketches (1.0 = mesmo conteúdo)."""
+    if a.get("hash") == b.get("hash"):
+        return 1.0
+    sa, sb = set(a.get("sketch") or ()), set(b.get("sketch") or ())
+    if not sa or not sb:
+        return 0.0
+    union = sorted(sa | sb)[:FINGERPRINT_SKETCH_SIZE]
+    return sum(1 for h in union if h in sa and h in sb) / len(union)
@@ -8,24 +8,71 @@ import time
 import uuid
 import base64
 import asyncio
+import hashlib
+import random
+import zlib
 import logging
+import threading
+import multiprocessing
 from pathlib import Path
-from datetime import datetime, timezone
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta, timezone
 from typing import List, Optional, Dict, Any
 
 import bcrypt
 import jwt
 import httpx
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 from pydantic import BaseModel
+from bson import Binary, Decimal128, ObjectId
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne, monitoring
+from pymongo.errors import DuplicateKeyError, OperationFailure
 
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, UploadFile, File
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, UploadFile, File, Form
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.datastructures import Headers, MutableHeaders
 from starlette.middleware.cors import CORSMiddleware
 
+from page_extract import EXTRACTOR_VERSION, content_fingerprint, extract_page, fingerprint_similarity
+from ad_import import detect_format, iter_ads, next_batch
+from term_rules import run_compliance_check
+
+# --- Optional: orjson (serialização rápida das respostas grandes) ---
+try:
+    import orjson
+except Exception:  # pragma: no cover
+    orjson = None
+
+# --- Optional: brotli (compressão br quando o cliente aceita) ---
+try:
+    import brotli
+except Exception:  # pragma: no cover
+    brotli = None
+
+# --- Optional: zstandard (arquivamento de saídas antigas; fallback zlib) ---
+try:
+    import zstandard
+except Exception:  # pragma: no cover
+    zstandard = None
+
+# --- Optional: h2 (HTTP/2 no cliente de saída) ---
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except Exception:  # pragma: no cover
+    HTTP2_AVAILABLE = False
+
+# --- Optional: charset_normalizer (detecção de charset quando a página não declara) ---
+try:
+    from charset_normalizer import from_bytes as detect_charset
+except Exception:  # pragma: no cover
+    detect_charset = None
+
 # --- Optional: Emergent Claude wrapper (se você usa EMERGENT_LLM_KEY) ---
 try:
     from emergentintegrations.llm.chat import LlmChat, UserMessage
@@ -52,6 +99,176 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# --- Metrics ---
+class LatencyHistogram:
+    BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(self.BUCKETS_MS) + 1)
+
+    def observe(self, ms: float, error: bool = False):
+        self.count += 1
+        self.errors += int(error)
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        for i, bound in enumerate(self.BUCKETS_MS):
+            if ms <= bound:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def snapshot(self) -> dict:
+        labels = [f"le_{b}ms" for b in self.BUCKETS_MS] + ["gt_max"]
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(self.total_ms / self.count, 2) if self.count else 0,
+            "max_ms": round(self.max_ms, 2),
+            "buckets": dict(zip(labels, self.buckets)),
+        }
+
+
+# --- MongoDB monitoring ---
+MONGO_SLOW_QUERY_MS = float(os.environ.get("MONGO_SLOW_QUERY_MS", "100"))
+
+
+def query_shape(value: Any) -> Any:
+    # mantém operadores/chaves e troca valores por "?" (sem vazar dados no log)
+    if isinstance(value, dict):
+        return {k: query_shape(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [query_shape(v) for v in value[:3]]
+    return "?"
+
+
+def command_filter(command: dict) -> Any:
+    for key in ("filter", "query"):
+        if key in command:
+            return command[key]
+    for key, inner in (("updates", "q"), ("deletes", "q")):
+        if command.get(key):
+            return command[key][0].get(inner)
+    pipeline = command.get("pipeline") or []
+    if pipeline and isinstance(pipeline[0], dict) and "$match" in pipeline[0]:
+        return pipeline[0]["$match"]
+    return None
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    # chamado nas threads do Motor: todo estado compartilhado passa pelo lock
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: Dict[tuple, tuple] = {}
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.slow_count = 0
+
+    def started(self, event):
+        value = event.command.get(event.command_name)
+        collection = event.command.get("collection") if event.command_name == "getMore" else value
+        if not isinstance(collection, str):
+            collection = "-"
+        shape = query_shape(command_filter(event.command))
+        with self._lock:
+            self._inflight[(event.connection_id, event.request_id)] = (collection, shape)
+
+    def _finish(self, event, error: bool):
+        with self._lock:
+            collection, shape = self._inflight.pop((event.connection_id, event.request_id), ("-", None))
+            key = f"{collection}.{event.command_name}"
+            histogram = self.histograms.setdefault(key, LatencyHistogram())
+            ms = event.duration_micros / 1000
+            histogram.observe(ms, error)
+            slow = ms >= MONGO_SLOW_QUERY_MS
+            if slow:
+                self.slow_count += 1
+        if slow:
+            logger.warning("Mongo lento: %s %.1fms filtro=%s", key, ms, json.dumps(shape, default=str))
+
+    def succeeded(self, event):
+        self._finish(event, error=False)
+
+    def failed(self, event):
+        self._finish(event, error=True)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "slow_query_ms": MONGO_SLOW_QUERY_MS,
+                "slow_count": self.slow_count,
+                "commands": {k: h.snapshot() for k, h in sorted(self.histograms.items())},
+            }
+
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.checkout_wait = LatencyHistogram()
+        self.checkout_failures: Dict[str, int] = {}
+        self.checked_out = 0
+        self.connections_created = 0
+        self.connections_closed = 0
+
+    def connection_check_out_started(self, event):
+        # início e fim do checkout acontecem na mesma thread
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        started = getattr(self._local, "started", None)
+        with self._lock:
+            self.checked_out += 1
+            if started is not None:
+                self.checkout_wait.observe((time.perf_counter() - started) * 1000)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            reason = str(event.reason)
+            self.checkout_failures[reason] = self.checkout_failures.get(reason, 0) + 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_created += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_closed += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checked_out": self.checked_out,
+                "open_connections": self.connections_created - self.connections_closed,
+                "checkout_wait": self.checkout_wait.snapshot(),
+                "checkout_failures": dict(self.checkout_failures),
+            }
+
+
+mongo_command_metrics = MongoCommandMetrics()
+mongo_pool_metrics = MongoPoolMetrics()
+
 # --- MongoDB ---
 mongo_url = os.environ.get("MONGO_URL")
 db_name = os.environ.get("DB_NAME")
@@ -59,18 +276,61 @@ db_name = os.environ.get("DB_NAME")
 if not mongo_url or not db_name:
     raise RuntimeError("Env vars ausentes: MONGO_URL e/ou DB_NAME")
 
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(
+    mongo_url,
+    maxPoolSize=int(os.environ.get("MONGO_MAX_POOL_SIZE", "100")),
+    minPoolSize=int(os.environ.get("MONGO_MIN_POOL_SIZE", "0")),
+    maxIdleTimeMS=int(os.environ.get("MONGO_MAX_IDLE_MS", "300000")),
+    waitQueueTimeoutMS=int(os.environ.get("MONGO_WAIT_QUEUE_TIMEOUT_MS", "10000")),
+    serverSelectionTimeoutMS=int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", "10000")),
+    connectTimeoutMS=int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS", "10000")),
+    socketTimeoutMS=int(os.environ.get("MONGO_SOCKET_TIMEOUT_MS", "30000")),
+    event_listeners=[mongo_command_metrics, mongo_pool_metrics],
+)
 db = client[db_name]
 
 # --- JWT ---
 JWT_SECRET = os.environ.get("JWT_SECRET", "adoperator_jwt_secret_2024_xK9mP2")
 JWT_ALGORITHM = "HS256"
 
+# --- Metrics access ---
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
 # --- LLM ---
 EMERGENT_KEY = os.environ.get("EMERGENT_LLM_KEY")  # Claude via emergentintegrations
 # OPENAI_API_KEY: usado se você implementar OpenAI direto; aqui não é obrigatório.
-
-app = FastAPI()
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "8"))
+# todas as chamadas ao LLM passam por aqui (lotes não estouram o rate limit da conta)
+llm_slots = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+# --- JSON responses ---
+def mongo_json_default(value: Any) -> Any:
+    if isinstance(value, (ObjectId, Decimal128)):
+        return str(value)
+    if isinstance(value, (bytes, bytearray)):
+        return base64.b64encode(value).decode()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+
+def dump_json(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=mongo_json_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=mongo_json_default).encode()
+
+
+class MongoJSONResponse(JSONResponse):
+    # rotas quentes devolvem esta resposta direto, pulando o jsonable_encoder do FastAPI
+    def render(self, content: Any) -> bytes:
+        return dump_json(content)
+
+
+app = FastAPI(default_response_class=MongoJSONResponse)
 api_router = APIRouter(prefix="/api")
 security = HTTPBearer(auto_error=False)
 
@@ -101,6 +361,20 @@ class ProductInput(BaseModel):
 
 class CompetitorURLInput(BaseModel):
     url: str
+    force: bool = False
+    crawl: bool = False
+    max_pages: Optional[int] = None
+    max_depth: Optional[int] = None
+
+
+class CompetitorBatchInput(BaseModel):
+    urls: List[str]
+    force: bool = False
+
+
+class CompetitorTrackInput(BaseModel):
+    url: str
+    interval_hours: float = 24
 
 
 class CreativeGenerationInput(BaseModel):
@@ -127,40 +401,6 @@ class ImageAnalysisInput(BaseModel):
     compare_with_analysis_id: Optional[str] = ""
 
 
-# -----------------------------
-# Compliance Checker
-# -----------------------------
-RISKY_TERMS = {
-    "cura": "Use 'auxilia no tratamento' ou 'contribui para melhora'",
-    "curar": "Use 'auxiliar no tratamento'",
-    "elimina": "Use 'ajuda a reduzir' ou 'contribui para diminuir'",
-    "remove": "Use 'auxilia na redução' ou 'contribui para minimizar'",
-    "100%": "Evite porcentagens absolutas. Use 'alta eficácia'",
-    "garantido": "Use 'resultados variam' / 'compromisso com qualidade'",
-    "milagroso": "Evite. Use termos mais moderados",
-    "sem efeitos colaterais": "Use 'bem tolerado' / 'perfil favorável'",
-    "nunca mais": "Evite promessa absoluta",
-    "para sempre": "Evite promessa absoluta",
-}
-HIGH_SEVERITY = {"cura", "curar", "100%", "milagroso", "sem efeitos colaterais", "nunca mais", "para sempre"}
-
-
-def run_compliance_check(text: str) -> dict:
-    text_lower = (text or "").lower()
-    risks = []
-    for term, suggestion in RISKY_TERMS.items():
-        if term.lower() in text_lower:
-            risks.append(
-                {
-                    "termo": term,
-                    "sugestao": suggestion,
-                    "severidade": "alta" if term in HIGH_SEVERITY else "media",
-                }
-            )
-    score = max(0, 100 - len(risks) * 15)
-    return {"riscos": risks, "score": score, "total_riscos": len(risks)}
-
-
 # -----------------------------
 # Auth helpers
 # -----------------------------
@@ -178,9 +418,12 @@ async def get_current_user(
 ):
     if not credentials:
         raise HTTPException(status_code=401, detail="Token não fornecido")
+    return await get_user_from_token(credentials.credentials)
+
 
+async def get_user_from_token(token: str):
     try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
         user = await db.users.find_one({"id": payload["user_id"]}, {"_id": 0})
         if not user:
             raise HTTPException(status_code=401, detail="Usuário não encontrado")
@@ -191,6 +434,18 @@ async def get_current_user(
         raise HTTPException(status_code=401, detail="Token inválido")
 
 
+async def require_metrics_access(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+):
+    # com METRICS_TOKEN definido, só o header x-metrics-token libera; senão, qualquer usuário logado
+    if METRICS_TOKEN:
+        if request.headers.get("x-metrics-token") != METRICS_TOKEN:
+            raise HTTPException(status_code=403, detail="Acesso às métricas negado")
+        return
+    await get_current_user(credentials)
+
+
 # -----------------------------
 # Language instructions
 # -----------------------------
@@ -219,7 +474,8 @@ async def call_claude(system_message: str, user_text: str, session_id: str, lang
         .with_model("anthropic", "claude-sonnet-4-5-20250929")
     )
 
-    response = await chat.send_message(UserMessage(text=user_text))
+    async with llm_slots:
+        response = await chat.send_message(UserMessage(text=user_text))
 
     text = (response or "").strip()
     if text.startswith("```json"):
@@ -283,64 +539,421 @@ async def get_me(user=Depends(get_current_user)):
     return {"id": user["id"], "name": user["name"], "email": user["email"]}
 
 
+# -----------------------------
+# In-memory caches
+# -----------------------------
+class LRUCache:
+    def __init__(self, maxsize: int, ttl_seconds: float):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: str):
+        self._data.pop(key, None)
+
+    def pop_where(self, predicate):
+        for key in [k for k, (_, v) in self._data.items() if predicate(v)]:
+            del self._data[key]
+
+
+PUBLIC_CACHE_SIZE = int(os.environ.get("PUBLIC_CACHE_SIZE", "512"))
+PUBLIC_CACHE_TTL_SECONDS = float(os.environ.get("PUBLIC_CACHE_TTL_SECONDS", "60"))
+
+# token público -> corpo JSON pronto + ETag (invalidado a cada escrita na análise)
+public_share_cache = LRUCache(PUBLIC_CACHE_SIZE, PUBLIC_CACHE_TTL_SECONDS)
+
+
+STATS_CACHE_TTL_SECONDS = float(os.environ.get("STATS_CACHE_TTL_SECONDS", "30"))
+
+# user_id -> agregados do dashboard
+stats_cache = LRUCache(1024, STATS_CACHE_TTL_SECONDS)
+
+
+def invalidate_public_analysis(analysis_id: str):
+    public_share_cache.pop_where(lambda entry: entry["analysis_id"] == analysis_id)
+
+
+# -----------------------------
+# Analysis data access
+# (leituras/escritas com filtro de dono, uma ida ao banco por operação)
+# -----------------------------
+# análises marcadas para remoção (tombstone) ficam invisíveis para todas as rotas
+LIVE_ANALYSIS = {"deleted_at": {"$exists": False}}
+
+
+async def get_owned_analysis(analysis_id: str, user_id: str, projection: Optional[dict] = None) -> dict:
+    analysis = await db.analyses.find_one(
+        {"id": analysis_id, "user_id": user_id, **LIVE_ANALYSIS}, projection or {"_id": 0}
+    )
+    if not analysis:
+        raise HTTPException(status_code=404, detail="Análise não encontrada")
+    return analysis
+
+
+async def update_owned_analysis(
+    analysis_id: str,
+    user_id: str,
+    update: Any,
+    projection: Optional[dict] = None,
+    extra_filter: Optional[dict] = None,
+) -> Optional[dict]:
+    updated = await db.analyses.find_one_and_update(
+        {"id": analysis_id, "user_id": user_id, **LIVE_ANALYSIS, **(extra_filter or {})},
+        update,
+        projection=projection or {"_id": 0, "id": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if updated is not None:
+        invalidate_public_analysis(analysis_id)
+        stats_cache.pop(user_id)
+    return updated
+
+
+# -----------------------------
+# Archived payloads
+# (saídas antigas ficam comprimidas em <campo>_z; leitura transparente)
+# -----------------------------
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", "30"))
+ARCHIVE_BATCH_SIZE = int(os.environ.get("ARCHIVE_BATCH_SIZE", "200"))
+ARCHIVE_SWEEP_INTERVAL_SECONDS = int(os.environ.get("ARCHIVE_SWEEP_INTERVAL_SECONDS", "3600"))
+ARCHIVE_TOUCH_INTERVAL_HOURS = int(os.environ.get("ARCHIVE_TOUCH_INTERVAL_HOURS", "24"))
+ARCHIVE_STATS_ID = "archive_stats"
+# campos de controle do arquivamento: nunca saem na API nem viram evento de live update
+ARCHIVE_BOOKKEEPING_FIELDS = ("archived_at", "raw_bytes", "stored_bytes", "codec", "last_accessed_at")
+
+
+def compress_json(value: Any) -> tuple:
+    raw = dump_json(value)
+    if zstandard is not None:
+        return "zstd", raw, zstandard.ZstdCompressor(level=10).compress(raw)
+    return "zlib", raw, zlib.compress(raw, 9)
+
+
+def decompress_json(packed: bytes, codec: str) -> Any:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Payload arquivado com zstd, mas zstandard não está instalado")
+        raw = zstandard.ZstdDecompressor().decompress(packed)
+    else:
+        raw = zlib.decompress(packed)
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
+def unpack_archived(doc: dict, field: str) -> Any:
+    packed = doc.pop(f"{field}_z", None)
+    codec = doc.get("codec") or "zlib"
+    for key in ARCHIVE_BOOKKEEPING_FIELDS:
+        doc.pop(key, None)
+    if packed is None:
+        return doc.get(field)
+    return decompress_json(bytes(packed), codec)
+
+
+async def touch_accessed(collection, query: dict):
+    """Marca leitura em last_accessed_at (no máximo uma escrita por documento a cada ARCHIVE_TOUCH_INTERVAL_HOURS)."""
+    now = datetime.now(timezone.utc)
+    stale = (now - timedelta(hours=ARCHIVE_TOUCH_INTERVAL_HOURS)).isoformat()
+    try:
+        await collection.update_many(
+            {**query, "$or": [{"last_accessed_at": {"$lt": stale}}, {"last_accessed_at": {"$exists": False}}]},
+            {"$set": {"last_accessed_at": now.isoformat()}},
+        )
+    except Exception as e:
+        logger.warning("Falha ao registrar acesso em %s: %s", collection.name, e)
+
+
+# -----------------------------
+# Stage output store
+# (saídas das etapas ficam em stage_outputs; a análise guarda só referências)
+# -----------------------------
+STAGE_FIELDS = ("strategic_analysis", "ad_variations", "audience_simulation", "decision", "market_comparison")
+ANALYSIS_LIST_PROJECTION = {"_id": 0, **{field: 0 for field in STAGE_FIELDS}}
+STAGE_MIGRATION_BATCH = 200
+
+
+async def load_stage_outputs(analysis: dict, stages: tuple = STAGE_FIELDS) -> dict:
+    refs = analysis.get("stages") or {}
+    wanted = [{"stage": s, "revision": refs[s]["revision"]} for s in stages if s in refs]
+
+    outputs = {}
+    if wanted:
+        cursor = db.stage_outputs.find(
+            {"analysis_id": analysis["id"], "$or": wanted},
+            {"_id": 0, "stage": 1, "output": 1, "output_z": 1, "codec": 1},
+        )
+        async for item in cursor:
+            outputs[item["stage"]] = unpack_archived(item, "output")
+        spawn_background(
+            touch_accessed(db.stage_outputs, {"analysis_id": analysis["id"], "$and": [{"$or": wanted}]}),
+            "stage-outputs-touch",
+        )
+
+    for stage in stages:
+        # documentos antigos (pré-migração) ainda podem ter a saída inline
+        analysis[stage] = outputs.get(stage, analysis.get(stage))
+    return analysis
+
+
+async def save_stage_output(
+    analysis: dict,
+    stage: str,
+    output: Any,
+    status: Optional[str] = None,
+    summary: Optional[dict] = None,
+) -> int:
+    current = ((analysis.get("stages") or {}).get(stage) or {}).get("revision", 0)
+    revision = current + 1
+    now = datetime.now(timezone.utc).isoformat()
+
+    try:
+        await db.stage_outputs.insert_one(
+            {
+                "analysis_id": analysis["id"],
+                "stage": stage,
+                "revision": revision,
+                "output": output,
+                "created_at": now,
+            }
+        )
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Etapa atualizada por outra requisição. Recarregue a análise.")
+
+    update: Dict[str, Any] = {
+        "$set": {f"stages.{stage}": {"revision": revision, "updated_at": now}},
+        "$unset": {stage: ""},
+    }
+    if status:
+        update["$set"]["status"] = status
+    # escalares pequenos copiados para a análise (usados nas agregações do dashboard)
+    update["$set"].update(summary or {})
+    ref_filter = {f"stages.{stage}.revision": current} if current else {f"stages.{stage}": {"$exists": False}}
+    updated = await update_owned_analysis(analysis["id"], analysis["user_id"], update, extra_filter=ref_filter)
+    if not updated:
+        # análise removida (ou etapa sobrescrita) durante a chamada da IA
+        await db.stage_outputs.delete_one({"analysis_id": analysis["id"], "stage": stage, "revision": revision})
+        raise HTTPException(status_code=409, detail="Etapa atualizada por outra requisição. Recarregue a análise.")
+    return revision
+
+
+async def migrate_inline_stage_outputs(batch_size: int = STAGE_MIGRATION_BATCH) -> int:
+    legacy_filter = {"$or": [{field: {"$exists": True}} for field in STAGE_FIELDS]}
+    projection = {"_id": 0, "id": 1, "stages": 1, **{field: 1 for field in STAGE_FIELDS}}
+    migrated = 0
+
+    while True:
+        batch = await db.analyses.find(legacy_filter, projection).to_list(batch_size)
+        if not batch:
+            break
+
+        now = datetime.now(timezone.utc).isoformat()
+        output_ops = []
+        analysis_ops = []
+        for doc in batch:
+            refs = doc.get("stages") or {}
+            set_refs = {}
+            for field in STAGE_FIELDS:
+                if doc.get(field) is None or field in refs:
+                    continue
+                output_ops.append(
+                    UpdateOne(
+                        {"analysis_id": doc["id"], "stage": field, "revision": 1},
+                        {"$setOnInsert": {"output": doc[field], "created_at": now}},
+                        upsert=True,
+                    )
+                )
+                set_refs[f"stages.{field}"] = {"revision": 1, "updated_at": now}
+                if field == "strategic_analysis" and isinstance(doc[field], dict):
+                    score = (doc[field].get("compliance") or {}).get("score")
+                    if score is not None:
+                        set_refs["compliance_score"] = score
+
+            update: Dict[str, Any] = {"$unset": {field: "" for field in STAGE_FIELDS if field in doc}}
+            if set_refs:
+                update["$set"] = set_refs
+            analysis_ops.append(UpdateOne({"id": doc["id"]}, update))
+
+        # saídas primeiro: uma análise nunca referencia uma revisão inexistente
+        if output_ops:
+            await db.stage_outputs.bulk_write(output_ops, ordered=False)
+        await db.analyses.bulk_write(analysis_ops, ordered=False)
+        migrated += len(batch)
+
+    return migrated
+
+
+async def backfill_compliance_scores(batch_size: int = STAGE_MIGRATION_BATCH) -> int:
+    # análises migradas antes de compliance_score existir na análise
+    missing = {"stages.strategic_analysis": {"$exists": True}, "compliance_score": {"$exists": False}}
+    filled = 0
+    while True:
+        batch = await db.analyses.find(missing, {"_id": 0, "id": 1, "stages": 1}).to_list(batch_size)
+        if not batch:
+            break
+        ops = []
+        for doc in batch:
+            await load_stage_outputs(doc, ("strategic_analysis",))
+            score = ((doc.get("strategic_analysis") or {}).get("compliance") or {}).get("score")
+            ops.append(UpdateOne({"id": doc["id"]}, {"$set": {"compliance_score": score}}))
+        await db.analyses.bulk_write(ops, ordered=False)
+        filled += len(ops)
+    return filled
+
+
 # -----------------------------
 # Analyses CRUD
 # -----------------------------
 @api_router.post("/analyses")
-async def create_analysis(product: ProductInput, user=Depends(get_current_user)):
+async def create_analysis(product: ProductInput, request: Request, user=Depends(get_current_user)):
     analysis_id = str(uuid.uuid4())
     doc = {
         "id": analysis_id,
         "user_id": user["id"],
         "product": product.model_dump(),
-        "strategic_analysis": None,
-        "ad_variations": None,
-        "audience_simulation": None,
-        "decision": None,
+        "language": request.headers.get("x-language", "pt"),
+        "stages": {},
         "status": "created",
         "created_at": datetime.now(timezone.utc).isoformat(),
     }
     await db.analyses.insert_one(doc)
     doc.pop("_id", None)
-    return doc
+    stats_cache.pop(user["id"])
+    return {**doc, **{field: None for field in STAGE_FIELDS}}
 
 
 @api_router.get("/analyses")
 async def list_analyses(user=Depends(get_current_user)):
     analyses = (
-        await db.analyses.find({"user_id": user["id"]}, {"_id": 0})
+        await db.analyses.find({"user_id": user["id"], **LIVE_ANALYSIS}, ANALYSIS_LIST_PROJECTION)
         .sort("created_at", -1)
         .to_list(100)
     )
-    return analyses
+    return MongoJSONResponse(analyses)
 
 
 @api_router.get("/analyses/{analysis_id}")
 async def get_analysis(analysis_id: str, user=Depends(get_current_user)):
-    analysis = await db.analyses.find_one({"id": analysis_id, "user_id": user["id"]}, {"_id": 0})
-    if not analysis:
-        raise HTTPException(status_code=404, detail="Análise não encontrada")
-    return analysis
+    analysis = await get_owned_analysis(analysis_id, user["id"])
+    return MongoJSONResponse(await load_stage_outputs(analysis))
 
 
 @api_router.delete("/analyses/{analysis_id}")
 async def delete_analysis(analysis_id: str, user=Depends(get_current_user)):
-    result = await db.analyses.delete_one({"id": analysis_id, "user_id": user["id"]})
-    if result.deleted_count == 0:
+    now = datetime.now(timezone.utc).isoformat()
+    tombstoned = await update_owned_analysis(
+        analysis_id,
+        user["id"],
+        {"$set": {"deleted_at": now, "deletion": {"state": "pending", "updated_at": now}}},
+    )
+    if not tombstoned:
         raise HTTPException(status_code=404, detail="Análise não encontrada")
-    return {"success": True}
+    spawn_background(reap_analysis(analysis_id), f"reap-{analysis_id}")
+    return {"success": True, "deletion": "pending"}
 
 
-@api_router.patch("/analyses/{analysis_id}/product")
-async def update_analysis_product(analysis_id: str, product: ProductInput, user=Depends(get_current_user)):
-    analysis = await db.analyses.find_one({"id": analysis_id, "user_id": user["id"]}, {"_id": 0})
+@api_router.get("/analyses/{analysis_id}/deletion")
+async def get_analysis_deletion(analysis_id: str, user=Depends(get_current_user)):
+    analysis = await db.analyses.find_one(
+        {"id": analysis_id, "user_id": user["id"], "deleted_at": {"$exists": True}},
+        {"_id": 0, "deletion": 1, "deleted_at": 1},
+    )
     if not analysis:
         raise HTTPException(status_code=404, detail="Análise não encontrada")
+    return {"deleted_at": analysis["deleted_at"], **(analysis.get("deletion") or {})}
 
-    await db.analyses.update_one({"id": analysis_id}, {"$set": {"product": product.model_dump()}})
+
+@api_router.patch("/analyses/{analysis_id}/product")
+async def update_analysis_product(analysis_id: str, product: ProductInput, user=Depends(get_current_user)):
+    updated = await update_owned_analysis(analysis_id, user["id"], {"$set": {"product": product.model_dump()}})
+    if not updated:
+        raise HTTPException(status_code=404, detail="Análise não encontrada")
     return {"success": True}
 
 
+# -----------------------------
+# Dashboard stats
+# -----------------------------
+def facet_counts(rows: List[dict]) -> Dict[str, int]:
+    return {str(row["_id"] if row["_id"] is not None else "desconhecido"): row["count"] for row in rows}
+
+
+@api_router.get("/stats")
+async def get_stats(user=Depends(get_current_user)):
+    cached = stats_cache.get(user["id"])
+    if cached is not None:
+        return cached
+
+    analyses_pipeline = [
+        {"$match": {"user_id": user["id"], **LIVE_ANALYSIS}},
+        {"$facet": {
+            "by_status": [{"$group": {"_id": "$status", "count": {"$sum": 1}}}],
+            "by_niche": [
+                {"$group": {"_id": "$product.nicho", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1}},
+                {"$limit": 20},
+            ],
+            "by_language": [{"$group": {"_id": {"$ifNull": ["$language", "pt"]}, "count": {"$sum": 1}}}],
+            "totals": [{"$group": {
+                "_id": None,
+                "total": {"$sum": 1},
+                "completed": {"$sum": {"$cond": [{"$eq": ["$status", "completed"]}, 1, 0]}},
+                "avg_compliance": {"$avg": "$compliance_score"},
+            }}],
+        }},
+    ]
+    # criativos de análises em remoção (tombstone ainda não processado pelo reaper) ficam de fora;
+    # tombstones são poucos e transitórios, e o índice esparso de deleted_at cobre a busca
+    tombstoned = await db.analyses.distinct("id", {"user_id": user["id"], "deleted_at": {"$exists": True}})
+    creatives_match: Dict[str, Any] = {"user_id": user["id"]}
+    if tombstoned:
+        creatives_match["analysis_id"] = {"$nin": tombstoned}
+    creatives_pipeline = [
+        {"$match": creatives_match},
+        {"$group": {"_id": "$provider", "count": {"$sum": 1}}},
+    ]
+    analyses_agg, creatives_agg = await asyncio.gather(
+        db.analyses.aggregate(analyses_pipeline).to_list(1),
+        db.creatives.aggregate(creatives_pipeline).to_list(50),
+    )
+
+    facets = analyses_agg[0] if analyses_agg else {}
+    totals = (facets.get("totals") or [{}])[0]
+    total = totals.get("total", 0)
+    completed = totals.get("completed", 0)
+    avg_compliance = totals.get("avg_compliance")
+
+    stats = {
+        "total_analyses": total,
+        "completed": completed,
+        "completion_rate": round(completed / total * 100, 1) if total else 0,
+        "avg_compliance_score": round(avg_compliance, 1) if avg_compliance is not None else None,
+        "by_status": facet_counts(facets.get("by_status", [])),
+        "by_niche": facet_counts(facets.get("by_niche", [])),
+        "by_language": facet_counts(facets.get("by_language", [])),
+        "creatives_by_provider": facet_counts(creatives_agg),
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+    }
+    stats_cache.set(user["id"], stats)
+    return stats
+
+
 # -----------------------------
 # Compliance endpoint
 # -----------------------------
@@ -354,26 +967,301 @@ async def check_compliance_endpoint(data: ComplianceCheckInput):
 # -----------------------------
 @api_router.post("/analyses/{analysis_id}/share")
 async def share_analysis(analysis_id: str, user=Depends(get_current_user)):
-    analysis = await db.analyses.find_one({"id": analysis_id, "user_id": user["id"]}, {"_id": 0})
-    if not analysis:
+    # pipeline update: mantém o token existente ou grava um novo, em uma só ida ao banco
+    updated = await update_owned_analysis(
+        analysis_id,
+        user["id"],
+        [{"$set": {"public_token": {"$ifNull": ["$public_token", str(uuid.uuid4())[:12]]}}}],
+        projection={"_id": 0, "public_token": 1},
+    )
+    if not updated:
         raise HTTPException(status_code=404, detail="Análise não encontrada")
+    return {"public_token": updated["public_token"]}
 
-    public_token = analysis.get("public_token")
-    if not public_token:
-        public_token = str(uuid.uuid4())[:12]
-        await db.analyses.update_one({"id": analysis_id}, {"$set": {"public_token": public_token}})
 
-    return {"public_token": public_token}
+# só o que a página pública usa (produto, status e veredito)
+PUBLIC_ANALYSIS_PROJECTION = {"_id": 0, "id": 1, "product": 1, "status": 1, "created_at": 1, "stages.decision": 1, "decision": 1}
+PUBLIC_CACHE_CONTROL = "public, max-age=60, stale-while-revalidate=300"
 
 
 @api_router.get("/public/{token}")
-async def get_public_analysis(token: str):
-    analysis = await db.analyses.find_one({"public_token": token}, {"_id": 0})
-    if not analysis:
-        raise HTTPException(status_code=404, detail="Análise não encontrada")
+async def get_public_analysis(token: str, request: Request):
+    entry = public_share_cache.get(token)
+    if entry is None:
+        analysis = await db.analyses.find_one({"public_token": token, **LIVE_ANALYSIS}, PUBLIC_ANALYSIS_PROJECTION)
+        if not analysis:
+            raise HTTPException(status_code=404, detail="Análise não encontrada")
+
+        await load_stage_outputs(analysis, ("decision",))
+        analysis_id = analysis.pop("id")
+        analysis.pop("stages", None)
+        body = dump_json(analysis)
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        entry = {"analysis_id": analysis_id, "body": body, "etag": etag}
+        public_share_cache.set(token, entry)
+
+    headers = {"ETag": entry["etag"], "Cache-Control": PUBLIC_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match", ""), entry["etag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry["body"], media_type="application/json", headers=headers)
 
-    analysis.pop("user_id", None)
-    return analysis
+
+# -----------------------------
+# Outbound HTTP client
+# (um único AsyncClient por processo: pool de conexões, DNS e sessões TLS reaproveitados)
+# -----------------------------
+HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.environ.get("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY_SECONDS", "30"))
+HTTP_PER_HOST_CONNECTIONS = int(os.environ.get("HTTP_PER_HOST_CONNECTIONS", "6"))
+HTTP_MAX_TRACKED_HOSTS = int(os.environ.get("HTTP_MAX_TRACKED_HOSTS", "1024"))
+HTTP_TIMEOUT_SECONDS = float(os.environ.get("HTTP_TIMEOUT_SECONDS", "15"))
+BROWSER_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+
+
+class OutboundHttp:
+    def __init__(self):
+        self.client: Optional[httpx.AsyncClient] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._host_in_use: Dict[str, int] = {}  # requests com o semáforo na mão ou esperando por ele
+        self.requests_sent = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+        self.latency: "OrderedDict[str, LatencyHistogram]" = OrderedDict()
+
+    def start(self):
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                follow_redirects=True,
+                timeout=HTTP_TIMEOUT_SECONDS,
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+                ),
+                headers={"User-Agent": BROWSER_USER_AGENT},
+            )
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    @asynccontextmanager
+    async def _slot(self, host: str):
+        slot = self._host_slots.get(host)
+        if slot is None:
+            if len(self._host_slots) >= HTTP_MAX_TRACKED_HOSTS:
+                # descarta só semáforos sem ninguém usando nem esperando; um semáforo
+                # parcialmente ocupado recriado do zero deixaria passar do limite por host
+                self._host_slots = {h: s for h, s in self._host_slots.items() if self._host_in_use.get(h)}
+            slot = self._host_slots[host] = asyncio.Semaphore(HTTP_PER_HOST_CONNECTIONS)
+        self._host_in_use[host] = self._host_in_use.get(host, 0) + 1
+        try:
+            async with slot:
+                yield
+        finally:
+            remaining = self._host_in_use[host] - 1
+            if remaining:
+                self._host_in_use[host] = remaining
+            else:
+                del self._host_in_use[host]
+
+    def _observe(self, host: str, elapsed_ms: float):
+        histogram = self.latency.get(host)
+        if histogram is None:
+            histogram = self.latency[host] = LatencyHistogram()
+            while len(self.latency) > HTTP_MAX_TRACKED_HOSTS:
+                self.latency.popitem(last=False)
+        else:
+            self.latency.move_to_end(host)
+        histogram.observe(elapsed_ms)
+
+    async def _trace(self, event_name: str, info: dict):
+        if event_name in ("http11.send_request_headers.started", "http2.send_request_headers.started"):
+            self.requests_sent += 1
+        elif event_name == "connection.connect_tcp.complete":
+            self.connections_opened += 1
+        elif event_name == "connection.start_tls.complete":
+            self.tls_handshakes += 1
+
+    async def get(self, url: str, headers: Optional[dict] = None, timeout: Optional[float] = None) -> httpx.Response:
+        self.start()
+        host = httpx.URL(url).host or "-"
+        started = time.perf_counter()
+        async with self._slot(host):
+            try:
+                return await self.client.get(
+                    url,
+                    headers=headers,
+                    timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+                    extensions={"trace": self._trace},
+                )
+            finally:
+                self._observe(host, (time.perf_counter() - started) * 1000)
+
+    @asynccontextmanager
+    async def stream(self, url: str, headers: Optional[dict] = None):
+        self.start()
+        host = httpx.URL(url).host or "-"
+        started = time.perf_counter()
+        async with self._slot(host):
+            try:
+                async with self.client.stream("GET", url, headers=headers, extensions={"trace": self._trace}) as resp:
+                    yield resp
+            finally:
+                self._observe(host, (time.perf_counter() - started) * 1000)
+
+    def snapshot(self) -> dict:
+        reused = max(0, self.requests_sent - self.connections_opened)
+        slowest = sorted(self.latency.items(), key=lambda kv: kv[1].total_ms, reverse=True)[:20]
+        return {
+            "http2": HTTP2_AVAILABLE,
+            "requests_sent": self.requests_sent,
+            "connections_opened": self.connections_opened,
+            "tls_handshakes": self.tls_handshakes,
+            "connection_reuse_rate": round(reused / self.requests_sent, 3) if self.requests_sent else None,
+            "hosts": {host: h.snapshot() for host, h in slowest},
+        }
+
+
+outbound_http = OutboundHttp()
+
+
+# -----------------------------
+# Parse pool (extração de HTML fora do event loop)
+# -----------------------------
+PARSE_POOL_WORKERS = int(os.environ.get("PARSE_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+PARSE_POOL_MAX_TASKS_PER_CHILD = int(os.environ.get("PARSE_POOL_MAX_TASKS_PER_CHILD", "500"))
+PARSE_MAX_INPUT_CHARS = int(os.environ.get("PARSE_MAX_INPUT_CHARS", str(5 * 1024 * 1024)))
+PARSE_INLINE_MAX_CHARS = int(os.environ.get("PARSE_INLINE_MAX_CHARS", str(32 * 1024)))
+PARSE_TIMEOUT_SECONDS = float(os.environ.get("PARSE_TIMEOUT_SECONDS", "10"))
+PARSE_FALLBACK_CHARS = int(os.environ.get("PARSE_FALLBACK_CHARS", str(256 * 1024)))
+LOOP_LAG_INTERVAL_SECONDS = float(os.environ.get("LOOP_LAG_INTERVAL_SECONDS", "0.5"))
+
+
+class ParsePool:
+    """Roda page_extract.extract_page em processos separados.
+
+    Páginas pequenas são extraídas inline (o IPC custaria mais que o parse).
+    Se o pool quebrar, estourar o timeout ou estiver desativado
+    (PARSE_POOL_WORKERS=0), extrai um prefixo da página numa thread.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.submitted = 0
+        self.inline = 0
+        self.truncated = 0
+        self.timeouts = 0
+        self.fallbacks = 0
+        self.restarts = 0
+        self.latency = LatencyHistogram()
+
+    def start(self):
+        if self.executor is not None or self.workers <= 0:
+            return
+        try:
+            # workers nascem do forkserver com só o page_extract importado (sem Motor/FastAPI)
+            ctx = multiprocessing.get_context("forkserver")
+            ctx.set_forkserver_preload(["page_extract"])
+        except ValueError:
+            ctx = multiprocessing.get_context("spawn")
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=ctx,
+            max_tasks_per_child=PARSE_POOL_MAX_TASKS_PER_CHILD,
+        )
+        if self._slots is None:
+            # limita o que fica enfileirado no pool; o resto espera aqui
+            self._slots = asyncio.Semaphore(self.workers * 2)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    async def parse(self, html: str, url: str) -> dict:
+        if len(html) > PARSE_MAX_INPUT_CHARS:
+            # head, hero e primeiras seções estão no começo; o resto não entra no resultado
+            html = html[:PARSE_MAX_INPUT_CHARS]
+            self.truncated += 1
+
+        if len(html) <= PARSE_INLINE_MAX_CHARS:
+            self.inline += 1
+            return extract_page(html, url)
+
+        self.start()
+        if self.executor is not None:
+            started = time.perf_counter()
+            error = True
+            try:
+                async with self._slots:
+                    self.submitted += 1
+                    future = asyncio.get_running_loop().run_in_executor(self.executor, extract_page, html, url)
+                    result = await asyncio.wait_for(future, PARSE_TIMEOUT_SECONDS)
+                error = False
+                return result
+            except asyncio.TimeoutError:
+                # o worker termina sozinho; só paramos de esperar por ele
+                self.timeouts += 1
+                logger.warning("Parse de %s passou de %.0fs no pool", url, PARSE_TIMEOUT_SECONDS)
+            except BrokenProcessPool:
+                self.restarts += 1
+                logger.error("Pool de parse quebrou (worker morreu); recriando")
+                self.close()
+            except Exception as e:
+                logger.warning("Parse de %s falhou no pool: %s", url, e)
+            finally:
+                self.latency.observe((time.perf_counter() - started) * 1000, error)
+
+        self.fallbacks += 1
+        return await asyncio.to_thread(extract_page, html[:PARSE_FALLBACK_CHARS], url)
+
+    def snapshot(self) -> dict:
+        return {
+            "workers": self.workers if self.executor is not None else 0,
+            "max_input_chars": PARSE_MAX_INPUT_CHARS,
+            "inline_max_chars": PARSE_INLINE_MAX_CHARS,
+            "timeout_seconds": PARSE_TIMEOUT_SECONDS,
+            "submitted": self.submitted,
+            "inline": self.inline,
+            "truncated": self.truncated,
+            "timeouts": self.timeouts,
+            "fallbacks": self.fallbacks,
+            "restarts": self.restarts,
+            "latency": self.latency.snapshot(),
+        }
+
+
+class LoopLagMonitor:
+    """Mede quanto o event loop atrasa um sleep curto (CPU síncrono no loop aparece aqui)."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.last_ms = 0.0
+        self.lag = LatencyHistogram()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.last_ms = max(0.0, (loop.time() - expected) * 1000)
+            self.lag.observe(self.last_ms)
+
+    def snapshot(self) -> dict:
+        return {"interval_ms": self.interval * 1000, "last_ms": round(self.last_ms, 2), **self.lag.snapshot()}
+
+
+parse_pool = ParsePool(PARSE_POOL_WORKERS)
+loop_lag = LoopLagMonitor(LOOP_LAG_INTERVAL_SECONDS)
 
 
 # -----------------------------
@@ -382,49 +1270,43 @@ async def get_public_analysis(token: str):
 IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp", ".svg"}
 PROTECTED_DOMAINS = ["facebook.com", "fb.com", "instagram.com", "tiktok.com", "linkedin.com"]
 
-HOOK_PATTERNS = {
-    "pergunta": ["?", "você sabe", "já pensou", "por que", "como"],
-    "historia": ["eu", "minha", "descobri", "quando", "lembro", "história"],
-    "lista": ["3 ", "5 ", "7 ", "10 ", "passo", "dica", "motivo"],
-    "prova_social": ["milhares", "pessoas", "resultado", "depoimento", "cliente", "vendido"],
-    "mecanismo": ["funciona", "método", "sistema", "tecnologia", "fórmula", "segredo"],
-    "choque": ["pare", "cuidado", "perigo", "alerta", "nunca", "erro", "mentira"],
+SCRAPE_CACHE_FRESH_SECONDS = int(os.environ.get("SCRAPE_CACHE_FRESH_SECONDS", "3600"))
+SCRAPE_CACHE_RETENTION_DAYS = int(os.environ.get("SCRAPE_CACHE_RETENTION_DAYS", "30"))
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "gclsrc", "dclid", "msclkid", "ttclid", "twclid", "yclid",
+    "igshid", "mc_cid", "mc_eid", "_ga", "_gl", "ref", "ref_src", "srsltid",
 }
 
-BLOCK_RISK_TERMS = [
-    "cura",
-    "curar",
-    "100%",
-    "garantido",
-    "milagroso",
-    "elimina",
-    "sem efeitos colaterais",
-    "nunca mais",
-    "para sempre",
-    "definitivo",
-    "comprovado cientificamente",
-    "médicos recomendam",
-    "aprovado pela anvisa",
-]
-
-
-def classify_hook_type(text: str) -> str:
-    text_lower = (text or "").lower()
-    scores = {k: sum(1 for w in words if w in text_lower) for k, words in HOOK_PATTERNS.items()}
-    best = max(scores, key=scores.get)
-    return best if scores[best] > 0 else "direto"
-
-
-def detect_block_risk(text: str) -> dict:
-    text_lower = (text or "").lower()
-    found = [t for t in BLOCK_RISK_TERMS if t in text_lower]
-    if len(found) >= 3:
-        level = "alto"
-    elif len(found) >= 1:
-        level = "medio"
-    else:
-        level = "baixo"
-    return {"level": level, "terms": found}
+
+SCRAPE_MAX_BYTES = int(os.environ.get("SCRAPE_MAX_BYTES", str(5 * 1024 * 1024)))
+HTML_CONTENT_TYPES = {"text/html", "application/xhtml+xml"}
+CHARSET_PARAM_RE = re.compile(r"charset\s*=\s*[\"']?([\w.:-]+)", re.I)
+META_CHARSET_RE = re.compile(rb"<meta[^>]+charset\s*=\s*[\"']?([\w.:-]+)", re.I)
+
+
+def normalize_url(url: str) -> str:
+    from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or "https").lower()
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    port = parts.port
+    netloc = host if port is None or (scheme, port) in (("http", 80), ("https", 443)) else f"{host}:{port}"
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = sorted(
+        (k, v)
+        for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    )
+    return urlunsplit((scheme, netloc, path, urlencode(query), ""))
+
+
+def scrape_cache_expiry() -> datetime:
+    return datetime.now(timezone.utc) + timedelta(days=SCRAPE_CACHE_RETENTION_DAYS)
 
 
 def is_image_url(url: str) -> bool:
@@ -441,23 +1323,27 @@ def is_protected_domain(url: str) -> bool:
     return any(d in hostname for d in PROTECTED_DOMAINS)
 
 
+def image_scrape_result(url: str) -> dict:
+    return {
+        "url": url,
+        "title": "",
+        "meta_description": "",
+        "headings": [],
+        "paragraphs": [],
+        "buttons_ctas": [],
+        "images": [{"src": url, "alt": ""}],
+        "hook_type_detected": "direto",
+        "block_risk": {"level": "desconhecido", "terms": []},
+        "text_length": 0,
+        "full_text_preview": "",
+        "is_image_url": True,
+    }
+
+
 async def scrape_url(url: str) -> dict:
     # direct image
     if is_image_url(url):
-        return {
-            "url": url,
-            "title": "",
-            "meta_description": "",
-            "headings": [],
-            "paragraphs": [],
-            "buttons_ctas": [],
-            "images": [{"src": url, "alt": ""}],
-            "hook_type_detected": "direto",
-            "block_risk": {"level": "desconhecido", "terms": []},
-            "text_length": 0,
-            "full_text_preview": "",
-            "is_image_url": True,
-        }
+        return image_scrape_result(url)
 
     # protected domain
     if is_protected_domain(url):
@@ -488,65 +1374,316 @@ async def scrape_url(url: str) -> dict:
             "is_protected": True,
         }
 
-    headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-        )
-    }
+    return await scrape_page_cached(url)
+
+
+async def download_page(url: str, headers: Optional[dict] = None) -> dict:
+    """GET em streaming: para no SCRAPE_MAX_BYTES e nem lê o corpo se não for HTML."""
+    async with outbound_http.stream(url, headers=headers) as resp:
+        page = {
+            "status_code": resp.status_code,
+            "headers": resp.headers,
+            "content_type": resp.headers.get("content-type", ""),
+            "body": None,
+            "truncated": False,
+        }
+        if resp.status_code == 304:
+            return page
+        resp.raise_for_status()
+        mime = page["content_type"].split(";")[0].strip().lower()
+        if mime and mime not in HTML_CONTENT_TYPES:
+            return page
+
+        chunks, size = [], 0
+        async for chunk in resp.aiter_bytes():
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= SCRAPE_MAX_BYTES:
+                # o resto não é lido; fechar o stream descarta a conexão
+                page["truncated"] = True
+                break
+        page["body"] = b"".join(chunks)[:SCRAPE_MAX_BYTES]
+    return page
+
+
+def decode_html(body: bytes, content_type: str = "") -> str:
+    declared = CHARSET_PARAM_RE.search(content_type or "")
+    charset = declared.group(1) if declared else None
+    if charset is None:
+        meta = META_CHARSET_RE.search(body[:4096])
+        charset = meta.group(1).decode("ascii", "ignore") if meta else None
+    if charset:
+        try:
+            return body.decode(charset, errors="replace")
+        except LookupError:
+            pass
 
     try:
-        async with httpx.AsyncClient(follow_redirects=True, timeout=15) as http_client:
-            resp = await http_client.get(url, headers=headers)
-            resp.raise_for_status()
+        return body.decode("utf-8")
+    except UnicodeDecodeError as e:
+        if e.start >= len(body) - 3:
+            # corpo cortado no meio de um caractere multibyte
+            return body[:e.start].decode("utf-8")
+    if detect_charset is not None:
+        best = detect_charset(body[:64 * 1024]).best()
+        if best is not None:
+            return body.decode(best.encoding, errors="replace")
+    return body.decode("cp1252", errors="replace")
+
+
+SCRAPE_HOST_RATE = float(os.environ.get("SCRAPE_HOST_RATE", "1"))  # requisições/s por host
+SCRAPE_HOST_JITTER_SECONDS = float(os.environ.get("SCRAPE_HOST_JITTER_SECONDS", "0.5"))
+SCRAPE_MAX_WAIT_SECONDS = float(os.environ.get("SCRAPE_MAX_WAIT_SECONDS", "20"))
+SCRAPE_MAX_RETRIES = int(os.environ.get("SCRAPE_MAX_RETRIES", "1"))
+SCRAPE_BACKOFF_BASE_SECONDS = float(os.environ.get("SCRAPE_BACKOFF_BASE_SECONDS", "5"))
+SCRAPE_BACKOFF_MAX_SECONDS = float(os.environ.get("SCRAPE_BACKOFF_MAX_SECONDS", "600"))
+SCRAPE_RESPECT_ROBOTS = os.environ.get("SCRAPE_RESPECT_ROBOTS", "true").lower() in ("1", "true", "yes")
+ROBOTS_CACHE_TTL_SECONDS = float(os.environ.get("ROBOTS_CACHE_TTL_SECONDS", "21600"))
+ROBOTS_TIMEOUT_SECONDS = float(os.environ.get("ROBOTS_TIMEOUT_SECONDS", "5"))
+ROBOTS_ERROR_TTL_SECONDS = float(os.environ.get("ROBOTS_ERROR_TTL_SECONDS", "300"))
+ROBOTS_USER_AGENT = os.environ.get("ROBOTS_USER_AGENT", "AdOperator")
+# o scraper se identifica pelo mesmo token avaliado no robots.txt
+SCRAPER_USER_AGENT = os.environ.get("SCRAPER_USER_AGENT", f"Mozilla/5.0 (compatible; {ROBOTS_USER_AGENT}/1.0)")
+THROTTLE_STATUS_CODES = {429, 503}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    from email.utils import parsedate_to_datetime
+
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class HostScheduler:
+    """Espaça requisições por host (taxa + jitter), respeita robots.txt e recua em 429/503."""
+
+    def __init__(self):
+        self._hosts: Dict[str, dict] = {}
+        self._robots = LRUCache(4096, ROBOTS_CACHE_TTL_SECONDS)
+        self._robots_inflight: Dict[str, asyncio.Future] = {}
+        self.waits = 0
+        self.wait_ms = 0.0
+        self.throttled = 0
+        self.robots_blocked = 0
+        self.robots_unavailable = 0
+
+    def _state(self, host: str) -> dict:
+        state = self._hosts.get(host)
+        if state is None:
+            if len(self._hosts) > 4096:
+                now = time.monotonic()
+                self._hosts = {h: st for h, st in self._hosts.items() if max(st["next_at"], st["backoff_until"]) > now}
+            state = self._hosts[host] = {
+                "next_at": 0.0,
+                "backoff_until": 0.0,
+                "failures": 0,
+                "interval": 1 / SCRAPE_HOST_RATE,
+            }
+        return state
+
+    async def wait_turn(self, host: str):
+        state = self._state(host)
+        now = time.monotonic()
+        start_at = max(now, state["next_at"], state["backoff_until"])
+        wait = start_at - now
+        if wait > SCRAPE_MAX_WAIT_SECONDS:
+            raise HTTPException(status_code=503, detail=f"{host} pediu para esperar {int(wait)}s; tente novamente mais tarde")
+        # reserva o horário antes de dormir: quem chegar depois entra na fila atrás
+        state["next_at"] = start_at + state["interval"] + random.uniform(0, SCRAPE_HOST_JITTER_SECONDS)
+        if wait > 0:
+            self.waits += 1
+            self.wait_ms += wait * 1000
+            await asyncio.sleep(wait)
+
+    def back_off(self, host: str, retry_after: Optional[str]) -> float:
+        state = self._state(host)
+        state["failures"] += 1
+        self.throttled += 1
+        delay = parse_retry_after(retry_after)
+        if delay is None:
+            delay = SCRAPE_BACKOFF_BASE_SECONDS * 2 ** (state["failures"] - 1)
+        delay = min(delay, SCRAPE_BACKOFF_MAX_SECONDS)
+        state["backoff_until"] = max(state["backoff_until"], time.monotonic() + delay)
+        logger.warning("%s limitou o scraper; recuando %.0fs", host, delay)
+        return delay
+
+    def succeeded(self, host: str):
+        state = self._hosts.get(host)
+        if state is not None:
+            state["failures"] = 0
+
+    async def _fetch_robots(self, origin: str) -> Optional[Any]:
+        """RobotFileParser do site, ou None se o robots.txt está indisponível (erro de rede, 429, 5xx)."""
+        from urllib.robotparser import RobotFileParser
+
+        parser = RobotFileParser()
+        try:
+            resp = await outbound_http.get(
+                f"{origin}/robots.txt",
+                headers={"User-Agent": SCRAPER_USER_AGENT},
+                timeout=ROBOTS_TIMEOUT_SECONDS,
+            )
+        except Exception:
+            return None
+        if resp.status_code == 200:
+            parser.parse(resp.text[:512 * 1024].splitlines())
+        elif resp.status_code == 429 or resp.status_code >= 500:
+            return None
+        else:
+            # sem robots.txt (404 e demais 4xx): tudo liberado
+            parser.allow_all = True
+        return parser
+
+    async def allowed(self, url: str) -> bool:
+        from urllib.parse import urlsplit
+
+        if not SCRAPE_RESPECT_ROBOTS:
+            return True
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        cached = self._robots.get(origin)
+        if cached is None:
+            inflight = self._robots_inflight.get(origin)
+            if inflight is None:
+                # vários scrapes do mesmo site ao mesmo tempo baixam o robots.txt uma vez só
+                inflight = self._robots_inflight[origin] = asyncio.ensure_future(self._fetch_robots(origin))
+                inflight.add_done_callback(lambda _: self._robots_inflight.pop(origin, None))
+            parser = await asyncio.shield(inflight)
+            if parser is None:
+                # indisponível conta como "tudo proibido", mas por pouco tempo: tenta de novo depois
+                self._robots.set(origin, False, ROBOTS_ERROR_TTL_SECONDS)
+            else:
+                self._robots.set(origin, parser)
+                crawl_delay = parser.crawl_delay(ROBOTS_USER_AGENT)
+                if crawl_delay:
+                    state = self._state(parts.hostname or "-")
+                    state["interval"] = max(1 / SCRAPE_HOST_RATE, min(float(crawl_delay), 60.0))
+            cached = parser if parser is not None else False
+        if cached is False:
+            self.robots_unavailable += 1
+            raise HTTPException(
+                status_code=503,
+                detail=f"robots.txt de {parts.hostname} indisponível; tente novamente mais tarde",
+            )
+        if cached.can_fetch(ROBOTS_USER_AGENT, url):
+            return True
+        self.robots_blocked += 1
+        return False
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        return {
+            "rate_per_host": SCRAPE_HOST_RATE,
+            "respect_robots": SCRAPE_RESPECT_ROBOTS,
+            "waits": self.waits,
+            "wait_ms_total": round(self.wait_ms),
+            "throttled": self.throttled,
+            "robots_blocked": self.robots_blocked,
+            "robots_unavailable": self.robots_unavailable,
+            "hosts_backing_off": sorted(h for h, st in self._hosts.items() if st["backoff_until"] > now)[:50],
+        }
+
+
+host_scheduler = HostScheduler()
+
+
+async def polite_download(url: str, headers: Optional[dict] = None) -> dict:
+    from urllib.parse import urlsplit
+
+    host = urlsplit(url).hostname or "-"
+    headers = {"User-Agent": SCRAPER_USER_AGENT, **(headers or {})}
+    if not await host_scheduler.allowed(url):
+        raise HTTPException(status_code=403, detail="O robots.txt do site não permite acessar esta página")
+    for attempt in range(SCRAPE_MAX_RETRIES + 1):
+        await host_scheduler.wait_turn(host)
+        try:
+            page = await download_page(url, headers=headers)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code not in THROTTLE_STATUS_CODES:
+                raise
+            delay = host_scheduler.back_off(host, e.response.headers.get("retry-after"))
+            if attempt == SCRAPE_MAX_RETRIES or delay > SCRAPE_MAX_WAIT_SECONDS:
+                raise
+            continue
+        host_scheduler.succeeded(host)
+        return page
+
+
+async def scrape_page_cached(url: str) -> dict:
+    key = normalize_url(url)
+    cached = await db.scrape_cache.find_one({"_id": key})
+    now = time.time()
+    # extração de outra versão (sem links, structured_data...): só serve como stale-if-error;
+    # sem validadores condicionais, o servidor devolve o corpo e a página é extraída de novo
+    current = cached if cached and cached.get("extractor_version") == EXTRACTOR_VERSION else None
+
+    if current and now - current["fetched_at_ts"] < SCRAPE_CACHE_FRESH_SECONDS:
+        return {**current["result"], "url": url, "cache_status": "hit"}
+
+    conditional = {}
+    if current and current.get("etag"):
+        conditional["If-None-Match"] = current["etag"]
+    if current and current.get("last_modified"):
+        conditional["If-Modified-Since"] = current["last_modified"]
+
+    try:
+        page = await polite_download(url, headers=conditional or None)
+        if page["status_code"] == 304 and current:
+            await db.scrape_cache.update_one(
+                {"_id": key},
+                {"$set": {"fetched_at_ts": now, "expires_at": scrape_cache_expiry()}},
+            )
+            return {**current["result"], "url": url, "cache_status": "revalidated"}
     except Exception as e:
+        if cached:
+            # stale-if-error: melhor o conteúdo anterior do que um 400
+            logger.warning("Scrape falhou para %s, servindo cache antigo: %s", url, e)
+            return {**cached["result"], "url": url, "cache_status": "stale"}
+        if isinstance(e, HTTPException):
+            raise
         logger.error("Scrape failed for %s: %s", url, e)
         raise HTTPException(status_code=400, detail=f"Não foi possível acessar a URL: {str(e)}")
 
-    soup = BeautifulSoup(resp.text, "html.parser")
-    for tag in soup(["script", "style", "nav", "footer", "iframe"]):
-        tag.decompose()
-
-    title = soup.title.string.strip() if soup.title and soup.title.string else ""
-    meta_desc = ""
-    meta_tag = soup.find("meta", attrs={"name": "description"})
-    if meta_tag and meta_tag.get("content"):
-        meta_desc = meta_tag["content"]
-
-    headings = [h.get_text(strip=True) for h in soup.find_all(["h1", "h2", "h3"]) if h.get_text(strip=True)]
-    paragraphs = [p.get_text(strip=True) for p in soup.find_all("p") if len(p.get_text(strip=True)) > 20]
-    buttons = [
-        b.get_text(strip=True)
-        for b in soup.find_all(["button", "a"])
-        if b.get_text(strip=True) and len(b.get_text(strip=True)) < 80
-    ]
-
-    images = []
-    for img in soup.find_all("img", src=True)[:10]:
-        src = img["src"]
-        if src.startswith("//"):
-            src = "https:" + src
-        elif src.startswith("/"):
-            from urllib.parse import urlparse
-
-            parsed = urlparse(url)
-            src = f"{parsed.scheme}://{parsed.netloc}{src}"
-        images.append({"src": src, "alt": img.get("alt", "")})
+    body = page["body"]
+    if body is None:
+        # content-type não-HTML: o corpo nem foi baixado
+        mime = page["content_type"].split(";")[0].strip().lower()
+        if mime.startswith("image/"):
+            return image_scrape_result(url)
+        raise HTTPException(status_code=415, detail=f"A URL não aponta para uma página HTML ({mime or 'sem content-type'})")
+    if page["truncated"]:
+        logger.warning("Página %s passou de %d bytes; extraindo só o início", url, SCRAPE_MAX_BYTES)
+
+    content_hash = hashlib.sha256(body).hexdigest()
+    if current and current.get("content_hash") == content_hash:
+        # servidor sem validadores, mas o corpo é o mesmo: reaproveita a extração
+        result = current["result"]
+        cache_status = "unchanged"
+    else:
+        result = await parse_pool.parse(decode_html(body, page["content_type"]), url)
+        cache_status = "miss"
 
-    full_text = " ".join([title, meta_desc] + headings[:5] + paragraphs[:15])
-    return {
-        "url": url,
-        "title": title,
-        "meta_description": meta_desc,
-        "headings": headings[:10],
-        "paragraphs": paragraphs[:20],
-        "buttons_ctas": buttons[:10],
-        "images": images,
-        "hook_type_detected": classify_hook_type(full_text),
-        "block_risk": detect_block_risk(full_text),
-        "text_length": len(full_text),
-        "full_text_preview": full_text[:3000],
-    }
+    await db.scrape_cache.update_one(
+        {"_id": key},
+        {"$set": {
+            "result": {k: v for k, v in result.items() if k != "url"},
+            "content_hash": content_hash,
+            "extractor_version": EXTRACTOR_VERSION,
+            "etag": page["headers"].get("etag"),
+            "last_modified": page["headers"].get("last-modified"),
+            "fetched_at_ts": now,
+            "expires_at": scrape_cache_expiry(),
+        }},
+        upsert=True,
+    )
+    return {**result, "url": url, "cache_status": cache_status}
 
 
 # -----------------------------
@@ -555,9 +1692,7 @@ async def scrape_url(url: str) -> dict:
 # -----------------------------
 @api_router.post("/analyses/{analysis_id}/parse")
 async def parse_strategy(analysis_id: str, request: Request, user=Depends(get_current_user)):
-    analysis = await db.analyses.find_one({"id": analysis_id, "user_id": user["id"]}, {"_id": 0})
-    if not analysis:
-        raise HTTPException(status_code=404, detail="Análise não encontrada")
+    analysis = await get_owned_analysis(analysis_id, user["id"])
 
     product = analysis["product"]
 
@@ -583,16 +1718,21 @@ async def parse_strategy(analysis_id: str, request: Request, user=Depends(get_cu
     all_text = " ".join([v for v in product.values() if isinstance(v, str) and v])
     result["compliance"] = run_compliance_check(all_text)
 
-    await db.analyses.update_one({"id": analysis_id}, {"$set": {"strategic_analysis": result, "status": "parsed"}})
+    await save_stage_output(
+        analysis,
+        "strategic_analysis",
+        result,
+        status="parsed",
+        summary={"compliance_score": result["compliance"]["score"]},
+    )
     return result
 
 
 @api_router.post("/analyses/{analysis_id}/generate")
 async def generate_ads(analysis_id: str, request: Request, user=Depends(get_current_user)):
-    analysis = await db.analyses.find_one({"id": analysis_id, "user_id": user["id"]}, {"_id": 0})
-    if not analysis:
-        raise HTTPException(status_code=404, detail="Análise não encontrada")
+    analysis = await get_owned_analysis(analysis_id, user["id"])
 
+    await load_stage_outputs(analysis, ("strategic_analysis",))
     product = analysis["product"]
     strategy = analysis.get("strategic_analysis")
     if not strategy:
@@ -613,16 +1753,15 @@ async def generate_ads(analysis_id: str, request: Request, user=Depends(get_curr
     lang = request.headers.get("x-language", "pt")
     result = await call_claude(system_msg, user_text, f"generate-{analysis_id}", lang)
 
-    await db.analyses.update_one({"id": analysis_id}, {"$set": {"ad_variations": result, "status": "generated"}})
+    await save_stage_output(analysis, "ad_variations", result, status="generated")
     return result
 
 
 @api_router.post("/analyses/{analysis_id}/simulate")
 async def simulate_audience(analysis_id: str, request: Request, user=Depends(get_current_user)):
-    analysis = await db.analyses.find_one({"id": analysis_id, "user_id": user["id"]}, {"_id": 0})
-    if not analysis:
-        raise HTTPException(status_code=404, detail="Análise não encontrada")
+    analysis = await get_owned_analysis(analysis_id, user["id"])
 
+    await load_stage_outputs(analysis, ("ad_variations",))
     ads = analysis.get("ad_variations")
     if not ads:
         raise HTTPException(status_code=400, detail="Gere os anúncios primeiro")
@@ -636,16 +1775,15 @@ async def simulate_audience(analysis_id: str, request: Request, user=Depends(get
     lang = request.headers.get("x-language", "pt")
     result = await call_claude(system_msg, user_text, f"simulate-{analysis_id}", lang)
 
-    await db.analyses.update_one({"id": analysis_id}, {"$set": {"audience_simulation": result, "status": "simulated"}})
+    await save_stage_output(analysis, "audience_simulation", result, status="simulated")
     return result
 
 
 @api_router.post("/analyses/{analysis_id}/decide")
 async def decide_winner(analysis_id: str, request: Request, user=Depends(get_current_user)):
-    analysis = await db.analyses.find_one({"id": analysis_id, "user_id": user["id"]}, {"_id": 0})
-    if not analysis:
-        raise HTTPException(status_code=404, detail="Análise não encontrada")
+    analysis = await get_owned_analysis(analysis_id, user["id"])
 
+    await load_stage_outputs(analysis, ("ad_variations", "audience_simulation"))
     simulation = analysis.get("audience_simulation")
     ads = analysis.get("ad_variations")
     if not simulation or not ads:
@@ -657,16 +1795,15 @@ async def decide_winner(analysis_id: str, request: Request, user=Depends(get_cur
     lang = request.headers.get("x-language", "pt")
     result = await call_claude(system_msg, user_text, f"decide-{analysis_id}", lang)
 
-    await db.analyses.update_one({"id": analysis_id}, {"$set": {"decision": result, "status": "completed"}})
+    await save_stage_output(analysis, "decision", result, status="completed")
     return result
 
 
 @api_router.post("/analyses/{analysis_id}/market-compare")
 async def market_compare(analysis_id: str, request: Request, user=Depends(get_current_user)):
-    analysis = await db.analyses.find_one({"id": analysis_id, "user_id": user["id"]}, {"_id": 0})
-    if not analysis:
-        raise HTTPException(status_code=404, detail="Análise não encontrada")
+    analysis = await get_owned_analysis(analysis_id, user["id"])
 
+    await load_stage_outputs(analysis, ("strategic_analysis", "decision", "ad_variations"))
     product = analysis["product"]
     strategy = analysis.get("strategic_analysis")
     decision = analysis.get("decision")
@@ -695,55 +1832,434 @@ async def market_compare(analysis_id: str, request: Request, user=Depends(get_cu
     lang = request.headers.get("x-language", "pt")
     result = await call_claude(system_msg, user_text, f"market-{analysis_id}", lang)
 
-    await db.analyses.update_one({"id": analysis_id}, {"$set": {"market_comparison": result}})
+    await save_stage_output(analysis, "market_comparison", result)
     return result
 
 
 # -----------------------------
 # Competitor analysis endpoints
 # -----------------------------
-@api_router.post("/competitor/analyze")
-async def analyze_competitor(data: CompetitorURLInput, request: Request, user=Depends(get_current_user)):
-    scraped = await scrape_url(data.url)
+COMPETITOR_BATCH_MAX_URLS = int(os.environ.get("COMPETITOR_BATCH_MAX_URLS", "50"))
+COMPETITOR_BATCH_CONCURRENCY = int(os.environ.get("COMPETITOR_BATCH_CONCURRENCY", "8"))
+COMPETITOR_BATCH_PER_HOST = int(os.environ.get("COMPETITOR_BATCH_PER_HOST", "2"))
+COMPETITOR_BATCH_INSERT_SIZE = int(os.environ.get("COMPETITOR_BATCH_INSERT_SIZE", "10"))
+COMPETITOR_REUSE_MAX_AGE_HOURS = float(os.environ.get("COMPETITOR_REUSE_MAX_AGE_HOURS", "168"))
+# com dados estruturados densos (preço, avaliações, FAQ, VSL) o texto corrido vai curto no prompt
+COMPETITOR_TEXT_BUDGET_WITH_STRUCTURED = int(os.environ.get("COMPETITOR_TEXT_BUDGET_WITH_STRUCTURED", "1200"))
+STRUCTURED_DENSE_KEYS = ("price", "rating", "reviews", "faq", "video")
+
+# (user_id, url normalizada, hash do conteúdo, idioma) -> análise em andamento
+competitor_inflight: Dict[tuple, asyncio.Future] = {}
+
+
+def format_structured_data(data: dict) -> str:
+    """Linhas curtas a partir do resumo de JSON-LD/microdata/OpenGraph (page_extract.structured_summary)."""
+    lines = []
+    if data.get("type") or data.get("name"):
+        lines.append(f"Oferta ({data.get('type') or 'página'}): {data.get('name', '')}".rstrip())
+    for key, label in (("brand", "Marca"), ("site_name", "Site"), ("description", "Descrição")):
+        if data.get(key):
+            lines.append(f"{label}: {data[key]}")
+    if data.get("price"):
+        price = f"{data['price']}–{data['high_price']}" if data.get("high_price") else data["price"]
+        lines.append(f"Preço: {data.get('currency', '')} {price}".replace("  ", " ")
+                     + (f" ({data['availability']})" if data.get("availability") else ""))
+    if data.get("rating"):
+        lines.append(f"Avaliação: {data['rating']}" + (f" ({data['rating_count']} avaliações)" if data.get("rating_count") else ""))
+    for review in data.get("reviews", []):
+        lines.append(f"Depoimento{' ' + review['rating'] + '★' if review.get('rating') else ''}: {review['text']}")
+    for item in data.get("faq", []):
+        lines.append(f"FAQ: {item['question']} — {item.get('answer', '')}")
+    if data.get("video"):
+        lines.append("Vídeo (VSL): " + ", ".join(data["video"].values()))
+    return "\n".join(lines)
+
+
+async def build_competitor_analysis(url: str, lang: str, user_id: str, scraped: Optional[dict] = None) -> dict:
+    if scraped is None:
+        scraped = await scrape_url(url)
     is_img = scraped.get("is_image_url", False)
     is_protected = scraped.get("is_protected", False)
 
     if is_img:
         system_msg = "Analise estrategicamente um criativo (imagem) de concorrente. Retorne APENAS JSON."
-        content_text = f"URL da imagem: {data.url}"
+        content_text = f"URL da imagem: {url}"
     elif is_protected:
         system_msg = "Analise estrategicamente um anúncio em plataforma protegida usando metadados. Retorne APENAS JSON."
         content_text = f"URL protegida: {scraped['url']}\nContexto: {scraped.get('meta_description','')}"
     else:
         system_msg = "Analise estrategicamente o conteúdo da página/anúncio do concorrente. Retorne APENAS JSON."
+        text = scraped["full_text_preview"]
+        structured = scraped.get("structured_data") or {}
+        if any(structured.get(key) for key in STRUCTURED_DENSE_KEYS):
+            text = (
+                f"Dados estruturados da página:\n{format_structured_data(structured)}\n"
+                f"Texto: {text[:COMPETITOR_TEXT_BUDGET_WITH_STRUCTURED]}"
+            )
+        else:
+            text = f"Texto: {text}"
         content_text = (
             f"URL: {scraped['url']}\nTítulo: {scraped['title']}\n"
-            f"Meta: {scraped['meta_description']}\n"
-            f"Texto: {scraped['full_text_preview']}"
+            f"Meta: {scraped['meta_description']}\n{text}"
         )
 
-    lang = request.headers.get("x-language", "pt")
     result = await call_claude(system_msg, content_text, f"competitor-{uuid.uuid4()}", lang)
 
     result["scraping_data"] = {
         "url": scraped["url"],
         "hook_type_auto": scraped.get("hook_type_detected", "direto"),
+        "scrape_cache": scraped.get("cache_status", "none"),
         "block_risk_auto": scraped.get("block_risk", {"level": "desconhecido", "terms": []}),
         "images_found": len(scraped.get("images", [])),
         "source_type": "image" if is_img else ("protected" if is_protected else "webpage"),
+        "structured_sources": (scraped.get("structured_data") or {}).get("sources", []),
+        "text_cleanup": scraped.get("text_cleanup"),
     }
 
-    comp_id = str(uuid.uuid4())
-    doc = {
-        "id": comp_id,
-        "user_id": user["id"],
-        "url": data.url,
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "url": url,
+        "normalized_url": normalize_url(url),
+        "content_hash": content_fingerprint(scraped)["hash"],
+        "language": lang,
         "result": result,
         "created_at": datetime.now(timezone.utc).isoformat(),
     }
-    await db.competitor_analyses.insert_one(doc)
 
-    return {"id": comp_id, **result}
+
+async def find_reusable_analysis(user_id: str, normalized_url: str, content_hash: str, lang: str) -> Optional[dict]:
+    cutoff = datetime.fromtimestamp(time.time() - COMPETITOR_REUSE_MAX_AGE_HOURS * 3600, timezone.utc).isoformat()
+    doc = await db.competitor_analyses.find_one(
+        {
+            "user_id": user_id,
+            "normalized_url": normalized_url,
+            "content_hash": content_hash,
+            # o resultado vem no idioma pedido: outro x-language é outra análise
+            "language": lang,
+            "created_at": {"$gte": cutoff},
+        },
+        {"_id": 0},
+        sort=[("created_at", -1)],
+    )
+    if doc is not None:
+        doc["result"] = unpack_archived(doc, "result")
+        spawn_background(touch_accessed(db.competitor_analyses, {"id": doc["id"]}), "competitor-touch")
+    return doc
+
+
+async def analyze_or_reuse(url: str, lang: str, user_id: str, force: bool = False) -> tuple:
+    """(doc, reused). Mesma página com o mesmo conteúdo não paga outro LLM, a não ser com force."""
+    scraped = await scrape_url(url)
+    if force:
+        return await build_competitor_analysis(url, lang, user_id, scraped=scraped), False
+
+    key = (user_id, normalize_url(url), content_fingerprint(scraped)["hash"], lang)
+    existing = await find_reusable_analysis(*key)
+    if existing is not None:
+        return existing, True
+    inflight = competitor_inflight.get(key)
+    if inflight is not None:
+        # a mesma análise já está rodando (duplo clique, lote com URLs equivalentes)
+        return await asyncio.shield(inflight), True
+
+    inflight = competitor_inflight[key] = asyncio.ensure_future(
+        build_competitor_analysis(url, lang, user_id, scraped=scraped)
+    )
+    inflight.add_done_callback(lambda _: competitor_inflight.pop(key, None))
+    try:
+        return await asyncio.shield(inflight), False
+    except asyncio.CancelledError:
+        # quem pediu desistiu (cliente desconectou) e não vai gravar: grava quando terminar,
+        # senão quem esperava por esta análise recebe um documento que nunca vai para o banco
+        inflight.add_done_callback(persist_orphan_analysis)
+        raise
+
+
+def persist_orphan_analysis(future: asyncio.Future):
+    if future.cancelled() or future.exception() is not None:
+        return
+    spawn_background(db.competitor_analyses.insert_one(future.result()), "competitor-orphan-insert")
+
+
+def competitor_response(doc: dict, reused: bool) -> dict:
+    response = {"id": doc["id"], **doc["result"], "reused": reused}
+    if reused:
+        response["analyzed_at"] = doc["created_at"]
+    return response
+
+
+FUNNEL_MAX_PAGES = int(os.environ.get("FUNNEL_MAX_PAGES", "8"))
+FUNNEL_MAX_DEPTH = int(os.environ.get("FUNNEL_MAX_DEPTH", "2"))
+FUNNEL_CONCURRENCY = int(os.environ.get("FUNNEL_CONCURRENCY", "4"))
+FUNNEL_TIMEOUT_SECONDS = float(os.environ.get("FUNNEL_TIMEOUT_SECONDS", "60"))
+FUNNEL_TEXT_PER_PAGE = int(os.environ.get("FUNNEL_TEXT_PER_PAGE", "1200"))
+FUNNEL_CTA_TEXT_RE = re.compile(
+    r"compr|quero|garant|assin|inscrev|checkout|acess|come[cç]|matr[ií]cul|adquir|buy|order|get started|sign up|join",
+    re.I,
+)
+FUNNEL_PATH_RE = re.compile(
+    r"checkout|upsell|downsell|oferta|offer|obrigad|thank|vsl|video|order|pagamento|payment|carrinho|cart|plano|pricing|preco",
+    re.I,
+)
+FUNNEL_SKIP_PATH_RE = re.compile(r"\.(pdf|zip|mp4|mp3|css|js|json|xml|ico|woff2?)$|/(login|wp-admin|wp-login|feed)\b", re.I)
+
+
+def same_site(host: str, root: str) -> bool:
+    host, root = host.lower().removeprefix("www."), root.lower().removeprefix("www.")
+    return host == root or host.endswith("." + root) or root.endswith("." + host)
+
+
+def funnel_link_priority(link: dict) -> int:
+    """0 = CTA (classe de botão ou texto de compra), 1 = caminho típico de funil, 2 = resto."""
+    if link.get("cta") or FUNNEL_CTA_TEXT_RE.search(link.get("text") or ""):
+        return 0
+    return 1 if FUNNEL_PATH_RE.search(link["href"]) else 2
+
+
+async def crawl_funnel(url: str, max_pages: int, max_depth: int) -> dict:
+    """
+    BFS pelo mesmo site a partir da landing, CTAs primeiro em cada nível.
+    Usa scrape_url, então passa pelo cliente compartilhado, cache de scrape,
+    robots.txt e espaçamento por host.
+    """
+    from urllib.parse import urlparse
+
+    root_host = urlparse(url).hostname or ""
+    deadline = time.monotonic() + FUNNEL_TIMEOUT_SECONDS
+    slots = asyncio.Semaphore(FUNNEL_CONCURRENCY)
+    seen = {normalize_url(url)}
+    pages, errors, external_ctas, warnings = [], [], [], []
+    level = [{"url": url, "depth": 0, "via": None}]
+
+    async def fetch(entry: dict):
+        async with slots:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return entry, None, "tempo do crawl esgotado"
+            try:
+                return entry, await asyncio.wait_for(scrape_url(entry["url"]), remaining), None
+            except HTTPException as e:
+                return entry, None, str(e.detail)
+            except asyncio.TimeoutError:
+                return entry, None, "tempo do crawl esgotado"
+            except Exception as e:
+                logger.warning("Funil: falha em %s: %s", entry["url"], e)
+                return entry, None, str(e)
+
+    while level and len(pages) < max_pages and time.monotonic() < deadline:
+        results = await asyncio.gather(*(fetch(entry) for entry in level))
+        candidates = []
+        for entry, scraped, error in results:
+            if scraped is None:
+                if entry["depth"] == 0:
+                    raise HTTPException(status_code=400, detail=f"Não foi possível acessar a página: {error}")
+                errors.append({"url": entry["url"], "error": error})
+                continue
+            pages.append({**scraped, "depth": entry["depth"], "via": entry["via"]})
+            if "links" not in scraped and not scraped.get("is_image_url") and not scraped.get("is_protected"):
+                # só acontece com cache antigo servido como stale-if-error
+                warnings.append(f"Links de {entry['url']} indisponíveis (cache {scraped.get('cache_status')})")
+            for link in scraped.get("links", []):
+                host = urlparse(link["href"]).hostname or ""
+                if not same_site(host, root_host):
+                    if funnel_link_priority(link) == 0 and len(external_ctas) < 5:
+                        external_ctas.append({"href": link["href"], "text": link.get("text", "")})
+                    continue
+                key = normalize_url(link["href"])
+                if key in seen or FUNNEL_SKIP_PATH_RE.search(urlparse(link["href"]).path) or is_image_url(link["href"]):
+                    continue
+                seen.add(key)
+                candidates.append((funnel_link_priority(link), len(candidates), link))
+
+        next_depth = level[0]["depth"] + 1
+        if next_depth > max_depth:
+            break
+        candidates.sort(key=lambda c: c[:2])
+        level = [
+            {"url": link["href"], "depth": next_depth, "via": link.get("text") or None}
+            for _, _, link in candidates[:max_pages - len(pages)]
+        ]
+
+    if len(pages) == 1 and not errors and not warnings:
+        warnings.append("Nenhum link do mesmo site encontrado na página inicial")
+    return {"pages": pages, "errors": errors, "external_ctas": external_ctas, "warnings": warnings}
+
+
+async def build_funnel_analysis(url: str, lang: str, user_id: str, crawl: dict) -> dict:
+    """Uma única chamada ao LLM com o conteúdo resumido de todas as páginas do funil."""
+    pages = crawl["pages"]
+    blocks = []
+    for i, page in enumerate(pages, 1):
+        via = f" | via \"{page['via']}\"" if page.get("via") else ""
+        lines = [f"[Página {i} | profundidade {page['depth']}{via}] {page['url']}", f"Título: {page.get('title', '')}"]
+        if page.get("buttons_ctas"):
+            lines.append("CTAs: " + " | ".join(page["buttons_ctas"][:6]))
+        if page.get("structured_data"):
+            lines.append(format_structured_data(page["structured_data"]))
+        lines.append(f"Texto: {page.get('full_text_preview', '')[:FUNNEL_TEXT_PER_PAGE]}")
+        blocks.append("\n".join(lines))
+    if crawl["external_ctas"]:
+        blocks.append("Links de CTA para fora do site (checkout/plataforma): " + " | ".join(
+            f"{c['text']} -> {c['href']}" for c in crawl["external_ctas"]
+        ))
+
+    system_msg = (
+        "Analise estrategicamente o funil completo do concorrente (landing, VSL, upsell, checkout) "
+        "a partir das páginas abaixo. Considere a sequência de ofertas e a progressão de preço. Retorne APENAS JSON."
+    )
+    result = await call_claude(system_msg, "\n\n".join(blocks), f"competitor-funnel-{uuid.uuid4()}", lang)
+
+    root = pages[0]
+    result["scraping_data"] = {
+        "url": root["url"],
+        "hook_type_auto": root.get("hook_type_detected", "direto"),
+        "scrape_cache": root.get("cache_status", "none"),
+        "block_risk_auto": root.get("block_risk", {"level": "desconhecido", "terms": []}),
+        "images_found": sum(len(p.get("images", [])) for p in pages),
+        "source_type": "funnel",
+        "structured_sources": (root.get("structured_data") or {}).get("sources", []),
+        "text_cleanup": root.get("text_cleanup"),
+        "funnel": {
+            "pages": [
+                {"url": p["url"], "depth": p["depth"], "via": p.get("via"), "title": p.get("title", "")}
+                for p in pages
+            ],
+            "errors": crawl["errors"],
+            "external_ctas": crawl["external_ctas"],
+            "warnings": crawl["warnings"],
+        },
+    }
+
+    combined = "\n".join(content_fingerprint(p)["hash"] for p in pages)
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "url": url,
+        "normalized_url": normalize_url(url),
+        # hash próprio do funil: uma análise de página única nunca reaproveita esta
+        "content_hash": "funnel:" + hashlib.sha256(combined.encode()).hexdigest(),
+        "language": lang,
+        "result": result,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+@api_router.post("/competitor/analyze")
+async def analyze_competitor(data: CompetitorURLInput, request: Request, user=Depends(get_current_user)):
+    lang = request.headers.get("x-language", "pt")
+    if data.crawl:
+        crawl = await crawl_funnel(
+            data.url,
+            max_pages=max(1, min(data.max_pages or FUNNEL_MAX_PAGES, FUNNEL_MAX_PAGES)),
+            max_depth=max(0, min(data.max_depth if data.max_depth is not None else FUNNEL_MAX_DEPTH, FUNNEL_MAX_DEPTH)),
+        )
+        doc = await build_funnel_analysis(data.url, lang, user["id"], crawl)
+        await db.competitor_analyses.insert_one(doc)
+        return competitor_response(doc, False)
+    doc, reused = await analyze_or_reuse(data.url, lang, user["id"], force=data.force)
+    if not reused:
+        # a análise já foi paga e outras requisições podem estar esperando por ela
+        await asyncio.shield(db.competitor_analyses.insert_one(doc))
+    return competitor_response(doc, reused)
+
+
+@api_router.post("/competitor/analyze-batch")
+async def analyze_competitor_batch(data: CompetitorBatchInput, request: Request, user=Depends(get_current_user)):
+    urls = list(dict.fromkeys(u.strip() for u in data.urls if u.strip()))
+    if not urls:
+        raise HTTPException(status_code=400, detail="Nenhuma URL informada")
+    if len(urls) > COMPETITOR_BATCH_MAX_URLS:
+        raise HTTPException(status_code=400, detail=f"Máximo de {COMPETITOR_BATCH_MAX_URLS} URLs por lote")
+
+    lang = request.headers.get("x-language", "pt")
+    batch_slots = asyncio.Semaphore(COMPETITOR_BATCH_CONCURRENCY)
+    host_slots: Dict[str, asyncio.Semaphore] = {}
+    in_flight: set = set()  # índices que já passaram dos semáforos (scrape/LLM em andamento)
+
+    async def analyze_one(index: int, url: str) -> dict:
+        from urllib.parse import urlparse
+
+        host = urlparse(url).hostname or url
+        slot = host_slots.setdefault(host, asyncio.Semaphore(COMPETITOR_BATCH_PER_HOST))
+        async with batch_slots, slot:
+            in_flight.add(index)
+            try:
+                doc, reused = await analyze_or_reuse(url, lang, user["id"], force=data.force)
+            except HTTPException as e:
+                return {"index": index, "url": url, "status": "error", "status_code": e.status_code, "error": e.detail}
+            except Exception as e:
+                logger.error("Análise em lote falhou para %s: %s", url, e)
+                return {"index": index, "url": url, "status": "error", "status_code": 500, "error": str(e)}
+        return {"index": index, "url": url, "status": "ok", "doc": doc, "reused": reused}
+
+    async def save(docs: list):
+        if docs:
+            await db.competitor_analyses.insert_many(docs, ordered=False)
+
+    async def save_shielded(docs: list):
+        # desconexão durante o insert só encerra o stream: o lote (já fora de pending_docs) é gravado mesmo assim
+        if docs:
+            await asyncio.shield(spawn_background(save(docs), "competitor-batch-insert"))
+
+    def fresh_doc(task: asyncio.Task) -> Optional[dict]:
+        if task.cancelled() or task.exception() is not None:
+            return None
+        item = task.result()
+        return item.get("doc") if item.get("status") == "ok" and not item["reused"] else None
+
+    def save_when_done(task: asyncio.Task):
+        doc = fresh_doc(task)
+        if doc is not None:
+            spawn_background(save([doc]), "competitor-batch-insert")
+
+    async def results_stream():
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(analyze_one(i, u)) for i, u in enumerate(urls)]
+        pending_docs: list = []
+        streamed: set = set()
+        ok = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                item = await next_done
+                streamed.add(item["index"])
+                doc = item.pop("doc", None)
+                if doc is not None:
+                    ok += 1
+                    if not item["reused"]:
+                        pending_docs.append(doc)
+                    item.update({"id": doc["id"], "result": doc["result"]})
+                    if len(pending_docs) >= COMPETITOR_BATCH_INSERT_SIZE:
+                        docs, pending_docs = pending_docs, []
+                        await save_shielded(docs)
+                yield dump_json(item) + b"\n"
+            docs, pending_docs = pending_docs, []
+            await save_shielded(docs)
+            yield dump_json({
+                "done": True,
+                "total": len(urls),
+                "ok": ok,
+                "failed": len(urls) - ok,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000),
+            }) + b"\n"
+        finally:
+            # cliente desconectou: o que já foi analisado (ou está no LLM, já pago) não se perde;
+            # só as URLs que ainda nem começaram são canceladas
+            for index, task in enumerate(tasks):
+                if index in streamed:
+                    continue
+                if task.done():
+                    doc = fresh_doc(task)
+                    if doc is not None:
+                        pending_docs.append(doc)
+                elif index in in_flight:
+                    task.add_done_callback(save_when_done)
+                else:
+                    task.cancel()
+            if pending_docs:
+                spawn_background(save(pending_docs), "competitor-batch-insert")
+
+    return StreamingResponse(results_stream(), media_type="application/x-ndjson")
 
 
 @api_router.get("/competitor/analyses")
@@ -753,7 +2269,164 @@ async def list_competitor_analyses(user=Depends(get_current_user)):
         .sort("created_at", -1)
         .to_list(50)
     )
-    return items
+    for item in items:
+        item["result"] = unpack_archived(item, "result")
+    if items:
+        spawn_background(
+            touch_accessed(db.competitor_analyses, {"id": {"$in": [item["id"] for item in items]}}),
+            "competitor-touch",
+        )
+    return MongoJSONResponse(items)
+
+
+@api_router.post("/competitor/tracked")
+async def track_competitor(data: CompetitorTrackInput, request: Request, user=Depends(get_current_user)):
+    url = data.url.strip()
+    key = normalize_url(url)
+    interval_hours = max(RECRAWL_MIN_INTERVAL_HOURS, data.interval_hours)
+    latest = await db.competitor_analyses.find_one(
+        {"user_id": user["id"], "normalized_url": key}, {"_id": 0, "id": 1}, sort=[("created_at", -1)]
+    )
+    now = datetime.now(timezone.utc).isoformat()
+    tracked = await db.competitor_tracking.find_one_and_update(
+        {"user_id": user["id"], "normalized_url": key},
+        {
+            "$set": {"url": url, "interval_hours": interval_hours, "language": request.headers.get("x-language", "pt")},
+            "$setOnInsert": {
+                "id": str(uuid.uuid4()),
+                "user_id": user["id"],
+                "normalized_url": key,
+                "last_analysis_id": latest["id"] if latest else None,
+                "change_count": 0,
+                "created_at": now,
+                # primeira checagem logo: registra o fingerprint de base
+                "next_check_at": now,
+            },
+        },
+        projection={"_id": 0, "fingerprint": 0},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return tracked
+
+
+@api_router.get("/competitor/tracked")
+async def list_tracked_competitors(user=Depends(get_current_user)):
+    return (
+        await db.competitor_tracking.find({"user_id": user["id"]}, {"_id": 0, "fingerprint": 0})
+        .sort("created_at", -1)
+        .to_list(200)
+    )
+
+
+@api_router.delete("/competitor/tracked/{tracking_id}")
+async def untrack_competitor(tracking_id: str, user=Depends(get_current_user)):
+    result = await db.competitor_tracking.delete_one({"id": tracking_id, "user_id": user["id"]})
+    if not result.deleted_count:
+        raise HTTPException(status_code=404, detail="Concorrente monitorado não encontrado")
+    return {"success": True}
+
+
+# -----------------------------
+# Ad library imports
+# -----------------------------
+AD_IMPORT_MAX_BYTES = int(os.environ.get("AD_IMPORT_MAX_BYTES", str(200 * 1024 * 1024)))
+AD_IMPORT_BATCH_SIZE = int(os.environ.get("AD_IMPORT_BATCH_SIZE", "500"))
+AD_LIST_MAX = 500
+
+
+@api_router.post("/competitor/ads/import")
+async def import_competitor_ads(file: UploadFile = File(...), niche: str = Form(""), user=Depends(get_current_user)):
+    """
+    Export de biblioteca de anúncios (JSON, JSONL, CSV ou HAR) -> competitor_ads.
+    O upload já está em arquivo temporário; o parse lê em pedaços, em thread,
+    e grava em lotes com upsert por anúncio (reimportar não duplica).
+    """
+    size = file.size
+    if size is None:
+        size = file.file.seek(0, os.SEEK_END)
+        file.file.seek(0)
+    if size > AD_IMPORT_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Arquivo excede o limite de {AD_IMPORT_MAX_BYTES // (1024 * 1024)}MB")
+
+    head = await file.read(512)
+    await file.seek(0)
+    source_format = detect_format(file.filename or "", head)
+    ads = iter_ads(file.file, source_format)
+    import_id = str(uuid.uuid4())
+    niche = niche.strip()[:100]
+    started = time.perf_counter()
+    summary = {"import_id": import_id, "format": source_format, "ads_read": 0, "inserted": 0, "updated": 0,
+               "duplicates_in_file": 0, "hook_types": {}, "block_risk": {}}
+
+    while True:
+        try:
+            batch = await asyncio.to_thread(next_batch, ads, AD_IMPORT_BATCH_SIZE)
+        except ValueError as e:
+            if not summary["ads_read"]:
+                raise HTTPException(status_code=400, detail=f"Arquivo inválido ({source_format}): {e}")
+            # o que já foi lido fica gravado; o resto do arquivo está corrompido
+            summary["error"] = str(e)
+            break
+        if not batch:
+            break
+        summary["ads_read"] += len(batch)
+        unique = {ad["ad_key"]: ad for ad in batch}
+        summary["duplicates_in_file"] += len(batch) - len(unique)
+
+        now = datetime.now(timezone.utc).isoformat()
+        ops = []
+        for ad in unique.values():
+            hook, risk = ad["hook_type"], ad["block_risk"]["level"]
+            summary["hook_types"][hook] = summary["hook_types"].get(hook, 0) + 1
+            summary["block_risk"][risk] = summary["block_risk"].get(risk, 0) + 1
+            ops.append(UpdateOne(
+                {"user_id": user["id"], "ad_key": ad["ad_key"]},
+                {
+                    "$set": {
+                        **ad,
+                        "niche": niche,
+                        "import_id": import_id,
+                        "landing_normalized_url": normalize_url(ad["landing_url"]) if ad["landing_url"] else None,
+                        "updated_at": now,
+                    },
+                    "$setOnInsert": {"id": str(uuid.uuid4()), "created_at": now},
+                },
+                upsert=True,
+            ))
+        result = await db.competitor_ads.bulk_write(ops, ordered=False)
+        summary["inserted"] += result.upserted_count
+        summary["updated"] += result.matched_count
+
+    summary["elapsed_ms"] = round((time.perf_counter() - started) * 1000)
+    logger.info("Import de anúncios %s (%s): %d lidos, %d novos em %dms", import_id, source_format,
+                summary["ads_read"], summary["inserted"], summary["elapsed_ms"])
+    return summary
+
+
+@api_router.get("/competitor/ads")
+async def list_competitor_ads(
+    niche: Optional[str] = None,
+    hook_type: Optional[str] = None,
+    risk: Optional[str] = None,
+    platform: Optional[str] = None,
+    import_id: Optional[str] = None,
+    limit: int = 100,
+    user=Depends(get_current_user),
+):
+    query: Dict[str, Any] = {"user_id": user["id"]}
+    if niche is not None:
+        query["niche"] = niche
+    if hook_type:
+        query["hook_type"] = hook_type
+    if risk:
+        query["block_risk.level"] = risk
+    if platform:
+        query["platform"] = {"$regex": re.escape(platform.lower())}
+    if import_id:
+        query["import_id"] = import_id
+    cursor = db.competitor_ads.find(query, {"_id": 0}).sort("created_at", -1)
+    return await cursor.to_list(max(1, min(limit, AD_LIST_MAX)))
 
 
 # -----------------------------
@@ -882,16 +2555,46 @@ def build_contextual_prompt(
     return base
 
 
+# -----------------------------
+# Creative version counters
+# (criativos raiz: um contador por análise + provider; derivados: um por version_group,
+#  que é o id do criativo raiz; as chaves começam com creative:<analysis_id>: para o reaper)
+# -----------------------------
+async def next_creative_version(key: str, seed_filter: dict, floor: int = 0) -> int:
+    counter = await db.counters.find_one_and_update(
+        {"_id": key},
+        {"$inc": {"seq": 1}},
+        projection={"seq": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if counter:
+        return counter["seq"]
+
+    # primeiro uso da chave: parte da maior versão já gravada (dados anteriores aos contadores)
+    latest = await db.creatives.find_one(seed_filter, {"_id": 0, "version": 1}, sort=[("version", -1)])
+    try:
+        await db.counters.insert_one({"_id": key, "seq": max(floor, (latest or {}).get("version", 0))})
+    except DuplicateKeyError:
+        pass
+
+    counter = await db.counters.find_one_and_update(
+        {"_id": key},
+        {"$inc": {"seq": 1}},
+        projection={"seq": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    return counter["seq"]
+
+
 # -----------------------------
 # Creative generation
 # (mantém a rota e o molde do prompt)
 # -----------------------------
 @api_router.post("/creatives/generate")
 async def generate_creative(data: CreativeGenerationInput, request: Request, user=Depends(get_current_user)):
-    analysis = await db.analyses.find_one({"id": data.analysis_id, "user_id": user["id"]}, {"_id": 0})
-    if not analysis:
-        raise HTTPException(status_code=404, detail="Análise não encontrada")
+    analysis = await get_owned_analysis(data.analysis_id, user["id"])
 
+    await load_stage_outputs(analysis, ("decision", "strategic_analysis"))
     product = analysis["product"]
     decision = analysis.get("decision") or {}
     strategy = analysis.get("strategic_analysis") or {}
@@ -903,22 +2606,6 @@ async def generate_creative(data: CreativeGenerationInput, request: Request, use
         data.provider,
     )
 
-    # versioning
-    version = 1
-    version_group = data.analysis_id
-    if data.parent_creative_id:
-        parent = await db.creatives.find_one({"id": data.parent_creative_id}, {"_id": 0})
-        if parent:
-            version_group = parent.get("version_group", data.analysis_id)
-            version = parent.get("version", 1) + 1
-    else:
-        existing_count = await db.creatives.count_documents({
-            "analysis_id": data.analysis_id,
-            "provider": data.provider,
-            "user_id": user["id"],
-        })
-        version = existing_count + 1
-
     lang = request.headers.get("x-language", "pt")
     creative_id = str(uuid.uuid4())
 
@@ -961,8 +2648,33 @@ async def generate_creative(data: CreativeGenerationInput, request: Request, use
     else:
         raise HTTPException(status_code=400, detail="Provider inválido")
 
+    # versioning (só depois da geração, para não queimar versões em falhas)
+    doc_id = str(uuid.uuid4())
+    parent = None
+    if data.parent_creative_id:
+        parent = await db.creatives.find_one(
+            {"id": data.parent_creative_id, "user_id": user["id"]},
+            {"_id": 0, "id": 1, "version": 1, "version_group": 1},
+        )
+    if parent:
+        # grupos antigos usavam o analysis_id (todos os providers juntos): o pai vira a raiz do grupo
+        version_group = parent.get("version_group") or data.analysis_id
+        if version_group == data.analysis_id:
+            version_group = parent["id"]
+        version = await next_creative_version(
+            f"creative:{data.analysis_id}:group:{version_group}",
+            {"version_group": version_group},
+            floor=parent.get("version", 1),
+        )
+    else:
+        version_group = doc_id
+        version = await next_creative_version(
+            f"creative:{data.analysis_id}:{data.provider}",
+            {"analysis_id": data.analysis_id, "provider": data.provider, "user_id": user["id"], "parent_creative_id": None},
+        )
+
     doc = {
-        "id": str(uuid.uuid4()),
+        "id": doc_id,
         "analysis_id": data.analysis_id,
         "user_id": user["id"],
         "provider": data.provider,
@@ -974,6 +2686,7 @@ async def generate_creative(data: CreativeGenerationInput, request: Request, use
         "created_at": datetime.now(timezone.utc).isoformat(),
     }
     await db.creatives.insert_one(doc)
+    stats_cache.pop(user["id"])
 
     return result
 
@@ -993,6 +2706,8 @@ async def get_creative_file(creative_id: str):
 
 @api_router.get("/creatives/list/{analysis_id}")
 async def list_creatives(analysis_id: str, user=Depends(get_current_user)):
+    # análise em remoção: os criativos ainda existem até o reaper passar, mas não aparecem
+    await get_owned_analysis(analysis_id, user["id"], {"_id": 0, "id": 1})
     items = (
         await db.creatives.find({"analysis_id": analysis_id, "user_id": user["id"]}, {"_id": 0})
         .sort("created_at", -1)
@@ -1009,6 +2724,273 @@ async def list_creatives(analysis_id: str, user=Depends(get_current_user)):
     return results
 
 
+# -----------------------------
+# Analysis deletion reaper
+# (remove em lotes creatives, arquivos gerados e stage outputs de análises com tombstone)
+# -----------------------------
+REAPER_BATCH_SIZE = int(os.environ.get("REAPER_BATCH_SIZE", "100"))
+REAPER_INTERVAL_SECONDS = int(os.environ.get("REAPER_INTERVAL_SECONDS", "300"))
+
+
+def remove_generated_files(creative_ids: List[str]) -> int:
+    removed = 0
+    for creative_id in creative_ids:
+        for ext in (".png", ".mp4"):
+            path = GENERATED_DIR / f"{creative_id}{ext}"
+            try:
+                path.unlink()
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+async def report_deletion_progress(analysis_id: str, progress: dict):
+    await db.analyses.update_one(
+        {"id": analysis_id},
+        {"$set": {"deletion": {**progress, "updated_at": datetime.now(timezone.utc).isoformat()}}},
+    )
+
+
+async def reap_analysis(analysis_id: str):
+    progress = {"state": "running", "creatives_removed": 0, "files_removed": 0, "stage_outputs_removed": 0}
+    try:
+        await report_deletion_progress(analysis_id, progress)
+
+        while True:
+            batch = await db.creatives.find(
+                {"analysis_id": analysis_id}, {"_id": 1, "result.id": 1}
+            ).to_list(REAPER_BATCH_SIZE)
+            if not batch:
+                break
+            file_ids = [c["result"]["id"] for c in batch if (c.get("result") or {}).get("id")]
+            progress["files_removed"] += await asyncio.to_thread(remove_generated_files, file_ids)
+            result = await db.creatives.delete_many({"_id": {"$in": [c["_id"] for c in batch]}})
+            progress["creatives_removed"] += result.deleted_count
+            await report_deletion_progress(analysis_id, progress)
+
+        while True:
+            batch = await db.stage_outputs.find({"analysis_id": analysis_id}, {"_id": 1}).to_list(REAPER_BATCH_SIZE)
+            if not batch:
+                break
+            result = await db.stage_outputs.delete_many({"_id": {"$in": [o["_id"] for o in batch]}})
+            progress["stage_outputs_removed"] += result.deleted_count
+            await report_deletion_progress(analysis_id, progress)
+
+        await db.counters.delete_many(
+            {"_id": {"$regex": f"^(creative:{re.escape(analysis_id)}:|version_group:{re.escape(analysis_id)}$)"}}
+        )
+        await db.analyses.delete_one({"id": analysis_id, "deleted_at": {"$exists": True}})
+        logger.info("Análise %s removida: %s", analysis_id, progress)
+    except Exception as e:
+        logger.error("Reaper falhou para análise %s: %s", analysis_id, e)
+        await report_deletion_progress(analysis_id, {**progress, "state": "failed", "error": str(e)[:200]})
+
+
+async def run_deletion_reaper():
+    # retoma tombstones que ficaram para trás (reinício do servidor, falhas)
+    while True:
+        try:
+            pending = await db.analyses.find(
+                {"deleted_at": {"$exists": True}}, {"_id": 0, "id": 1}
+            ).to_list(REAPER_BATCH_SIZE)
+            for item in pending:
+                await reap_analysis(item["id"])
+        except Exception as e:
+            logger.error("Varredura do reaper falhou: %s", e)
+        await asyncio.sleep(REAPER_INTERVAL_SECONDS)
+
+
+# -----------------------------
+# Archive sweeper
+# (comprime stage outputs e resultados de concorrentes sem leitura há ARCHIVE_AFTER_DAYS;
+#  documentos nunca lidos desde o last_accessed_at contam a partir do created_at)
+# -----------------------------
+def pack_batch(docs: List[dict], field: str, archived_at: str) -> tuple:
+    ops = []
+    raw_total = 0
+    stored_total = 0
+    for doc in docs:
+        codec, raw, packed = compress_json(doc[field])
+        raw_total += len(raw)
+        stored_total += len(packed)
+        ops.append(
+            UpdateOne(
+                {"_id": doc["_id"], f"{field}_z": {"$exists": False}},
+                {
+                    "$set": {
+                        f"{field}_z": Binary(packed),
+                        "codec": codec,
+                        "archived_at": archived_at,
+                        "raw_bytes": len(raw),
+                        "stored_bytes": len(packed),
+                    },
+                    "$unset": {field: ""},
+                },
+            )
+        )
+    return ops, raw_total, stored_total
+
+
+async def archive_collection(collection, field: str, cutoff: str) -> dict:
+    totals = {"docs": 0, "raw_bytes": 0, "stored_bytes": 0}
+    while True:
+        batch = await collection.find(
+            {
+                field: {"$exists": True},
+                f"{field}_z": {"$exists": False},
+                "$or": [
+                    {"last_accessed_at": {"$lt": cutoff}},
+                    {"last_accessed_at": {"$exists": False}, "created_at": {"$lt": cutoff}},
+                ],
+            },
+            {"_id": 1, field: 1},
+        ).to_list(ARCHIVE_BATCH_SIZE)
+        if not batch:
+            break
+        # compressão é CPU pura: fora do event loop
+        archived_at = datetime.now(timezone.utc).isoformat()
+        ops, raw_bytes, stored_bytes = await asyncio.to_thread(pack_batch, batch, field, archived_at)
+        await collection.bulk_write(ops, ordered=False)
+        totals["docs"] += len(ops)
+        totals["raw_bytes"] += raw_bytes
+        totals["stored_bytes"] += stored_bytes
+    return totals
+
+
+async def archive_cold_outputs() -> dict:
+    cutoff = datetime.fromtimestamp(time.time() - ARCHIVE_AFTER_DAYS * 86400, timezone.utc).isoformat()
+    totals = {"docs": 0, "raw_bytes": 0, "stored_bytes": 0}
+    for collection, field in ((db.stage_outputs, "output"), (db.competitor_analyses, "result")):
+        result = await archive_collection(collection, field, cutoff)
+        for key in totals:
+            totals[key] += result[key]
+    if totals["docs"]:
+        await db.counters.update_one(
+            {"_id": ARCHIVE_STATS_ID},
+            {
+                "$inc": totals,
+                "$set": {"last_run_at": datetime.now(timezone.utc).isoformat()},
+            },
+            upsert=True,
+        )
+    return totals
+
+
+async def run_archive_sweeper():
+    while True:
+        try:
+            totals = await archive_cold_outputs()
+            if totals["docs"]:
+                logger.info(
+                    "Arquivados %d payloads: %d -> %d bytes",
+                    totals["docs"], totals["raw_bytes"], totals["stored_bytes"],
+                )
+        except Exception as e:
+            logger.error("Arquivamento falhou: %s", e)
+        await asyncio.sleep(ARCHIVE_SWEEP_INTERVAL_SECONDS)
+
+
+# -----------------------------
+# Competitor re-crawl (monitoramento de páginas acompanhadas)
+# -----------------------------
+RECRAWL_TICK_SECONDS = int(os.environ.get("RECRAWL_TICK_SECONDS", "300"))
+RECRAWL_BATCH_SIZE = int(os.environ.get("RECRAWL_BATCH_SIZE", "20"))
+RECRAWL_CONCURRENCY = int(os.environ.get("RECRAWL_CONCURRENCY", "4"))
+RECRAWL_LEASE_SECONDS = int(os.environ.get("RECRAWL_LEASE_SECONDS", "900"))
+RECRAWL_MIN_INTERVAL_HOURS = float(os.environ.get("RECRAWL_MIN_INTERVAL_HOURS", "1"))
+# similaridade abaixo disso é mudança material (novo LLM + notificação)
+RECRAWL_CHANGE_THRESHOLD = float(os.environ.get("RECRAWL_CHANGE_THRESHOLD", "0.85"))
+
+
+def iso_in(seconds: float) -> str:
+    return datetime.fromtimestamp(time.time() + seconds, timezone.utc).isoformat()
+
+
+async def claim_due_tracking() -> Optional[dict]:
+    # lease: outro worker não pega o mesmo documento enquanto este re-raspa
+    return await db.competitor_tracking.find_one_and_update(
+        {"next_check_at": {"$lte": datetime.now(timezone.utc).isoformat()}},
+        {"$set": {"next_check_at": iso_in(RECRAWL_LEASE_SECONDS)}},
+        sort=[("next_check_at", 1)],
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def recrawl_tracked(tracked: dict) -> str:
+    now = datetime.now(timezone.utc).isoformat()
+    update: Dict[str, Any] = {
+        "last_checked_at": now,
+        "next_check_at": iso_in(tracked["interval_hours"] * 3600),
+    }
+    try:
+        scraped = await scrape_url(tracked["url"])
+    except Exception as e:
+        detail = e.detail if isinstance(e, HTTPException) else str(e)
+        await db.competitor_tracking.update_one({"id": tracked["id"]}, {"$set": {**update, "last_error": detail}})
+        return "error"
+
+    fingerprint = content_fingerprint(scraped)
+    update.update({"fingerprint": fingerprint, "last_error": None})
+    previous = tracked.get("fingerprint")
+    if previous is None:
+        await db.competitor_tracking.update_one({"id": tracked["id"]}, {"$set": update})
+        return "baseline"
+
+    similarity = fingerprint_similarity(previous, fingerprint)
+    update["last_similarity"] = round(similarity, 3)
+    if similarity >= RECRAWL_CHANGE_THRESHOLD:
+        # mantém a base antiga: várias mudanças pequenas somadas ainda disparam
+        update["fingerprint"] = previous
+        await db.competitor_tracking.update_one({"id": tracked["id"]}, {"$set": update})
+        return "unchanged"
+
+    doc = await build_competitor_analysis(tracked["url"], tracked.get("language", "pt"), tracked["user_id"], scraped=scraped)
+    doc.update({"trigger": "recrawl", "tracking_id": tracked["id"], "similarity": round(similarity, 3)})
+    # o insert vira evento de live update (com trigger) para o dono
+    await db.competitor_analyses.insert_one(doc)
+    await db.competitor_tracking.update_one(
+        {"id": tracked["id"]},
+        {"$set": {**update, "last_analysis_id": doc["id"], "last_change_at": now}, "$inc": {"change_count": 1}},
+    )
+    return "changed"
+
+
+async def recrawl_due_competitors() -> Dict[str, int]:
+    outcomes: Dict[str, int] = {}
+    slots = asyncio.Semaphore(RECRAWL_CONCURRENCY)
+
+    async def run(tracked: dict):
+        async with slots:
+            try:
+                outcome = await recrawl_tracked(tracked)
+            except Exception as e:
+                logger.error("Re-crawl de %s falhou: %s", tracked.get("url"), e)
+                outcome = "error"
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    claimed = []
+    for _ in range(RECRAWL_BATCH_SIZE):
+        tracked = await claim_due_tracking()
+        if tracked is None:
+            break
+        claimed.append(tracked)
+    await asyncio.gather(*(run(t) for t in claimed))
+    return outcomes
+
+
+async def run_competitor_recrawler():
+    while True:
+        try:
+            outcomes = await recrawl_due_competitors()
+            if outcomes:
+                logger.info("Re-crawl de concorrentes: %s", outcomes)
+        except Exception as e:
+            logger.error("Re-crawl de concorrentes falhou: %s", e)
+        await asyncio.sleep(RECRAWL_TICK_SECONDS)
+
+
 # -----------------------------
 # pHash visual analysis
 # -----------------------------
@@ -1017,17 +2999,13 @@ async def compute_phash_from_url(image_url: str) -> Optional[str]:
     from PIL import Image
 
     try:
-        async with httpx.AsyncClient(follow_redirects=True, timeout=15) as http_client:
-            resp = await http_client.get(
-                image_url,
-                headers={"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"},
-            )
-            resp.raise_for_status()
-            content_type = resp.headers.get("content-type", "")
-            if "image" not in content_type and not any(image_url.lower().endswith(ext) for ext in [".jpg", ".jpeg", ".png", ".gif", ".webp"]):
-                return None
-            img = Image.open(io.BytesIO(resp.content))
-            return str(imagehash.phash(img))
+        resp = await outbound_http.get(image_url)
+        resp.raise_for_status()
+        content_type = resp.headers.get("content-type", "")
+        if "image" not in content_type and not any(image_url.lower().endswith(ext) for ext in [".jpg", ".jpeg", ".png", ".gif", ".webp"]):
+            return None
+        img = Image.open(io.BytesIO(resp.content))
+        return str(imagehash.phash(img))
     except Exception as e:
         logger.warning("pHash failed for %s: %s", image_url, e)
         return None
@@ -1045,8 +3023,10 @@ async def analyze_competitor_images(data: ImageAnalysisInput, user=Depends(get_c
     results = []
     input_hashes = []
 
-    for url in data.image_urls[:10]:
-        phash = await compute_phash_from_url(url)
+    # downloads em paralelo; o cliente compartilhado limita conexões por host
+    urls = data.image_urls[:10]
+    hashes = await asyncio.gather(*(compute_phash_from_url(url) for url in urls))
+    for url, phash in zip(urls, hashes):
         input_hashes.append({"url": url, "phash": phash})
         results.append({"url": url, "phash": phash, "status": "ok" if phash else "failed"})
 
@@ -1109,7 +3089,7 @@ async def analyze_competitor_images(data: ImageAnalysisInput, user=Depends(get_c
                 }
             )
 
-    return {
+    return MongoJSONResponse({
         "images": results,
         "creative_comparisons": comparisons,
         "cross_comparisons": cross_comparisons,
@@ -1119,6 +3099,243 @@ async def analyze_competitor_images(data: ImageAnalysisInput, user=Depends(get_c
             "similar_to_creatives": len([c for c in comparisons if c["is_similar"]]),
             "similar_cross": len([c for c in cross_comparisons if c["is_similar"]]),
         },
+    })
+
+
+# -----------------------------
+# Live updates (SSE)
+# (um change stream compartilhado por worker; polling quando o Mongo é standalone)
+# -----------------------------
+LIVE_COLLECTIONS = ("analyses", "creatives", "competitor_analyses")
+LIVE_POLL_INTERVAL_SECONDS = float(os.environ.get("LIVE_POLL_INTERVAL_SECONDS", "3"))
+LIVE_HEARTBEAT_SECONDS = 15
+LIVE_QUEUE_SIZE = 100
+CHANGE_STREAMS_UNSUPPORTED = 40573
+ARCHIVE_WRITE_FIELDS = {"result", "result_z", *ARCHIVE_BOOKKEEPING_FIELDS}
+
+
+def live_event(collection: str, op: str, doc: dict, fields: Optional[List[str]] = None) -> dict:
+    event = {"collection": collection, "op": op, "id": doc.get("id")}
+    if collection == "analyses":
+        event["status"] = doc.get("status")
+        event["deleted"] = "deleted_at" in doc
+    elif collection == "creatives":
+        event.update({"analysis_id": doc.get("analysis_id"), "provider": doc.get("provider"), "version": doc.get("version")})
+    else:
+        event["url"] = doc.get("url")
+        if doc.get("trigger"):
+            event["trigger"] = doc["trigger"]
+    if fields:
+        event["fields"] = fields
+    return event
+
+
+class LiveUpdatesHub:
+    def __init__(self):
+        self.subscribers: Dict[str, set] = {}
+        self.mode = "starting"
+        self._analysis_state: Dict[str, tuple] = {}
+        self._seeded_users: set = set()
+        self._since = ""
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=LIVE_QUEUE_SIZE)
+        self.subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue):
+        queues = self.subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[user_id]
+
+    def publish(self, user_id: str, event: dict):
+        for queue in self.subscribers.get(user_id, ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # cliente lento: descarta o backlog e pede para recarregar tudo
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"collection": "*", "op": "resync"})
+
+    async def run(self):
+        while True:
+            try:
+                await self._watch()
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAMS_UNSUPPORTED:
+                    logger.info("Change streams indisponíveis (Mongo standalone); usando polling")
+                    await self._poll_forever()
+                    return
+                logger.warning("Change stream interrompido: %s", e)
+            except Exception as e:
+                logger.warning("Change stream interrompido: %s", e)
+            await asyncio.sleep(5)
+
+    async def _watch(self):
+        pipeline = [
+            {"$match": {
+                "ns.coll": {"$in": list(LIVE_COLLECTIONS)},
+                "operationType": {"$in": ["insert", "update", "replace"]},
+                "fullDocument.user_id": {"$exists": True},
+            }},
+            {"$project": {
+                "operationType": 1,
+                "ns.coll": 1,
+                "updateDescription.updatedFields": 1,
+                "updateDescription.removedFields": 1,
+                **{f"fullDocument.{f}": 1 for f in (
+                    "id", "user_id", "status", "deleted_at", "analysis_id", "provider", "version", "url", "trigger",
+                )},
+            }},
+        ]
+        async with db.watch(pipeline, full_document="updateLookup") as stream:
+            self.mode = "change_stream"
+            async for change in stream:
+                doc = change.get("fullDocument") or {}
+                if change["ns"]["coll"] == "analyses":
+                    # escritas feitas por outros workers também invalidam o cache público
+                    invalidate_public_analysis(doc.get("id"))
+                fields = None
+                description = change.get("updateDescription")
+                if description:
+                    changed = list(description.get("updatedFields") or {}) + list(description.get("removedFields") or [])
+                    fields = sorted({f.split(".")[0] for f in changed})
+                    if fields and set(fields) <= ARCHIVE_WRITE_FIELDS:
+                        # compressão/registro de acesso do arquivamento: o conteúdo não mudou
+                        continue
+                self.publish(doc["user_id"], live_event(change["ns"]["coll"], change["operationType"], doc, fields))
+
+    async def _poll_forever(self):
+        self.mode = "polling"
+        self._since = datetime.now(timezone.utc).isoformat()
+        while True:
+            await asyncio.sleep(LIVE_POLL_INTERVAL_SECONDS)
+            if not self.subscribers:
+                self._analysis_state.clear()
+                self._seeded_users.clear()
+                continue
+            try:
+                await self._poll_once(list(self.subscribers))
+            except Exception as e:
+                logger.warning("Polling de live updates falhou: %s", e)
+
+    async def _poll_once(self, user_ids: List[str]):
+        analyses = await db.analyses.find(
+            {"user_id": {"$in": user_ids}},
+            {"_id": 0, "id": 1, "user_id": 1, "status": 1, "stages": 1, "deleted_at": 1, "public_token": 1},
+        ).sort("created_at", -1).to_list(500)
+        seen = set()
+        for doc in analyses:
+            seen.add(doc["id"])
+            state = (
+                doc.get("status"),
+                tuple(sorted((k, v.get("revision")) for k, v in (doc.get("stages") or {}).items())),
+                "deleted_at" in doc,
+                doc.get("public_token"),
+            )
+            previous = self._analysis_state.get(doc["id"])
+            self._analysis_state[doc["id"]] = state
+            if previous is None:
+                # primeira passada só registra o estado; depois, análise nova = insert
+                if doc["user_id"] in self._seeded_users:
+                    self.publish(doc["user_id"], live_event("analyses", "insert", doc))
+                continue
+            if previous == state:
+                continue
+            fields = []
+            if previous[0] != state[0]:
+                fields.append("status")
+            if previous[1] != state[1]:
+                fields.append("stages")
+            if previous[2] != state[2]:
+                fields.append("deleted_at")
+            if previous[3] != state[3]:
+                fields.append("public_token")
+            self.publish(doc["user_id"], live_event("analyses", "update", doc, fields))
+        for stale in set(self._analysis_state) - seen:
+            del self._analysis_state[stale]
+        self._seeded_users = set(user_ids)
+
+        since = self._since
+        self._since = datetime.now(timezone.utc).isoformat()
+        for collection in ("creatives", "competitor_analyses"):
+            new_docs = await db[collection].find(
+                {"user_id": {"$in": user_ids}, "created_at": {"$gt": since}},
+                {"_id": 0, "id": 1, "user_id": 1, "analysis_id": 1, "provider": 1, "version": 1, "url": 1, "trigger": 1},
+            ).to_list(200)
+            for doc in new_docs:
+                self.publish(doc["user_id"], live_event(collection, "insert", doc))
+
+
+live_hub = LiveUpdatesHub()
+
+
+@api_router.get("/events")
+async def stream_events(request: Request, token: str = ""):
+    # EventSource não envia headers: o JWT vem na query string
+    if not token:
+        raise HTTPException(status_code=401, detail="Token não fornecido")
+    user = await get_user_from_token(token)
+    queue = live_hub.subscribe(user["id"])
+
+    async def event_stream():
+        try:
+            yield f"retry: 5000\nevent: ready\ndata: {json.dumps({'mode': live_hub.mode})}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=LIVE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield f"data: {json.dumps(event, default=str)}\n\n"
+        finally:
+            live_hub.unsubscribe(user["id"], queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# -----------------------------
+# Metrics
+# -----------------------------
+@api_router.get("/metrics/mongo")
+async def get_mongo_metrics(_=Depends(require_metrics_access)):
+    return {
+        "commands": mongo_command_metrics.snapshot(),
+        "pool": mongo_pool_metrics.snapshot(),
+    }
+
+
+@api_router.get("/metrics/http")
+async def get_http_metrics(_=Depends(require_metrics_access)):
+    return {**outbound_http.snapshot(), "politeness": host_scheduler.snapshot()}
+
+
+@api_router.get("/metrics/parse")
+async def get_parse_metrics(_=Depends(require_metrics_access)):
+    return {"pool": parse_pool.snapshot(), "event_loop_lag": loop_lag.snapshot()}
+
+
+@api_router.get("/metrics/archive")
+async def get_archive_metrics(_=Depends(require_metrics_access)):
+    stats = await db.counters.find_one({"_id": ARCHIVE_STATS_ID}, {"_id": 0}) or {}
+    raw_bytes = stats.get("raw_bytes", 0)
+    stored_bytes = stats.get("stored_bytes", 0)
+    return {
+        "archive_after_days": ARCHIVE_AFTER_DAYS,
+        "codec": "zstd" if zstandard is not None else "zlib",
+        "docs_archived": stats.get("docs", 0),
+        "raw_bytes": raw_bytes,
+        "stored_bytes": stored_bytes,
+        "bytes_saved": raw_bytes - stored_bytes,
+        "ratio": round(raw_bytes / stored_bytes, 2) if stored_bytes else None,
+        "last_run_at": stats.get("last_run_at"),
     }
 
 
@@ -1140,11 +3357,151 @@ async def subscribe_push(data: PushSubscriptionInput, user=Depends(get_current_u
     return {"status": "subscribed"}
 
 
+# -----------------------------
+# Response compression
+# -----------------------------
+COMPRESSION_MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", "1024"))
+# arquivos de mídia já vêm comprimidos (png/jpg/mp4)
+COMPRESSION_EXCLUDED_PATHS = re.compile(r"^/api/(media/[^/]+|creatives/file/[^/]+)$")
+COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+}
+
+
+def is_compressible(content_type: str) -> bool:
+    if content_type == "text/event-stream":
+        return False
+    return (
+        content_type.startswith("text/")
+        or content_type in COMPRESSIBLE_TYPES
+        or content_type.endswith(("+json", "+xml"))
+    )
+
+
+def pick_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = {part.split(";")[0].strip().lower() for part in accept_encoding.split(",")}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    # aceita a ETag com sufixo de encoding que o CompressionMiddleware aplica
+    base = etag.strip('"')
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip().removeprefix("W/").strip('"')
+        if candidate == "*" or candidate == base or candidate.rsplit("-", 1)[0] == base:
+            return True
+    return False
+
+
+class StreamCompressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._br = brotli.Compressor(quality=4)
+        else:
+            self._gz = zlib.compressobj(6, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if self.encoding == "br":
+            out = self._br.process(data)
+            return out + (self._br.finish() if final else self._br.flush())
+        out = self._gz.compress(data)
+        # sync flush em respostas em streaming: cada chunk chega ao cliente sem esperar o próximo
+        return out + self._gz.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or COMPRESSION_EXCLUDED_PATHS.match(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        encoding = pick_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if not encoding:
+            await self.app(scope, receive, send)
+            return
+        responder = CompressionResponder(send, encoding, self.minimum_size)
+        await self.app(scope, receive, responder.send)
+
+
+class CompressionResponder:
+    def __init__(self, send, encoding: str, minimum_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start_message: Optional[dict] = None
+        self.passthrough = False
+        self.compressor: Optional[StreamCompressor] = None
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            message["headers"] = list(message.get("headers", []))
+            headers = MutableHeaders(raw=message["headers"])
+            content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+            self.passthrough = (
+                "content-encoding" in headers
+                or message["status"] in (204, 304)
+                or not is_compressible(content_type)
+            )
+            if self.passthrough:
+                await self._send(message)
+            else:
+                headers.add_vary_header("Accept-Encoding")
+                self.start_message = message
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None:
+            if not more_body and len(body) < self.minimum_size:
+                self.passthrough = True
+                await self._send(self.start_message)
+                await self._send(message)
+                return
+
+            self.compressor = StreamCompressor(self.encoding)
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            headers["Content-Encoding"] = self.encoding
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                # ETag forte identifica os bytes enviados: muda junto com o encoding
+                headers["ETag"] = f'{etag[:-1]}-{self.encoding}"'
+            if more_body:
+                del headers["Content-Length"]
+                await self._send(self.start_message)
+            else:
+                compressed = self.compressor.compress(body, final=True)
+                headers["Content-Length"] = str(len(compressed))
+                await self._send(self.start_message)
+                await self._send({"type": "http.response.body", "body": compressed, "more_body": False})
+                return
+
+        chunk = self.compressor.compress(body, final=not more_body)
+        await self._send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+
 # -----------------------------
 # App setup
 # -----------------------------
 app.include_router(api_router)
 
+app.add_middleware(CompressionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -1153,6 +3510,91 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+_background_tasks: set = set()
+
+
+def spawn_background(coro, name: str) -> asyncio.Task:
+    task = asyncio.create_task(coro, name=name)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+# índices por coleção: uma falha (ex.: duplicatas impedindo um unique) não impede os demais
+INDEXES = {
+    "analyses": [
+        ("id", {}),
+        ([("user_id", 1), ("created_at", -1)], {}),
+        ("deleted_at", {"sparse": True}),
+        ("public_token", {"sparse": True}),
+    ],
+    "stage_outputs": [
+        ([("analysis_id", 1), ("stage", 1), ("revision", 1)], {"unique": True}),
+        ("created_at", {}),
+        ("last_accessed_at", {"sparse": True}),
+    ],
+    "creatives": [
+        ([("analysis_id", 1), ("user_id", 1), ("created_at", -1)], {}),
+        ([("analysis_id", 1), ("provider", 1), ("version", -1)], {}),
+        ([("version_group", 1), ("version", -1)], {}),
+        ("id", {}),
+    ],
+    "competitor_analyses": [
+        ([("user_id", 1), ("created_at", -1)], {}),
+        ("created_at", {}),
+        ("last_accessed_at", {"sparse": True}),
+        ([("user_id", 1), ("normalized_url", 1), ("content_hash", 1), ("created_at", -1)], {}),
+    ],
+    "scrape_cache": [
+        ("expires_at", {"expireAfterSeconds": 0}),
+    ],
+    "competitor_tracking": [
+        ([("user_id", 1), ("normalized_url", 1)], {"unique": True}),
+        ("next_check_at", {}),
+    ],
+    "competitor_ads": [
+        ([("user_id", 1), ("ad_key", 1)], {"unique": True}),
+        ([("user_id", 1), ("niche", 1), ("created_at", -1)], {}),
+    ],
+}
+
+
+async def ensure_indexes():
+    for collection, indexes in INDEXES.items():
+        for keys, options in indexes:
+            try:
+                await db[collection].create_index(keys, **options)
+            except Exception as e:
+                logger.warning("Falha ao criar índice %s %s %s: %s", collection, keys, options, e)
+
+
+async def run_stage_output_migration():
+    try:
+        migrated = await migrate_inline_stage_outputs()
+        if migrated:
+            logger.info("Stage outputs migrados para stage_outputs: %d análises", migrated)
+        filled = await backfill_compliance_scores()
+        if filled:
+            logger.info("compliance_score preenchido em %d análises", filled)
+    except Exception as e:
+        logger.error("Migração de stage outputs falhou: %s", e)
+
+
+@app.on_event("startup")
+async def startup_db_client():
+    outbound_http.start()
+    parse_pool.start()
+    await ensure_indexes()
+    spawn_background(run_stage_output_migration(), "stage-output-migration")
+    spawn_background(run_deletion_reaper(), "deletion-reaper")
+    spawn_background(live_hub.run(), "live-updates")
+    spawn_background(run_archive_sweeper(), "archive-sweeper")
+    spawn_background(loop_lag.run(), "loop-lag-monitor")
+    spawn_background(run_competitor_recrawler(), "competitor-recrawler")
+
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await outbound_http.close()
+    parse_pool.close()
     client.close()
\ No newline at end of file
@@ -0,0 +1,178 @@
+"""
+Regras de termos sobre texto de anúncio/página: compliance, risco de
+bloqueio e tipo de hook.
+
+As três tabelas (RISKY_TERMS, BLOCK_RISK_TERMS, HOOK_PATTERNS) viram um
+único autômato Aho-Corasick montado na importação do módulo. Uma passada
+pelo texto devolve todas as ocorrências, com posição, inclusive
+sobrepostas ("cura" dentro de "curar"); as três funções só leem o
+conjunto de termos encontrados. Antes cada uma baixava o texto para
+minúsculas e fazia um `in` por termo, custo que crescia com o tamanho das
+listas.
+
+Usa o pyahocorasick (C) quando instalado; senão, o autômato em Python puro
+abaixo. A semântica é a de antes: substring, sem limite de palavra.
+
+Como o page_extract, não depende do resto do backend.
+"""
+from __future__ import annotations
+
+from collections import deque
+from typing import Iterator
+
+try:
+    import ahocorasick
+except ImportError:  # pragma: no cover - pyahocorasick é opcional
+    ahocorasick = None
+
+RISKY_TERMS = {
+    "cura": "Use 'auxilia no tratamento' ou 'contribui para melhora'",
+    "curar": "Use 'auxiliar no tratamento'",
+    "elimina": "Use 'ajuda a reduzir' ou 'contribui para diminuir'",
+    "remove": "Use 'auxilia na redução' ou 'contribui para minimizar'",
+    "100%": "Evite porcentagens absolutas. Use 'alta eficácia'",
+    "garantido": "Use 'resultados variam' / 'compromisso com qualidade'",
+    "milagroso": "Evite. Use termos mais moderados",
+    "sem efeitos colaterais": "Use 'bem tolerado' / 'perfil favorável'",
+    "nunca mais": "Evite promessa absoluta",
+    "para sempre": "Evite promessa absoluta",
+}
+HIGH_SEVERITY = {"cura", "curar", "100%", "milagroso", "sem efeitos colaterais", "nunca mais", "para sempre"}
+
+HOOK_PATTERNS = {
+    "pergunta": ["?", "você sabe", "já pensou", "por que", "como"],
+    "historia": ["eu", "minha", "descobri", "quando", "lembro", "história"],
+    "lista": ["3 ", "5 ", "7 ", "10 ", "passo", "dica", "motivo"],
+    "prova_social": ["milhares", "pessoas", "resultado", "depoimento", "cliente", "vendido"],
+    "mecanismo": ["funciona", "método", "sistema", "tecnologia", "fórmula", "segredo"],
+    "choque": ["pare", "cuidado", "perigo", "alerta", "nunca", "erro", "mentira"],
+}
+
+BLOCK_RISK_TERMS = [
+    "cura",
+    "curar",
+    "100%",
+    "garantido",
+    "milagroso",
+    "elimina",
+    "sem efeitos colaterais",
+    "nunca mais",
+    "para sempre",
+    "definitivo",
+    "comprovado cientificamente",
+    "médicos recomendam",
+    "aprovado pela anvisa",
+]
+
+
+class TermAutomaton:
+    """Aho-Corasick em Python puro: transições completas (DFA), uma consulta de dict por caractere."""
+
+    def __init__(self, terms):
+        children: list = [{}]
+        out: list = [()]
+        for term in terms:
+            state = 0
+            for ch in term:
+                nxt = children[state].get(ch)
+                if nxt is None:
+                    nxt = len(children)
+                    children[state][ch] = nxt
+                    children.append({})
+                    out.append(())
+                state = nxt
+            out[state] = (term,)
+
+        # BFS por profundidade: o estado de falha é sempre mais raso, então já está completo
+        delta = [dict(c) for c in children]
+        fail = [0] * len(children)
+        queue = deque(children[0].values())
+        while queue:
+            state = queue.popleft()
+            out[state] = out[state] + out[fail[state]]
+            for ch, nxt in children[state].items():
+                fail[nxt] = delta[fail[state]].get(ch, 0) if state else 0
+                queue.append(nxt)
+            for ch, nxt in delta[fail[state]].items():
+                delta[state].setdefault(ch, nxt)
+        self.delta = delta
+        self.out = out
+
+    def iter(self, text: str) -> Iterator[tuple]:
+        """(índice do último caractere, termo) de cada ocorrência, como o pyahocorasick."""
+        delta, out = self.delta, self.out
+        state = 0
+        for end, ch in enumerate(text):
+            state = delta[state].get(ch, 0)
+            if out[state]:
+                for term in out[state]:
+                    yield end, term
+
+
+def build_matcher(terms):
+    if ahocorasick is None:
+        return TermAutomaton(terms)
+    automaton = ahocorasick.Automaton()
+    for term in terms:
+        automaton.add_word(term, term)
+    automaton.make_automaton()
+    return automaton
+
+
+ALL_TERMS = sorted(
+    {t.lower() for t in RISKY_TERMS} | {t.lower() for t in BLOCK_RISK_TERMS}
+    | {w.lower() for words in HOOK_PATTERNS.values() for w in words}
+)
+MATCHER = build_matcher(ALL_TERMS)
+
+
+def find_terms(text: str) -> list:
+    """Todas as ocorrências [(início, fim, termo)] no texto em minúsculas, numa passada."""
+    lowered = (text or "").lower()
+    if not lowered:
+        return []
+    return [(end - len(term) + 1, end + 1, term) for end, term in MATCHER.iter(lowered)]
+
+
+def matched_terms(text: str) -> set:
+    return {term for _, _, term in find_terms(text)}
+
+
+def classify_hook_type(text: str, found: set = None) -> str:
+    found = matched_terms(text) if found is None else found
+    scores = {k: sum(1 for w in words if w in found) for k, words in HOOK_PATTERNS.items()}
+    best = max(scores, key=scores.get)
+    return best if scores[best] > 0 else "direto"
+
+
+def detect_block_risk(text: str, found: set = None) -> dict:
+    found = matched_terms(text) if found is None else found
+    terms = [t for t in BLOCK_RISK_TERMS if t in found]
+    if len(terms) >= 3:
+        level = "alto"
+    elif len(terms) >= 1:
+        level = "medio"
+    else:
+        level = "baixo"
+    return {"level": level, "terms": terms}
+
+
+def run_compliance_check(text: str, found: set = None) -> dict:
+    found = matched_terms(text) if found is None else found
+    risks = [
+        {
+            "termo": term,
+            "sugestao": suggestion,
+            "severidade": "alta" if term in HIGH_SEVERITY else "media",
+        }
+        for term, suggestion in RISKY_TERMS.items()
+        if term.lower() in found
+    ]
+    score = max(0, 100 - len(risks) * 15)
+    return {"riscos": risks, "score": score, "total_riscos": len(risks)}
+
+
+def classify_text(text: str) -> dict:
+    """Hook e risco de bloqueio a partir de uma única passada do autômato."""
+    found = matched_terms(text)
+    return {"hook_type": classify_hook_type(text, found), "block_risk": detect_block_risk(text, found)}
@@ -0,0 +1,183 @@
+"""
+Session 11 Tests: Analysis data layer
+Tests:
+1. Stage outputs stored outside the analysis document (list is light, detail is hydrated)
+2. Atomic creative version counters (concurrent generations get distinct versions)
+3. Single round-trip share/product updates (idempotent token, ownership filter)
+4. Cascading deletion (tombstone hides the analysis, reaper cleans up in background)
+"""
+import pytest
+import requests
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+TEST_EMAIL = "test@test.com"
+TEST_PASSWORD = "test123"
+
+STAGE_FIELDS = ["strategic_analysis", "ad_variations", "audience_simulation", "decision", "market_comparison"]
+
+
+@pytest.fixture(scope="module")
+def auth_token():
+    """Get authentication token for tests"""
+    response = requests.post(f"{BASE_URL}/api/auth/login", json={
+        "email": TEST_EMAIL,
+        "password": TEST_PASSWORD
+    })
+    if response.status_code == 200:
+        return response.json().get("token")
+    pytest.skip("Authentication failed - skipping authenticated tests")
+
+
+@pytest.fixture(scope="module")
+def headers(auth_token):
+    """Return headers with auth token"""
+    return {
+        "Authorization": f"Bearer {auth_token}",
+        "Content-Type": "application/json"
+    }
+
+
+@pytest.fixture(scope="module")
+def analysis_id(headers):
+    """Create a fresh analysis for this module"""
+    response = requests.post(f"{BASE_URL}/api/analyses", json={
+        "nome": "TEST_DataLayerProduct",
+        "nicho": "Teste de Dados",
+        "promessa_principal": "Validar a camada de dados",
+    }, headers=headers)
+    assert response.status_code == 200, f"Failed to create analysis: {response.text}"
+    return response.json()["id"]
+
+
+class TestStageOutputStore:
+    """Stage outputs live in stage_outputs; analyses keep only references"""
+
+    def test_create_returns_empty_stages(self, headers, analysis_id):
+        """New analysis exposes every stage field as null plus an empty reference map"""
+        response = requests.get(f"{BASE_URL}/api/analyses/{analysis_id}", headers=headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["stages"] == {}
+        for field in STAGE_FIELDS:
+            assert field in data and data[field] is None
+        print("✓ New analysis has empty stage references")
+
+    def test_list_does_not_ship_stage_outputs(self, headers, analysis_id):
+        """GET /api/analyses returns light documents without stage payloads"""
+        response = requests.get(f"{BASE_URL}/api/analyses", headers=headers)
+        assert response.status_code == 200
+        items = response.json()
+        assert any(a["id"] == analysis_id for a in items)
+        for item in items:
+            for field in STAGE_FIELDS:
+                assert field not in item, f"{field} should not be inlined in list payload"
+        print(f"✓ {len(items)} analyses listed without stage outputs")
+
+    def test_parse_stores_revision_reference(self, headers, analysis_id):
+        """Running parse records a revision reference and hydrates the output on read"""
+        response = requests.post(f"{BASE_URL}/api/analyses/{analysis_id}/parse", headers=headers, timeout=120)
+        if response.status_code != 200:
+            pytest.skip(f"LLM unavailable: {response.status_code}")
+
+        detail = requests.get(f"{BASE_URL}/api/analyses/{analysis_id}", headers=headers).json()
+        assert detail["status"] == "parsed"
+        assert detail["stages"]["strategic_analysis"]["revision"] == 1
+        assert detail["strategic_analysis"] is not None
+        assert "compliance" in detail["strategic_analysis"]
+        print("✓ Parse output stored as revision 1 and hydrated on read")
+
+
+class TestCreativeVersionCounters:
+    """Version numbers come from an atomic counter, not a count_documents scan"""
+
+    def test_concurrent_generations_get_distinct_versions(self, headers, analysis_id):
+        """Two simultaneous claude_text generations must not share a version number"""
+        payload = {"analysis_id": analysis_id, "provider": "claude_text", "prompt": "TEST_VersionCounter"}
+
+        def generate(_):
+            return requests.post(f"{BASE_URL}/api/creatives/generate", json=payload, headers=headers, timeout=120)
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            responses = list(pool.map(generate, range(2)))
+        if any(r.status_code != 200 for r in responses):
+            pytest.skip("LLM unavailable for creative generation")
+
+        items = requests.get(f"{BASE_URL}/api/creatives/list/{analysis_id}", headers=headers).json()
+        versions = [c["version"] for c in items if c.get("provider") == "claude_text"]
+        assert len(versions) == len(set(versions)), f"Duplicate versions: {versions}"
+        print(f"✓ Versions are unique: {sorted(versions)}")
+
+
+class TestSingleRoundTripWrites:
+    """share_analysis and update_analysis_product use conditional find_one_and_update"""
+
+    def test_share_token_is_stable(self, headers, analysis_id):
+        """Sharing twice returns the same token"""
+        first = requests.post(f"{BASE_URL}/api/analyses/{analysis_id}/share", headers=headers)
+        second = requests.post(f"{BASE_URL}/api/analyses/{analysis_id}/share", headers=headers)
+        assert first.status_code == 200 and second.status_code == 200
+        assert first.json()["public_token"] == second.json()["public_token"]
+        print(f"✓ Share token stable: {first.json()['public_token']}")
+
+    def test_share_unknown_analysis_returns_404(self, headers):
+        """Ownership filter rejects unknown ids"""
+        response = requests.post(f"{BASE_URL}/api/analyses/nonexistent-id-12345/share", headers=headers)
+        assert response.status_code == 404
+
+    def test_update_product(self, headers, analysis_id):
+        """PATCH product persists in one call"""
+        product = {"nome": "TEST_DataLayerProduct v2", "nicho": "Teste de Dados", "promessa_principal": "Atualizada"}
+        response = requests.patch(f"{BASE_URL}/api/analyses/{analysis_id}/product", json=product, headers=headers)
+        assert response.status_code == 200
+        detail = requests.get(f"{BASE_URL}/api/analyses/{analysis_id}", headers=headers).json()
+        assert detail["product"]["nome"] == "TEST_DataLayerProduct v2"
+        print("✓ Product updated")
+
+    def test_update_product_unknown_analysis_returns_404(self, headers):
+        """PATCH on a missing analysis is a 404"""
+        product = {"nome": "x", "nicho": "y", "promessa_principal": "z"}
+        response = requests.patch(f"{BASE_URL}/api/analyses/nonexistent-id-12345/product", json=product, headers=headers)
+        assert response.status_code == 404
+
+
+class TestCascadingDeletion:
+    """DELETE tombstones the analysis and hands cleanup to the background reaper"""
+
+    def test_delete_hides_analysis_and_reaps(self, headers):
+        """Deleted analysis disappears immediately and the tombstone is eventually removed"""
+        created = requests.post(f"{BASE_URL}/api/analyses", json={
+            "nome": "TEST_DeleteCascade",
+            "nicho": "Teste",
+            "promessa_principal": "Ser removida",
+        }, headers=headers).json()
+        analysis_id = created["id"]
+
+        response = requests.delete(f"{BASE_URL}/api/analyses/{analysis_id}", headers=headers)
+        assert response.status_code == 200
+        assert response.json()["success"] is True
+
+        assert requests.get(f"{BASE_URL}/api/analyses/{analysis_id}", headers=headers).status_code == 404
+        listed = requests.get(f"{BASE_URL}/api/analyses", headers=headers).json()
+        assert all(a["id"] != analysis_id for a in listed)
+
+        for _ in range(10):
+            progress = requests.get(f"{BASE_URL}/api/analyses/{analysis_id}/deletion", headers=headers)
+            if progress.status_code == 404:
+                break
+            assert progress.json()["state"] in ("pending", "running")
+            time.sleep(1)
+        assert progress.status_code == 404, "Reaper did not finish in time"
+        print("✓ Analysis tombstoned and reaped")
+
+    def test_delete_twice_returns_404(self, headers):
+        """A tombstoned analysis cannot be deleted again"""
+        created = requests.post(f"{BASE_URL}/api/analyses", json={
+            "nome": "TEST_DeleteTwice", "nicho": "Teste", "promessa_principal": "x",
+        }, headers=headers).json()
+        assert requests.delete(f"{BASE_URL}/api/analyses/{created['id']}", headers=headers).status_code == 200
+        assert requests.delete(f"{BASE_URL}/api/analyses/{created['id']}", headers=headers).status_code == 404
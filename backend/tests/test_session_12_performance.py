@@ -0,0 +1,201 @@
+"""
+Session 12 Tests: Observability and response performance
+Tests:
+1. GET /api/metrics/mongo - command latency histograms and pool metrics
+2. GET /api/events - SSE live updates (change stream or polling fallback)
+3. GET /api/public/{token} - ETag, Cache-Control, 304 and trimmed projection
+4. GET /api/stats - server-side dashboard aggregates
+5. Response compression (gzip/br above a size threshold, never on SSE)
+6. GET /api/metrics/archive - archival tier stats
+"""
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+TEST_EMAIL = "test@test.com"
+TEST_PASSWORD = "test123"
+
+
+@pytest.fixture(scope="module")
+def auth_token():
+    """Get authentication token for tests"""
+    response = requests.post(f"{BASE_URL}/api/auth/login", json={
+        "email": TEST_EMAIL,
+        "password": TEST_PASSWORD
+    })
+    if response.status_code == 200:
+        return response.json().get("token")
+    pytest.skip("Authentication failed - skipping authenticated tests")
+
+
+@pytest.fixture(scope="module")
+def headers(auth_token):
+    """Return headers with auth token"""
+    return {
+        "Authorization": f"Bearer {auth_token}",
+        "Content-Type": "application/json"
+    }
+
+
+class TestMongoMetrics:
+    """Command listener and pool listener exposed on /api/metrics/mongo"""
+
+    def test_metrics_requires_auth(self):
+        """Metrics are not public"""
+        response = requests.get(f"{BASE_URL}/api/metrics/mongo")
+        assert response.status_code in [401, 403]
+
+    def test_metrics_records_commands(self, headers):
+        """After a list call, analyses.find shows up with a histogram"""
+        requests.get(f"{BASE_URL}/api/analyses", headers=headers)
+        response = requests.get(f"{BASE_URL}/api/metrics/mongo", headers=headers)
+        if response.status_code == 403:
+            pytest.skip("METRICS_TOKEN configured on server")
+        assert response.status_code == 200
+        data = response.json()
+        assert "analyses.find" in data["commands"]["commands"]
+        histogram = data["commands"]["commands"]["analyses.find"]
+        assert histogram["count"] >= 1
+        assert "buckets" in histogram
+        assert "checkout_wait" in data["pool"]
+        print(f"✓ analyses.find avg {histogram['avg_ms']}ms over {histogram['count']} calls")
+
+
+class TestLiveUpdatesSSE:
+    """Per-user SSE stream replacing dashboard polling"""
+
+    def test_events_requires_token(self):
+        """Stream without token is rejected"""
+        response = requests.get(f"{BASE_URL}/api/events")
+        assert response.status_code == 401
+
+    def test_events_stream_starts_with_ready(self, auth_token):
+        """Stream opens with a ready event reporting the hub mode"""
+        with requests.get(f"{BASE_URL}/api/events", params={"token": auth_token}, stream=True, timeout=10) as response:
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("text/event-stream")
+            lines = []
+            for line in response.iter_lines(decode_unicode=True):
+                lines.append(line)
+                if line.startswith("data:"):
+                    break
+        assert "event: ready" in lines
+        print(f"✓ SSE ready: {lines[-1]}")
+
+
+class TestPublicShareCache:
+    """Public share endpoint is cacheable and trimmed"""
+
+    @pytest.fixture(scope="class")
+    def public_token(self, headers):
+        created = requests.post(f"{BASE_URL}/api/analyses", json={
+            "nome": "TEST_PublicCache", "nicho": "Teste", "promessa_principal": "Ser compartilhada",
+        }, headers=headers).json()
+        response = requests.post(f"{BASE_URL}/api/analyses/{created['id']}/share", headers=headers)
+        assert response.status_code == 200
+        return response.json()["public_token"]
+
+    def test_public_has_etag_and_cache_control(self, public_token):
+        """First hit returns ETag and Cache-Control, without owner fields"""
+        response = requests.get(f"{BASE_URL}/api/public/{public_token}")
+        assert response.status_code == 200
+        assert response.headers.get("ETag", "").startswith('"')
+        assert "max-age" in response.headers.get("Cache-Control", "")
+        data = response.json()
+        assert "user_id" not in data
+        assert "public_token" not in data
+        assert data["product"]["nome"] == "TEST_PublicCache"
+        print(f"✓ Public response ETag {response.headers['ETag']}")
+
+    def test_public_conditional_get_returns_304(self, public_token):
+        """If-None-Match with the current ETag returns 304"""
+        first = requests.get(f"{BASE_URL}/api/public/{public_token}")
+        second = requests.get(f"{BASE_URL}/api/public/{public_token}", headers={"If-None-Match": first.headers["ETag"]})
+        assert second.status_code == 304
+        assert second.headers.get("ETag") == first.headers["ETag"]
+
+    def test_public_unknown_token_returns_404(self):
+        """Unknown token stays a 404"""
+        response = requests.get(f"{BASE_URL}/api/public/doesnotexist")
+        assert response.status_code == 404
+
+
+class TestDashboardStats:
+    """Aggregates computed in Mongo instead of on the client"""
+
+    def test_stats_requires_auth(self):
+        response = requests.get(f"{BASE_URL}/api/stats")
+        assert response.status_code == 401
+
+    def test_stats_shape_matches_list(self, headers):
+        """Totals agree with the analyses list"""
+        stats = requests.get(f"{BASE_URL}/api/stats", headers=headers)
+        assert stats.status_code == 200
+        data = stats.json()
+        for key in ["total_analyses", "completed", "completion_rate", "avg_compliance_score",
+                    "by_status", "by_niche", "by_language", "creatives_by_provider"]:
+            assert key in data, f"Missing {key}"
+        assert sum(data["by_status"].values()) == data["total_analyses"]
+        assert 0 <= data["completion_rate"] <= 100
+        print(f"✓ Stats: {data['total_analyses']} analyses, {data['completion_rate']}% completed")
+
+    def test_stats_invalidated_on_create(self, headers):
+        """Creating an analysis is reflected immediately despite the cache"""
+        before = requests.get(f"{BASE_URL}/api/stats", headers=headers).json()["total_analyses"]
+        requests.post(f"{BASE_URL}/api/analyses", json={
+            "nome": "TEST_Stats", "nicho": "Teste", "promessa_principal": "Contar",
+        }, headers=headers)
+        after = requests.get(f"{BASE_URL}/api/stats", headers=headers).json()["total_analyses"]
+        assert after == before + 1
+
+
+class TestResponseCompression:
+    """CompressionMiddleware compresses large JSON and leaves streams alone"""
+
+    def test_large_json_is_gzipped(self, headers):
+        """A large JSON response is gzip-encoded when the client accepts it"""
+        response = requests.get(f"{BASE_URL}/api/competitor/analyses", headers={**headers, "Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        if len(response.content) < 1024:
+            pytest.skip("Response below compression threshold")
+        assert response.headers.get("Content-Encoding") == "gzip"
+        assert "Accept-Encoding" in response.headers.get("Vary", "")
+        print(f"✓ {len(response.content)} bytes served gzip-encoded")
+
+    def test_small_json_not_compressed(self):
+        """Tiny responses skip compression"""
+        response = requests.post(f"{BASE_URL}/api/compliance/check", json={"text": "ok"}, headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        assert "Content-Encoding" not in response.headers
+
+    def test_sse_not_compressed(self, auth_token):
+        """The event stream is never compressed"""
+        with requests.get(f"{BASE_URL}/api/events", params={"token": auth_token},
+                          headers={"Accept-Encoding": "gzip, br"}, stream=True, timeout=10) as response:
+            assert response.status_code == 200
+            assert "Content-Encoding" not in response.headers
+
+
+class TestArchiveMetrics:
+    """Cold stage outputs and competitor results are compressed by a sweeper"""
+
+    def test_archive_metrics_shape(self, headers):
+        response = requests.get(f"{BASE_URL}/api/metrics/archive", headers=headers)
+        if response.status_code == 403:
+            pytest.skip("METRICS_TOKEN configured on server")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["codec"] in ("zstd", "zlib")
+        assert data["bytes_saved"] == data["raw_bytes"] - data["stored_bytes"]
+        print(f"✓ Archive: {data['docs_archived']} docs, {data['bytes_saved']} bytes saved")
+
+    def test_competitor_list_still_returns_results(self, headers):
+        """Archived competitor results are decompressed transparently"""
+        response = requests.get(f"{BASE_URL}/api/competitor/analyses", headers=headers)
+        assert response.status_code == 200
+        for item in response.json():
+            assert "result_z" not in item
+            assert "result" in item
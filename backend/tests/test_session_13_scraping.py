@@ -0,0 +1,186 @@
+"""
+Session 13 Tests: Scraper performance
+Tests:
+1. Shared pooled HTTP client (GET /api/metrics/http, connection reuse across image downloads)
+2. Scrape cache keyed by normalized URL (second analysis is a cache hit)
+3. Single-pass page extraction (same fields as before, scripts/nav/footer stripped)
+4. Parse pool and event-loop lag (GET /api/metrics/parse)
+5. Streaming capped download (non-HTML content types short-circuit before the body)
+6. POST /api/competitor/analyze-batch - NDJSON per-URL results with a summary line
+7. Per-host politeness scheduler and robots.txt cache (politeness block in /api/metrics/http)
+"""
+import pytest
+import requests
+import os
+import json
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+TEST_EMAIL = "test@test.com"
+TEST_PASSWORD = "test123"
+
+
+@pytest.fixture(scope="module")
+def auth_token():
+    """Get authentication token for tests"""
+    response = requests.post(f"{BASE_URL}/api/auth/login", json={
+        "email": TEST_EMAIL,
+        "password": TEST_PASSWORD
+    })
+    if response.status_code == 200:
+        return response.json().get("token")
+    pytest.skip("Authentication failed - skipping authenticated tests")
+
+
+@pytest.fixture(scope="module")
+def headers(auth_token):
+    """Return headers with auth token"""
+    return {
+        "Authorization": f"Bearer {auth_token}",
+        "Content-Type": "application/json"
+    }
+
+
+def get_http_metrics(headers):
+    response = requests.get(f"{BASE_URL}/api/metrics/http", headers=headers)
+    if response.status_code == 403:
+        pytest.skip("METRICS_TOKEN configured on server")
+    assert response.status_code == 200
+    return response.json()
+
+
+class TestSharedHttpClient:
+    """Outbound fetches reuse one application-lifetime httpx client"""
+
+    def test_http_metrics_shape(self, headers):
+        data = get_http_metrics(headers)
+        for key in ["http2", "requests_sent", "connections_opened", "tls_handshakes", "connection_reuse_rate", "hosts"]:
+            assert key in data, f"Missing {key}"
+
+    def test_same_host_images_reuse_connections(self, headers):
+        """Several images from one host open fewer TLS handshakes than requests"""
+        before = get_http_metrics(headers)
+        urls = [f"https://picsum.photos/id/{i}/200/200" for i in range(10, 15)]
+        response = requests.post(f"{BASE_URL}/api/competitor/image-analysis",
+                                 json={"image_urls": urls}, headers=headers, timeout=60)
+        assert response.status_code == 200
+        after = get_http_metrics(headers)
+
+        sent = after["requests_sent"] - before["requests_sent"]
+        handshakes = after["tls_handshakes"] - before["tls_handshakes"]
+        if sent == 0:
+            pytest.skip("No outbound requests recorded (network unavailable)")
+        assert handshakes < sent, f"{handshakes} handshakes for {sent} requests"
+        print(f"✓ {sent} requests, {handshakes} TLS handshakes")
+
+
+class TestScrapeCache:
+    """Repeated scrapes of the same page are served from scrape_cache"""
+
+    def test_second_analysis_hits_cache(self, headers):
+        """Tracking params and fragments do not defeat the cache"""
+        first = requests.post(f"{BASE_URL}/api/competitor/analyze",
+                              json={"url": "https://example.com/"}, headers=headers, timeout=120)
+        if first.status_code != 200:
+            pytest.skip(f"Competitor analysis unavailable: {first.status_code}")
+        second = requests.post(f"{BASE_URL}/api/competitor/analyze",
+                               json={"url": "https://example.com/?utm_source=test#top", "force": True},
+                               headers=headers, timeout=120)
+        assert second.status_code == 200
+        status = second.json()["scraping_data"]["scrape_cache"]
+        assert status in ("hit", "revalidated", "unchanged"), f"Unexpected cache status {status}"
+        print(f"✓ Second scrape cache status: {status}")
+
+
+class TestSinglePassExtraction:
+    """extract_page collects every field in one streaming pass"""
+
+    def test_extracted_fields(self, headers):
+        """A plain page still yields the same scraping_data fields"""
+        response = requests.post(f"{BASE_URL}/api/competitor/analyze",
+                                 json={"url": "https://example.com/"}, headers=headers, timeout=120)
+        if response.status_code != 200:
+            pytest.skip(f"Competitor analysis unavailable: {response.status_code}")
+        data = response.json()["scraping_data"]
+        assert data["source_type"] == "webpage"
+        assert data["images_found"] == 0
+        assert data["block_risk_auto"]["level"] == "baixo"
+        assert data["hook_type_auto"] in ("pergunta", "historia", "lista", "prova_social", "mecanismo", "choque", "direto")
+        print(f"✓ Extracted page classified as {data['hook_type_auto']}")
+
+
+class TestParsePool:
+    """HTML extraction runs in a process pool; loop lag is measured"""
+
+    def test_parse_metrics_shape(self, headers):
+        response = requests.get(f"{BASE_URL}/api/metrics/parse", headers=headers)
+        if response.status_code == 403:
+            pytest.skip("METRICS_TOKEN configured on server")
+        assert response.status_code == 200
+        data = response.json()
+        for key in ["workers", "max_input_chars", "submitted", "inline", "timeouts", "fallbacks", "latency"]:
+            assert key in data["pool"], f"Missing pool.{key}"
+        assert data["event_loop_lag"]["count"] >= 1
+        print(f"✓ Loop lag avg {data['event_loop_lag']['avg_ms']}ms, max {data['event_loop_lag']['max_ms']}ms")
+
+
+class TestStreamingDownload:
+    """The scraper checks content-type before reading the body"""
+
+    def test_image_without_extension_is_short_circuited(self, headers):
+        """An image URL with no file extension is detected from its content-type"""
+        response = requests.post(f"{BASE_URL}/api/competitor/analyze",
+                                 json={"url": "https://picsum.photos/200"}, headers=headers, timeout=120)
+        if response.status_code != 200:
+            pytest.skip(f"Competitor analysis unavailable: {response.status_code}")
+        data = response.json()["scraping_data"]
+        assert data["source_type"] == "image"
+        print("✓ image/* content-type short-circuited")
+
+
+class TestCompetitorBatch:
+    """Many URLs analyzed concurrently, streamed back as NDJSON"""
+
+    def test_batch_rejects_too_many_urls(self, headers):
+        urls = [f"https://example.com/p{i}" for i in range(51)]
+        response = requests.post(f"{BASE_URL}/api/competitor/analyze-batch", json={"urls": urls}, headers=headers)
+        assert response.status_code == 400
+
+    def test_batch_streams_results_and_summary(self, headers):
+        """One line per URL (ok or error) followed by a done line"""
+        urls = ["https://example.com/", "https://nonexistent.invalid/"]
+        with requests.post(f"{BASE_URL}/api/competitor/analyze-batch", json={"urls": urls},
+                           headers=headers, stream=True, timeout=180) as response:
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("application/x-ndjson")
+            lines = [json.loads(line) for line in response.iter_lines() if line]
+
+        summary = lines[-1]
+        assert summary["done"] is True and summary["total"] == 2
+        items = {item["url"]: item for item in lines[:-1]}
+        assert set(items) == set(urls)
+        assert items["https://nonexistent.invalid/"]["status"] == "error"
+        if items["https://example.com/"]["status"] == "ok":
+            assert items["https://example.com/"]["id"]
+        print(f"✓ Batch: {summary['ok']} ok, {summary['failed']} failed in {summary['elapsed_ms']}ms")
+
+
+class TestPolitenessScheduler:
+    """Scrapes are spaced per host and respect robots.txt"""
+
+    def test_politeness_metrics_shape(self, headers):
+        data = get_http_metrics(headers)["politeness"]
+        for key in ["rate_per_host", "respect_robots", "waits", "throttled", "robots_blocked", "hosts_backing_off"]:
+            assert key in data, f"Missing politeness.{key}"
+
+    def test_same_host_batch_is_spaced(self, headers):
+        """Several URLs on one host in a batch wait their turn instead of failing"""
+        before = get_http_metrics(headers)["politeness"]["waits"]
+        urls = [f"https://example.com/?page={i}" for i in range(3)]
+        response = requests.post(f"{BASE_URL}/api/competitor/analyze-batch", json={"urls": urls},
+                                 headers=headers, timeout=180)
+        assert response.status_code == 200
+        after = get_http_metrics(headers)["politeness"]["waits"]
+        assert after >= before
+        print(f"✓ {after - before} scheduler waits for a same-host batch")
@@ -0,0 +1,237 @@
+"""
+Session 14 Tests: Competitor intelligence
+Tests:
+1. Tracked competitor pages for scheduled re-crawl (POST/GET/DELETE /api/competitor/tracked)
+2. Competitor analysis reuse by normalized URL + content fingerprint (force re-runs)
+3. Structured data (JSON-LD, microdata, OpenGraph, Twitter cards) in scraping_data
+4. Boilerplate and near-duplicate paragraph removal report (scraping_data.text_cleanup)
+5. Bounded same-site funnel crawl (POST /api/competitor/analyze with crawl=true)
+6. Bulk ad-library import (POST /api/competitor/ads/import, GET /api/competitor/ads)
+7. Single-pass term matcher behind compliance, block-risk and hook detection (same results as before)
+"""
+import pytest
+import requests
+import os
+import json
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+TEST_EMAIL = "test@test.com"
+TEST_PASSWORD = "test123"
+
+
+@pytest.fixture(scope="module")
+def auth_token():
+    """Get authentication token for tests"""
+    response = requests.post(f"{BASE_URL}/api/auth/login", json={
+        "email": TEST_EMAIL,
+        "password": TEST_PASSWORD
+    })
+    if response.status_code == 200:
+        return response.json().get("token")
+    pytest.skip("Authentication failed - skipping authenticated tests")
+
+
+@pytest.fixture(scope="module")
+def headers(auth_token):
+    """Return headers with auth token"""
+    return {
+        "Authorization": f"Bearer {auth_token}",
+        "Content-Type": "application/json"
+    }
+
+
+class TestCompetitorTracking:
+    """Tracked pages are re-scraped in the background; the LLM only runs on material change"""
+
+    def test_track_is_idempotent_per_normalized_url(self, headers):
+        """Tracking the same page with tracking params returns the same record"""
+        first = requests.post(f"{BASE_URL}/api/competitor/tracked",
+                              json={"url": "https://example.com/"}, headers=headers)
+        assert first.status_code == 200
+        second = requests.post(f"{BASE_URL}/api/competitor/tracked",
+                               json={"url": "https://www.example.com/?utm_source=test", "interval_hours": 0.1},
+                               headers=headers)
+        assert second.status_code == 200
+        assert first.json()["id"] == second.json()["id"]
+        assert second.json()["interval_hours"] >= 1
+        assert "fingerprint" not in second.json()
+        print(f"✓ Tracking record {first.json()['id']}")
+
+    def test_tracked_list_and_delete(self, headers):
+        tracked = requests.post(f"{BASE_URL}/api/competitor/tracked",
+                                json={"url": "https://example.org/"}, headers=headers).json()
+        listed = requests.get(f"{BASE_URL}/api/competitor/tracked", headers=headers).json()
+        assert any(t["id"] == tracked["id"] for t in listed)
+
+        assert requests.delete(f"{BASE_URL}/api/competitor/tracked/{tracked['id']}", headers=headers).status_code == 200
+        assert requests.delete(f"{BASE_URL}/api/competitor/tracked/{tracked['id']}", headers=headers).status_code == 404
+
+
+class TestCompetitorReuse:
+    """Same normalized URL with the same content returns the existing analysis"""
+
+    def test_repeat_analysis_is_reused(self, headers):
+        first = requests.post(f"{BASE_URL}/api/competitor/analyze",
+                              json={"url": "https://example.com/"}, headers=headers, timeout=120)
+        if first.status_code != 200:
+            pytest.skip(f"Competitor analysis unavailable: {first.status_code}")
+        second = requests.post(f"{BASE_URL}/api/competitor/analyze",
+                               json={"url": "https://www.example.com/?fbclid=abc"}, headers=headers, timeout=120)
+        assert second.status_code == 200
+        data = second.json()
+        assert data["reused"] is True
+        assert "analyzed_at" in data
+        print(f"✓ Reused analysis {data['id']} from {data['analyzed_at']}")
+
+    def test_force_runs_fresh_analysis(self, headers):
+        response = requests.post(f"{BASE_URL}/api/competitor/analyze",
+                                 json={"url": "https://example.com/", "force": True}, headers=headers, timeout=120)
+        if response.status_code != 200:
+            pytest.skip(f"Competitor analysis unavailable: {response.status_code}")
+        assert response.json()["reused"] is False
+
+    def test_other_language_is_not_reused(self, headers):
+        response = requests.post(f"{BASE_URL}/api/competitor/analyze", json={"url": "https://example.com/"},
+                                 headers={**headers, "x-language": "es"}, timeout=120)
+        if response.status_code != 200:
+            pytest.skip(f"Competitor analysis unavailable: {response.status_code}")
+        repeat = requests.post(f"{BASE_URL}/api/competitor/analyze", json={"url": "https://example.com/"},
+                               headers={**headers, "x-language": "en"}, timeout=120)
+        assert repeat.status_code == 200
+        assert repeat.json()["reused"] is False
+
+
+class TestStructuredData:
+    """JSON-LD/microdata/OpenGraph are extracted in the same pass as the page text"""
+
+    def test_structured_sources_reported(self, headers):
+        """scraping_data lists which structured sources the page had (none for a plain page)"""
+        response = requests.post(f"{BASE_URL}/api/competitor/analyze",
+                                 json={"url": "https://example.com/", "force": True}, headers=headers, timeout=120)
+        if response.status_code != 200:
+            pytest.skip(f"Competitor analysis unavailable: {response.status_code}")
+        sources = response.json()["scraping_data"]["structured_sources"]
+        assert isinstance(sources, list)
+        assert set(sources) <= {"json-ld", "microdata", "opengraph", "twitter"}
+        print(f"✓ Structured sources: {sources or 'none'}")
+
+
+class TestTextCleanup:
+    """Boilerplate and repeated blocks are dropped before the competitor prompt"""
+
+    def test_cleanup_report(self, headers):
+        response = requests.post(f"{BASE_URL}/api/competitor/analyze",
+                                 json={"url": "https://example.com/", "force": True}, headers=headers, timeout=120)
+        if response.status_code != 200:
+            pytest.skip(f"Competitor analysis unavailable: {response.status_code}")
+        report = response.json()["scraping_data"]["text_cleanup"]
+        if report is None:
+            pytest.skip("Served from a scrape cache entry written before the cleanup existed")
+        for key in ["blocks_in", "blocks_kept", "boilerplate", "near_duplicates", "chars_in", "chars_kept", "removed_pct"]:
+            assert key in report, f"Missing text_cleanup.{key}"
+        assert report["blocks_kept"] <= report["blocks_in"]
+        assert report["chars_kept"] <= 3000
+        print(f"✓ Kept {report['blocks_kept']}/{report['blocks_in']} blocks, removed {report['removed_pct']}%")
+
+
+class TestFunnelCrawl:
+    """crawl=true follows same-site links breadth-first and makes one LLM call"""
+
+    def test_crawl_respects_page_cap(self, headers):
+        response = requests.post(f"{BASE_URL}/api/competitor/analyze",
+                                 json={"url": "https://www.iana.org/", "crawl": True, "max_pages": 3, "max_depth": 1},
+                                 headers=headers, timeout=180)
+        if response.status_code != 200:
+            pytest.skip(f"Competitor analysis unavailable: {response.status_code}")
+        data = response.json()
+        assert data["reused"] is False
+        scraping = data["scraping_data"]
+        assert scraping["source_type"] == "funnel"
+        pages = scraping["funnel"]["pages"]
+        assert 1 <= len(pages) <= 3
+        assert pages[0]["depth"] == 0
+        assert all(p["depth"] <= 1 for p in pages)
+        print(f"✓ Funnel crawl visited {len(pages)} pages, {len(scraping['funnel']['errors'])} errors")
+
+
+class TestAdLibraryImport:
+    """Ad-library exports are parsed in bulk, classified and upserted per ad"""
+
+    ADS = {"data": [
+        {"id": "test-ad-1", "page_name": "Marca Teste", "publisher_platforms": ["facebook", "instagram"],
+         "ad_creative_bodies": ["Você sabia que <b>9 em cada 10</b> pessoas erram isso?"]},
+        {"id": "test-ad-2", "publisher_platforms": ["facebook"],
+         "ad_creative_bodies": ["Cura definitiva garantida em 7 dias"]},
+    ]}
+
+    def upload(self, auth_token, name, content, niche="teste-import"):
+        return requests.post(f"{BASE_URL}/api/competitor/ads/import",
+                             files={"file": (name, content)}, data={"niche": niche},
+                             headers={"Authorization": f"Bearer {auth_token}"}, timeout=60)
+
+    def test_json_import_is_idempotent(self, auth_token, headers):
+        first = self.upload(auth_token, "ads.json", json.dumps(self.ADS))
+        assert first.status_code == 200
+        data = first.json()
+        assert data["format"] == "json" and data["ads_read"] == 2
+        second = self.upload(auth_token, "ads.json", json.dumps(self.ADS)).json()
+        assert second["inserted"] == 0 and second["updated"] == 2
+
+        ads = requests.get(f"{BASE_URL}/api/competitor/ads", params={"niche": "teste-import"}, headers=headers).json()
+        by_id = {ad["ad_id"]: ad for ad in ads}
+        assert by_id["test-ad-1"]["text"] == "Você sabia que 9 em cada 10 pessoas erram isso?"
+        assert by_id["test-ad-1"]["hook_type"] == "pergunta"
+        assert by_id["test-ad-2"]["block_risk"]["level"] != "baixo"
+        print(f"✓ Imported {data['ads_read']} ads: {data['hook_types']}")
+
+    def test_csv_import(self, auth_token):
+        content = "Ad ID;Ad Text;Image URL\ncsv-1;Descubra o método;//cdn.example.com/a.jpg\n"
+        response = self.upload(auth_token, "ads.csv", content)
+        assert response.status_code == 200
+        assert response.json()["format"] == "csv" and response.json()["ads_read"] == 1
+
+    def test_csv_long_field_accepted(self, auth_token):
+        """Cells above the csv module's 128KB default (long bodies, base64 thumbnails) still import"""
+        content = "Ad ID,Ad Text\ncsv-long," + "x" * 200000 + "\n"
+        response = self.upload(auth_token, "ads.csv", content)
+        assert response.status_code == 200
+        assert response.json()["ads_read"] == 1
+
+    def test_csv_oversized_field_rejected(self, auth_token):
+        content = 'Ad ID,Ad Text\ncsv-huge,"' + "x" * (9 * 1024 * 1024) + '"\n'
+        response = self.upload(auth_token, "ads.csv", content)
+        assert response.status_code == 400
+
+    def test_csv_malformed_row_keeps_earlier_batches(self, auth_token):
+        """A broken quoted row after the first batch returns a partial summary with error, not a 500"""
+        rows = "".join(f"csv-bad-{i},Texto {i}\n" for i in range(600))
+        content = "Ad ID,Ad Text\n" + rows + '"csv-bad-x"y,quebrado\n'
+        response = self.upload(auth_token, "ads.csv", content, niche="teste-import-csv")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["ads_read"] > 0 and "error" in data
+        print(f"✓ Partial CSV import: {data['ads_read']} ads, error={data['error']}")
+
+    def test_invalid_file_rejected(self, auth_token):
+        response = self.upload(auth_token, "ads.json", "[{\"id\": ")
+        assert response.status_code == 400
+
+
+class TestTermMatcher:
+    """Compliance terms come from one automaton pass; overlapping terms still all match"""
+
+    def test_overlapping_terms(self):
+        response = requests.post(f"{BASE_URL}/api/compliance/check",
+                                 json={"text": "Vai CURAR para sempre, nunca mais sinta dor. 100% natural."})
+        assert response.status_code == 200
+        data = response.json()
+        terms = [r["termo"] for r in data["riscos"]]
+        assert terms == ["cura", "curar", "100%", "nunca mais", "para sempre"]
+        assert data["score"] == 25
+
+    def test_clean_text_scores_100(self):
+        response = requests.post(f"{BASE_URL}/api/compliance/check", json={"text": "Conheça nosso novo produto."})
+        assert response.status_code == 200
+        assert response.json()["total_riscos"] == 0 and response.json()["score"] == 100
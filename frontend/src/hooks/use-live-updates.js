@@ -0,0 +1,24 @@
+import { useEffect, useRef } from "react";
+
+// Assina o stream SSE do usuário (/api/events) e repassa cada evento compacto ao handler.
+export function useLiveUpdates(onEvent) {
+  const handlerRef = useRef(onEvent);
+  handlerRef.current = onEvent;
+
+  useEffect(() => {
+    const token = localStorage.getItem("token");
+    if (!token || typeof EventSource === "undefined") return undefined;
+
+    const source = new EventSource(
+      `${process.env.REACT_APP_BACKEND_URL}/api/events?token=${encodeURIComponent(token)}`
+    );
+    source.onmessage = (e) => {
+      try {
+        handlerRef.current(JSON.parse(e.data));
+      } catch {
+        /* evento malformado: ignora */
+      }
+    };
+    return () => source.close();
+  }, []);
+}
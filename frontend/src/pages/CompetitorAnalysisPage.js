@@ -27,6 +27,7 @@ import {
 
 export default function CompetitorAnalysisPage() {
   const [url, setUrl] = useState("");
+  const [crawlFunnel, setCrawlFunnel] = useState(false);
   const [loading, setLoading] = useState(false);
   const [loadingMsg, setLoadingMsg] = useState("");
   const [result, setResult] = useState(null);
@@ -72,10 +73,14 @@ export default function CompetitorAnalysisPage() {
     }, 3000);
 
     try {
-      const { data } = await api.post("/competitor/analyze", { url: url.trim() });
+      const { data } = await api.post("/competitor/analyze", { url: url.trim(), crawl: crawlFunnel });
       setResult(data);
-      setHistory((prev) => [{ id: data.id, url: url.trim(), result: data, created_at: new Date().toISOString() }, ...prev]);
-      toast.success(t("comp.done"));
+      if (data.reused) {
+        toast.info(`Mesmo conteúdo já analisado em ${new Date(data.analyzed_at).toLocaleString()}: resultado reaproveitado`);
+      } else {
+        setHistory((prev) => [{ id: data.id, url: url.trim(), result: data, created_at: new Date().toISOString() }, ...prev]);
+        toast.success(t("comp.done"));
+      }
     } catch (err) {
       toast.error(err.response?.data?.detail || t("comp.error"));
     } finally {
@@ -105,6 +110,16 @@ export default function CompetitorAnalysisPage() {
     navigate("/analysis/new");
   };
 
+  const handleTrack = async () => {
+    if (!scraping?.url) return;
+    try {
+      await api.post("/competitor/tracked", { url: scraping.url });
+      toast.success("Página monitorada: você será avisado quando ela mudar");
+    } catch (err) {
+      toast.error(err.response?.data?.detail || "Erro ao monitorar página");
+    }
+  };
+
   const handlePhashAnalysis = async () => {
     const urls = imageUrls.split("\n").map(u => u.trim()).filter(u => u.length > 0);
     if (urls.length === 0) return;
@@ -189,6 +204,16 @@ export default function CompetitorAnalysisPage() {
               )}
             </Button>
           </div>
+          <label className="flex items-center gap-2 text-xs text-zinc-500 cursor-pointer select-none">
+            <input
+              data-testid="competitor-crawl-toggle"
+              type="checkbox"
+              checked={crawlFunnel}
+              onChange={(e) => setCrawlFunnel(e.target.checked)}
+              className="accent-white"
+            />
+            Analisar o funil inteiro (segue CTAs no mesmo site: checkout, upsell, VSL)
+          </label>
           {loading && (
             <div className="flex items-center gap-3 text-zinc-500 text-xs animate-pulse">
               <Loader2 className="animate-spin h-3 w-3" />
@@ -209,6 +234,11 @@ export default function CompetitorAnalysisPage() {
                   Plataforma protegida - Análise por IA
                 </Badge>
               )}
+              {scraping?.source_type === "funnel" && (
+                <Badge variant="outline" className="text-violet-400 border-violet-400/30 text-xs shrink-0">
+                  Funil - {scraping.funnel?.pages?.length || 1} páginas
+                </Badge>
+              )}
               {scraping?.source_type === "image" && (
                 <Badge variant="outline" className="text-blue-400 border-blue-400/30 text-xs shrink-0">
                   Imagem direta - Análise visual
@@ -292,6 +322,17 @@ export default function CompetitorAnalysisPage() {
               {t("comp.create_superior")}
               <ChevronRight className="ml-2 h-4 w-4" />
             </Button>
+            {scraping?.source_type === "webpage" && (
+              <Button
+                data-testid="track-competitor"
+                variant="outline"
+                onClick={handleTrack}
+                className="w-full border-zinc-800 text-zinc-300 hover:text-white rounded-sm h-10 text-xs tracking-wide"
+              >
+                <Eye className="mr-2 h-4 w-4" />
+                Monitorar mudanças nesta página
+              </Button>
+            )}
           </div>
         )}
 
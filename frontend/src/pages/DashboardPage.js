@@ -1,9 +1,10 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useCallback } from "react";
 import { useNavigate } from "react-router-dom";
 import { useAuth } from "@/context/AuthContext";
 import { useLanguage } from "@/context/LanguageContext";
 import LanguageSelector from "@/components/LanguageSelector";
 import api from "@/lib/api";
+import { useLiveUpdates } from "@/hooks/use-live-updates";
 import { Button } from "@/components/ui/button";
 import { Badge } from "@/components/ui/badge";
 import { Separator } from "@/components/ui/separator";
@@ -20,6 +21,9 @@ import PushNotificationPrompt from "@/components/PushNotificationPrompt";
 
 export default function DashboardPage() {
   const [analyses, setAnalyses] = useState([]);
+  const [latestDetail, setLatestDetail] = useState(null);
+  const [latestRevision, setLatestRevision] = useState(0);
+  const [stats, setStats] = useState(null);
   const [loading, setLoading] = useState(true);
   const [radar, setRadar] = useState(null);
   const [radarLoading, setRadarLoading] = useState(false);
@@ -31,9 +35,42 @@ export default function DashboardPage() {
     Promise.all([
       api.get("/analyses").then((res) => setAnalyses(res.data)).catch(() => {}),
       api.get("/radar/latest").then((res) => { if (res.data) setRadar(res.data); }).catch(() => {}),
+      api.get("/stats").then((res) => setStats(res.data)).catch(() => {}),
     ]).finally(() => setLoading(false));
   }, []);
 
+  // A listagem vem sem as saídas das etapas; o painel vivo busca só a última análise concluída
+  const latestCompletedId = analyses.find((a) => a.status === "completed")?.id;
+  useEffect(() => {
+    if (!latestCompletedId) { setLatestDetail(null); return; }
+    api.get(`/analyses/${latestCompletedId}`).then((res) => setLatestDetail(res.data)).catch(() => {});
+  }, [latestCompletedId, latestRevision]);
+
+  const refreshAnalyses = useCallback(() => {
+    api.get("/analyses").then((res) => setAnalyses(res.data)).catch(() => {});
+  }, []);
+
+  // Mudanças de status chegam pelo stream SSE, sem re-buscar a lista inteira
+  useLiveUpdates((event) => {
+    if (event.op === "resync" || (event.collection === "analyses" && event.op === "insert")) {
+      refreshAnalyses();
+      return;
+    }
+    if (event.collection === "competitor_analyses" && event.trigger === "recrawl") {
+      toast.info(`Concorrente mudou: ${event.url}`);
+      return;
+    }
+    if (event.collection !== "analyses") return;
+    if (event.deleted) {
+      setAnalyses((prev) => prev.filter((a) => a.id !== event.id));
+      return;
+    }
+    setAnalyses((prev) => prev.map((a) => (a.id === event.id ? { ...a, status: event.status } : a)));
+    if (event.id === latestCompletedId && event.fields?.includes("stages")) {
+      setLatestRevision((n) => n + 1);
+    }
+  });
+
   const handleDelete = async (e, id) => {
     e.stopPropagation();
     try {
@@ -147,13 +184,13 @@ export default function DashboardPage() {
 
         {/* LIVE PANEL */}
         {!loading && analyses.length > 0 && (() => {
-          const latest = analyses.find(a => a.status === "completed");
-          if (!latest) return null;
+          const latest = latestDetail;
+          if (!latest || latest.id !== latestCompletedId) return null;
           const d = latest.decision;
           const v = d?.veredito || d?.vencedor || {};
           const product = latest.product;
           const strategy = latest.strategic_analysis;
-          const completedCount = analyses.filter(a => a.status === "completed").length;
+          const completedCount = stats?.completed ?? analyses.filter(a => a.status === "completed").length;
           const weaknesses = d?.fraquezas || [];
           const nextStep = d?.proximo_passo;
           return (